@@ -3,6 +3,7 @@ import sys
 import time
 import logging
 import gettext
+import multiprocessing
 import datetime
 import traceback
 import matplotlib.pyplot as plt
@@ -77,6 +78,7 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception as e:
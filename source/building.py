@@ -1,10 +1,10 @@
 import os
-import math
 import pickle
 import hashlib
 import logging
 from posixpath import basename
 import threading
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -13,23 +13,32 @@ from openpyxl import load_workbook
 
 from rich import print
 from typing import List
-from bs4 import BeautifulSoup
 from tkinter import messagebox
 from tkinter import filedialog
 from datetime import datetime
 
-from floor import Floor
+from floor import Floor, build_floor_grid
 from util.structure.graph import Graph
+from util.structure.compact_graph import CompactGraph
 from util.structure.contour import Contour
 from util.structure.line import Line
 from util.structure.vertex import Vertex
-from util.solution import Solution
+from util.solution import Solution, PathArrays, VertexIndex
+from util.solution_store import SolutionStore, SOLUTION_STORE_SUFFIX
 from util.structure.transportation import Transportation
 from util.structure.preventzone import PreventZone
+from util.geometry import StationGeometry
 from util.dijkstra import Dijkstra
+from util.scenario import ScenarioSolver
 from gui.stage_two import get_prevent_zone_id
 
 
+# 解答快取格式版本，Solution 的內容改變時遞增，讓舊的快取失效
+SOLUTION_CACHE_VERSION = 6
+# 解答快取中其餘情境只存與此情境不同的點（見 SolutionStore.write），None 代表每個情境都存完整的結果
+SOLUTION_DELTA_BASELINE = "none"
+
+
 class Building:
     """建築物本體。
 
@@ -39,6 +48,7 @@ class Building:
         use_cache (bool): 是否使用快取
         cache_dir (str): 快取檔案路徑
         output_dir (str): 結果輸出檔案路徑
+        workers (int): 產生抽象圖與計算情境時使用的 process 數量，1 表示不開新的 process
 
     Raises:
         Exception: if floor.json 格式錯誤!
@@ -49,22 +59,31 @@ class Building:
         __use_cache (bool): 是否使用快取
         __cache_dir (str): 快取存放資料夾
         __output_dir (str): 輸出路徑資料夾
+        __workers (int): 產生抽象圖與計算情境時使用的 process 數量
 
 
-        __from_cache (bool): floor 是否從快取讀
+        __cached_floors (set): 從快取讀取的樓層名稱
+        __floor_fingerprints (dict): 樓層名稱 -> 該樓層內容的 md5
         __total_graph (Graph): 存放抽象圖
-        solutions (Solution): 最終處理結果
+        __compact_graph (CompactGraph): 抽象圖的整數索引版本，用於最短路徑分析
+        __dijkstra (Dijkstra): 在 __compact_graph 上計算最短路徑的物件（重複使用預先配置的陣列）
+        __vertex_index (VertexIndex): 所有解答共用的點索引（與 __compact_graph 相同）
+        __vertex_zones (np.ndarray): 各點所在防煙區劃的編號（見 __get_block_mask），第一次使用時建立
+        __zone_codes ({int}): 防煙區劃 id -> 編號
+        solutions ({Solution}): 最終處理結果，instance_str -> Solution；
+            instances_analysis 之後為存在硬碟上、依需要才讀取的 SolutionStore
         path_counter (int): 有多少路徑
         __xml_md5 (str): xml 檔案的 md5 hash
         prjNS, prjWE, angle (float): xml 位置資訊
 
     """
 
-    def __init__(self, density, use_cache, cache_dir, output_dir):
+    def __init__(self, density, use_cache, cache_dir, output_dir, workers=1):
         """Building 建構子。
 
         Args:
             meta_infos_path (str): 建物元資訊相對路徑
+            workers (int): 產生抽象圖與計算情境時使用的 process 數量，1 表示不開新的 process
 
         Raises:
             Exception: if floor.json 格式錯誤!
@@ -74,8 +93,15 @@ class Building:
         self.__use_cache = use_cache
         self.__cache_dir = cache_dir
         self.__output_dir = output_dir
-        self.__from_cache = False
+        self.__workers = max(1, int(workers))
+        self.__cached_floors = set()
+        self.__floor_fingerprints = dict()
         self.__total_graph = Graph()
+        self.__compact_graph = None
+        self.__dijkstra = None
+        self.__vertex_index = None
+        self.__vertex_zones = None
+        self.__zone_codes = dict()
         self.solutions = dict()
         self.path_counter = 0
 
@@ -85,23 +111,6 @@ class Building:
 
         self.connect_transpoint_counts = 0
 
-    def __rotate(self, origin, point, angle, z):
-        """
-        Rotate a point counterclockwise by a given angle around a given origin.
-        The angle should be given in radians.
-
-        """
-
-        angle = -angle * math.pi / 180.0
-
-        ox, oy = origin
-        px, py = point
-
-        qx = ox + math.cos(angle) * (px - ox) - math.sin(angle) * (py - oy)
-        qy = oy + math.sin(angle) * (px - ox) + math.cos(angle) * (py - oy)
-
-        return np.array([qx, qy, z])
-
     def __id_join(self, id1, id2):
         """Join two element id into one with "_" separated.
 
@@ -124,12 +133,25 @@ class Building:
         """
         return os.path.join(
             self.__cache_dir,
-            "{}_{}.pickle".format(
+            "{}_{}_{}.pickle".format(
                 hashlib.md5(floor_name.encode('utf-8')).hexdigest(),
-                self.__xml_md5
+                self.__floor_fingerprints[floor_name],
+                self.__density
             )
         )
 
+    def __get_geometry_cache_path(self):
+        """取得幾何快取儲存路徑（只跟 xml 內容有關，與 density 無關）。
+
+        Returns:
+            str: 幾何快取儲存路徑
+
+        """
+        return os.path.join(
+            self.__cache_dir,
+            "{}.geometry.npz".format(self.__xml_md5)
+        )
+
     def load_infos(self, contours_path, msgBox):
         """建物資訊讀取介面。
 
@@ -143,32 +165,8 @@ class Building:
 
         """
 
-        self.__xml_md5 = "{}_{}".format(
-            hashlib.md5(open(contours_path, 'rb').read()).hexdigest(),
-            self.__density
-        )
-
-        if self.__use_cache:
-            for file_name in os.listdir(self.__cache_dir):
-                if self.__xml_md5 in file_name:
-                    """
-                    如果 xml 檔案沒被改過（md5 一樣），就直接 load pickle
-                    """
-                    logging.info("使用處理過的 xml 檔案，直接讀快取 ...")
-                    self.__from_cache = True
-                    floor_cache_paths = list([
-                        x for x in os.listdir(self.__cache_dir) if self.__xml_md5 in x
-                    ])
-                    self.__floors = list()
-                    for cache_path in floor_cache_paths:
-                        try:
-                            with open(os.path.join(self.__cache_dir, cache_path), "rb") as f:
-                                self.__floors.append(pickle.load(f))
-                        except:
-                            logging.info("cache資料損毀")
-                    # 依高程排序
-                    self.__floors = sorted(self.__floors, key= lambda s: s.get_elevation())
-                    return
+        self.__xml_md5 = hashlib.md5(
+            open(contours_path, 'rb').read()).hexdigest()
 
         threads = list()
         threads.append(threading.Thread(
@@ -185,177 +183,153 @@ class Building:
     def __load_contours(self, contours_path, msgBox):
         """解析xml檔案中的輪廓，並將資訊存入在self.__floors中對應的樓層物件中。
 
+        gbXML 只以串流方式讀取一次（見 util.geometry.StationGeometry），
+        解析、轉換、切割完的結果與 density 無關，會另外存成 .npz 幾何快取，
+        之後即使換了 density 也不必再讀 gbXML。
+        各樓層的快取以該樓層內容的 fingerprint 命名，只有內容變動的樓層需要重新計算。
+
         Args:
             contours_path (str): 建物輪廓相對路徑
+            msgBox (str): 'yes' 表示把樓梯都當成電扶梯
 
         """
-        with open(contours_path, "rb") as f:
-            logging.info("讀取 gbXML 檔案 ...")
-            buf = f.read()
-            logging.info("建立搜索樹 ...")
-            soup = BeautifulSoup(buf, 'xml')
+        geometry_path = self.__get_geometry_cache_path()
+        geometry = None
+        if self.__use_cache and os.path.exists(geometry_path):
+            try:
+                logging.info("讀取幾何快取 ...")
+                geometry = StationGeometry.load(geometry_path)
+            except Exception:
+                logging.info("幾何快取損毀，重新讀取 gbXML")
+                geometry = None
 
-        base_points = soup.find("BasePoint")
-        self.prjNS = float(base_points.find("prjNS").text)
-        self.prjWE = float(base_points.find("prjWE").text)
-        self.angle = float(base_points.find("angle").text)
+        if geometry is None:
+            geometry = StationGeometry.from_gbxml(contours_path)
+            if self.__use_cache:
+                geometry.save(geometry_path)
+
+        self.__build_floors(geometry, msgBox)
+
+        logging.info("讀取並轉換成功！")
 
-        accept_layers = ["ExteriorWall", "InteriorWall", "Shade",
-                         "UndergroundWall", "UndergroundSlab"]
+    def __build_floors(self, geometry, msgBox):
+        """由車站幾何資料建立樓層物件。
 
-        sent_points = soup.find("SentPoint").find_all("Element")
+        Args:
+            geometry (StationGeometry): 車站幾何資料
+            msgBox (str): 'yes' 表示把樓梯都當成電扶梯
+
+        """
+        self.prjNS = geometry.prjNS
+        self.prjWE = geometry.prjWE
+        self.angle = geometry.angle
+
+        sent_point_categories = geometry.sent_point_categories.copy()
         # 修改內容, 把樓梯都更換為電扶梯
         if msgBox == 'yes':
-            for sent_point in sent_points:
-                if sent_point.attrs['Category'] == '樓梯':
-                    sent_point.attrs['Category'] = '電扶梯'
-            
-        # We need stable-unique so this magic operation is neccessary
-        floor_names = np.array([point.get("Level") for point in sent_points])
-        floor_names = floor_names[sorted(
-            np.unique(floor_names, return_index=True)[1]
-        )]
-        elevations_accuracy = 4
-        floor_elevations = np.array([
-            np.round(
-                float(point.find_all("Coordinate")[2].text),
-                elevations_accuracy + 1
-            )
-            for point in sent_points
-        ])
-        floor_elevations = floor_elevations[sorted(
-            np.unique(floor_elevations, return_index=True)[1]
-        )]
+            sent_point_categories[sent_point_categories == '樓梯'] = '電扶梯'
 
         self.__floors = list()
-        for name, elevation in zip(
-            floor_names,
-            floor_elevations
-        ):
-            self.__floors.append(
-                Floor(
-                    name=str(name),
-                    elevation=float(elevation),
-                    density=self.__density
-                )
-            )
+        self.__cached_floors = set()
+        self.__floor_fingerprints = dict()
+        for floor_idx, (name, elevation) in enumerate(zip(
+            geometry.floor_names,
+            geometry.floor_elevations
+        )):
+            self.__floor_fingerprints[str(name)] = str(
+                geometry.floor_fingerprints[floor_idx])
+            cache_path = self.__get_cache_path(str(name))
+            if self.__use_cache and os.path.exists(cache_path):
+                """
+                如果這層樓的內容沒被改過（fingerprint 一樣），就直接 load pickle
+                """
+                try:
+                    with open(cache_path, "rb") as f:
+                        self.__floors.append(pickle.load(f))
+                    self.__cached_floors.add(str(name))
+                    logging.info("{} 沒有變動，直接讀快取".format(name))
+                    continue
+                except Exception:
+                    logging.info("cache資料損毀")
 
-        for floor in self.__floors:
+            floor = Floor(
+                name=str(name),
+                elevation=float(elevation),
+                density=self.__density
+            )
+            self.__floors.append(floor)
 
             logging.info("正在新增 {}".format(floor.get_name()))
-            lines = list()
-            for sf in soup.find_all("Surface"):
-                type_ = sf.get("surfaceType")
-                if type_ in accept_layers:
-
-                    vertex = sf.find("PolyLoop").find_all("CartesianPoint")
-                    flag = False
-                    start_point = list()
-
-                    vertex_parsed = list()
-                    for p in vertex:
-                        _tmp = p.find_all("Coordinate")
-                        vertex_parsed.append(
-                            [float(_tmp[i].text) for i in range(3)])
-                    vertex_parsed = np.vstack(
-                        (vertex_parsed, vertex_parsed[0]))
-
-                    for p1, p2 in zip(vertex_parsed[:-1], vertex_parsed[1:]):
-
-                        p1 = self.__rotate(
-                            origin=[self.prjNS, self.prjWE], point=[p1[0], p1[1]], angle=self.angle, z=p1[2])
-                        p2 = self.__rotate(
-                            origin=[self.prjNS, self.prjWE], point=[p2[0], p2[1]], angle=self.angle, z=p2[2])
-
-                        p, t = p1, (np.array(p2) - np.array(p1))
-
-                        for add_height in range(1, 20, 1):
-                            # TODO: 端點在切割平面上
-                            z0 = floor.get_elevation() + add_height / 10.0
-                            if (p1[2] > z0 and p2[2] < z0) or (p1[2] < z0 and p2[2] > z0):
-                                t_value = ((z0 - p[2]) / t[2]) if t[2] else 0
-                                if not flag:
-                                    flag = True
-                                    start_point = (p1 + t_value * t)
-                                else:
-                                    flag = False
-                                    end_point = (p1 + t_value * t)
-                                    lines.append(
-                                        Line((start_point[0], start_point[1]),
-                                             (end_point[0], end_point[1])))
-                            elif p[2] == z0 and t[2] == 0:
-                                lines.append(
-                                    Line((p1[0], p1[1]),
-                                         (p2[0], p2[1])))
+            lines = [
+                Line((x1, y1), (x2, y2))
+                for x1, y1, x2, y2 in geometry.get_wall_segments(floor_idx)
+            ]
 
             floor.add_contour(Contour(lines))
 
-            logging.info("讀取傳送點檔案 ...")
-
-            send_points = soup.find("SentPoint").find_all("Element")
+            logging.info("讀取傳送點 ...")
 
-            for send_point in send_points:
-                if floor.get_name() == send_point["Level"]:
-                    coordinate = send_point.find_all("Coordinate")
-                    p1 = [float(coordinate[0].text), float(
-                        coordinate[1].text), float(coordinate[2].text)]
-                    p1 = self.__rotate(
-                        origin=[self.prjNS, self.prjWE], point=[p1[0], p1[1]], angle=self.angle, z=p1[2])
-                    floor.add_transportation(Transportation(
-                        send_point["Name"], str(
-                            send_point["Id"]), send_point["Category"],
-                        (float(p1[0]), float(p1[1])), send_point["IsEnd"]))
-                    # print(send_point["Id"], send_point["IsEnd"])
+            for sp_idx in geometry.get_sent_point_indices(floor.get_name()):
+                p1 = geometry.sent_point_coordinates[sp_idx]
+                floor.add_transportation(Transportation(
+                    str(geometry.sent_point_names[sp_idx]),
+                    str(geometry.sent_point_ids[sp_idx]),
+                    str(sent_point_categories[sp_idx]),
+                    (float(p1[0]), float(p1[1])),
+                    str(geometry.sent_point_is_ends[sp_idx])))
 
             logging.info("讀取防煙區劃 ...")
-            prevent_zones = soup.find("PreventZones").find_all("Area")
-            for prevent_zone in prevent_zones:
-                if floor.get_name() == prevent_zone["Level"]:
-                    pz = PreventZone(prevent_zone["Id"], prevent_zone["Name"])
-                    prevent_zone_curves = prevent_zone.find(
-                        "PolyLoop").find_all("Curve")
-                    for prevent_zone_curve in prevent_zone_curves:
-                        start_coordinate = prevent_zone_curve.find_all(
-                            "StartCoordinate")
-                        end_coordinate = prevent_zone_curve.find_all(
-                            "EndCoordinate")
-
-                        p1 = [float(start_coordinate[0].text), float(
-                            start_coordinate[1].text), float(start_coordinate[2].text)]
-                        p2 = [float(end_coordinate[0].text), float(
-                            end_coordinate[1].text), float(start_coordinate[2].text)]
-
-                        p1 = self.__rotate(
-                            origin=[self.prjNS, self.prjWE], point=[
-                                p1[0], p1[1]], angle=self.angle, z=p1[2]
-                        )
-                        p2 = self.__rotate(
-                            origin=[self.prjNS, self.prjWE], point=[
-                                p2[0], p2[1]], angle=self.angle, z=p2[2]
-                        )
-                        pz.add_line(Line((p1[0], p1[1]), (p2[0], p2[1])))
+            for pz_idx in geometry.get_prevent_zone_indices(floor.get_name()):
+                pz = PreventZone(
+                    str(geometry.prevent_zone_ids[pz_idx]),
+                    str(geometry.prevent_zone_names[pz_idx])
+                )
+                for x1, y1, x2, y2 in geometry.get_prevent_zone_lines(pz_idx):
+                    pz.add_line(Line((x1, y1), (x2, y2)))
 
-                    floor.prevent_zones.append(pz)
+                floor.prevent_zones.append(pz)
             logging.info("完成新增 {}".format(floor.get_name()))
 
-        logging.info("讀取並轉換成功！")
-
     def to_grid_graph(self):
         """合成各樓層轉換成的抽象圖，存入self.__grid_graph。
+
+        workers > 1 時，每個需要重新計算的樓層在各自的 process 中產生抽象圖，
+        再以精簡的網格描述（見 Floor.export_grid）傳回。
         """
-        threads = list()
-        floor_names = list()
+        floors_to_build = [
+            floor for floor in self.__floors
+            if floor.get_name() not in self.__cached_floors
+        ]
         for floor in self.__floors:
-            threads.append(threading.Thread(
-                target=floor.to_grid_graph, args=(self.__from_cache,)))
-            threads[-1].start()
-            floor_names.append(floor.get_name())
-
-        for thread, f in zip(threads, floor_names):
-            thread.join()
-            logging.debug("完成樓層：{}".format(f))
+            if floor.get_name() in self.__cached_floors:
+                floor.to_grid_graph(True)
+
+        if self.__workers > 1 and len(floors_to_build) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(self.__workers, len(floors_to_build))
+            ) as executor:
+                for floor, description in zip(
+                    floors_to_build,
+                    executor.map(build_floor_grid, floors_to_build)
+                ):
+                    floor.import_grid(description)
+                    logging.debug("完成樓層：{}".format(floor.get_name()))
+        else:
+            threads = list()
+            floor_names = list()
+            for floor in floors_to_build:
+                threads.append(threading.Thread(
+                    target=floor.to_grid_graph, args=(False,)))
+                threads[-1].start()
+                floor_names.append(floor.get_name())
+
+            for thread, f in zip(threads, floor_names):
+                thread.join()
+                logging.debug("完成樓層：{}".format(f))
         if self.__use_cache:
             for floor in self.__floors:
+                if floor.get_name() in self.__cached_floors:
+                    continue
                 with open(self.__get_cache_path(floor.get_name()), "wb") as f:
                     pickle.dump(floor, f)
         logging.info("成功將資訊轉換成 Graph！")
@@ -446,12 +420,16 @@ class Building:
                                 self.__total_graph.add_vertex(Vertex(vertex_obj.get_coordinate()[0], vertex_obj.get_coordinate()[1], floor.get_elevation(
                                 ), self.__id_join(vertex_id, cnt)), [self.__id_join(vertex_id, cnt - 1), self.__id_join(vertex_id, cnt + 1)])
 
+        self.__compact_graph = CompactGraph.from_graph(self.__total_graph)
+        self.__dijkstra = Dijkstra(self.__compact_graph)
+        self.__vertex_index = VertexIndex(self.__compact_graph.get_ids())
+        self.__vertex_zones = None
         logging.info("各樓層抽象圖串接完成")
 
-    def __generate_solution(self, dijkstra_obj, failed_transportation_id, failed_block_id, failed_vertex, situation, transportation_id="", floor_elavation=""):
-        """
+    def __create_scenario(self, failed_transportation_id, failed_block_id, failed_vertex, situation, transportation_id="", floor_elavation=""):
+        """建立情境的 Solution（尚未計算最短路徑）。
+
         Args:
-            dijkstra_obj(Dijkstra)
             failed_transportation_id(str): 維護中傳送點 id
             failed_block_id(str): 失效防煙區劃 id
             failed_vertex(list of str): 失效的所有點 id
@@ -459,30 +437,18 @@ class Building:
             transportation_id(str)
             floor_elavation(str)
 
+        Returns:
+            (str, Solution): 情境描述字串與解答物件
+
         """
         current_solution = Solution(failed_transportation_id, failed_block_id)
+        # 失效的點以停用點 bitset 表示，不修改抽象圖
         if situation == 1:
-            self.__total_graph.generate_instance(
-                failed_vertex_id="",
-                failed_block=failed_vertex
-            )
+            current_solution.failed_vertex_ids = list(failed_vertex)
+            current_solution.start_in_block = True
         if situation == 2:
-            self.__total_graph.generate_instance(
-                failed_vertex_id=failed_transportation_id,
-                failed_block=failed_vertex
-            )
-
-        self.__path_analysis(dijkstra_obj, current_solution)
-        # set distance to inf if start points not in failed prevent zone
-        if situation == 1:
-            for end_point_id in current_solution.shortest_paths:
-                distance_dict = current_solution.shortest_paths[end_point_id][1]
-                for start_point_id in distance_dict:
-                    if self.which_preventzone(start_point_id) != failed_block_id:
-                        current_solution.shortest_paths[end_point_id][1][start_point_id] = np.inf
-
-        if situation == 1 or situation == 2:
-            self.__total_graph.restore_instance()
+            current_solution.failed_vertex_ids = [
+                failed_transportation_id] + list(failed_vertex)
 
         if situation == 0:
             instance_str = "none"
@@ -492,18 +458,93 @@ class Building:
         elif situation == 2:
             instance_str = self.__id_join(
                 failed_block_id, failed_transportation_id)
-        self.solutions[instance_str] = current_solution
+        return instance_str, current_solution
+
+    def __get_disabled_bitset(self, solution):
+        """取得情境的停用點 bitset。
+
+        Args:
+            solution (Solution): 情境的解答物件
+
+        Returns:
+            np.ndarray: 停用點 bitset，沒有失效點時為 None
+
+        Raises:
+            ValueError: 失效點 id 不在抽象圖中
+
+        """
+        if not solution.failed_vertex_ids:
+            return None
+        return self.__compact_graph.disabled_bitset(solution.failed_vertex_ids)
+
+    def __mask_start_outside_block(self, solution, paths):
+        """起點位於失效防煙區劃的情境，將不在該防煙區劃內的起點距離設為 inf。
+
+        Args:
+            solution (Solution): 情境的解答物件
+            paths (PathArrays): 要遮罩的路徑結果
+
+        Returns:
+            PathArrays: 遮罩後的路徑結果；不需遮罩時為原本的 paths
+
+        """
+        if not solution.start_in_block:
+            return paths
+        return paths.masked(self.__get_block_mask(solution.failed_block_id))
 
-    def __calculate_connected_components(self, graph, dfs_start_point_id):
+    def __get_block_mask(self, prevent_zone_id):
+        """取得位於某防煙區劃內的點（與 which_preventzone 的判斷相同）。
+
+        Args:
+            prevent_zone_id (str): 防煙區劃 id
+
+        Returns:
+            np.ndarray: mask[i] 為第 i 點是否位於該防煙區劃，(V,)
+
+        """
+        if self.__vertex_zones is None:
+            self.__vertex_zones = np.full(
+                len(self.__vertex_index), -1, dtype=np.int32)
+            # 與 which_preventzone 相同，點位於多個樓層的索引時以第一個樓層為準
+            for floor in self.__floors:
+                for vertex_id, zone_id in floor.vertex_prevent_index.items():
+                    idx = self.__vertex_index.find(vertex_id)
+                    if idx >= 0 and self.__vertex_zones[idx] < 0:
+                        self.__vertex_zones[idx] = self.__zone_codes.setdefault(
+                            zone_id, len(self.__zone_codes))
+        return self.__vertex_zones == self.__zone_codes.get(prevent_zone_id, -2)
+
+    def __get_end_point_ids(self):
+        """取得所有終點 id（依樓層與傳送點順序）。
+
+        Returns:
+            [str]: 終點 id
+        """
+        end_point_ids = list()
+        for floor in self.__floors:
+            for transportation in floor.get_transportations():
+                if transportation.is_end_point():
+                    end_point_ids.append(self.__id_join(
+                        transportation.get_id(), floor.get_elevation()))
+        return end_point_ids
+
+    def __calculate_connected_components(self, graph, dfs_start_point_id, disabled=None):
         """計算連通分量。
 
         Args:
-            graph (Graph): 預計算連通分量之抽象圖
+            graph (CompactGraph): 預計算連通分量之抽象圖
             dfs_start_point_id (str): dfs起點
+            disabled (np.ndarray): 停用點 bitset，None 代表沒有失效點
+
+        Returns:
+            [int]: 連通分量的點索引
+
+        Raises:
+            IndexError: 抽象圖裡面找不到 dfs 起點
 
         """
 
-        return graph.calculate_connected_components(dfs_start_point_id)
+        return graph.connected_component(graph.get_index(dfs_start_point_id), disabled)
 
     def instances_analysis(self):
         """防煙區劃與傳送點失效情境分析。
@@ -511,40 +552,40 @@ class Building:
 
         """
 
-        floor_cache_md5 = list()
+        # 每個情境的最短路徑都涵蓋整張圖（跨樓層經由傳送點相連），
+        # 任何一層變動都可能改變所有情境的解，因此解答快取以所有樓層內容的指紋
+        # （依樓層順序）與 density 為鍵；樓層快取 pickle 的位元組會因建立方式
+        # （例如 workers 數量）而不同，不適合當作鍵
+        solution_md5 = hashlib.md5()
         for floor in self.__floors:
-            floor_cache_md5.append("{}".format(
-                hashlib.md5(
-                    open(self.__get_cache_path(floor.get_name()), 'rb').read()
-                ).hexdigest()
-            ))
+            solution_md5.update(
+                self.__floor_fingerprints[floor.get_name()].encode('utf-8'))
+        solution_md5.update(repr(self.__density).encode('utf-8'))
 
+        # 每個情境各自存成一個 shard，之後只在需要時讀取
         sol_cache_path = os.path.join(
             self.__cache_dir,
-            "{}.pickle".format("_".join(floor_cache_md5))
+            "{}.v{}{}".format(solution_md5.hexdigest(),
+                              SOLUTION_CACHE_VERSION, SOLUTION_STORE_SUFFIX)
         )
         logging.info("Cache path: {}".format(sol_cache_path))
 
-        if os.path.exists(sol_cache_path):
+        if SolutionStore.exists(sol_cache_path):
             logging.info("Solution cache exists, using cache")
-            with open(sol_cache_path, 'rb') as f:
-                self.solutions = pickle.load(f)
-                logging.debug("Done reading cache")
+            self.solutions = SolutionStore(sol_cache_path)
+            logging.debug("Done reading cache")
 
         else:
-            all_vertex_ids = list()
-            for vertex_id in self.__total_graph.get_vertex_ids():
-                all_vertex_ids.append(vertex_id)
-            dijkstra = Dijkstra(all_vertex_ids)
+            # 先列出所有情境，再一起計算（workers > 1 時平行計算）
+            scenarios = list()
+            self.solutions = dict()
 
             failed_block = None
             failed_vertex_id = None
             logging.info(
-                "開始計算案例--失火區域：{}，維護中傳送點{}".format(failed_block, failed_vertex_id))
-            self.__generate_solution(
-                dijkstra, failed_vertex_id, failed_block, list(), 0)
-            logging.info(
-                "案例--失火區域：{}，維護中傳送點{} 計算完成".format(failed_block, failed_vertex_id))
+                "加入案例--失火區域：{}，維護中傳送點{}".format(failed_block, failed_vertex_id))
+            scenarios.append(self.__create_scenario(
+                failed_vertex_id, failed_block, list(), 0))
 
             for floor in self.__floors:
                 transportation_ids = [self.__id_join(trans.get_id(), str(floor.get_elevation()))
@@ -570,11 +611,11 @@ class Building:
                                 if vertex_id in transportation_ids and (not vertex_id in failed_vertex_ids):
                                     failed_vertex_ids.append(vertex_id)
                             logging.info(
-                                "開始計算案例--失火區域：{}，失效傳送點{}".format(prevent_zone_id, failed_vertex_ids))
+                                "加入案例--失火區域：{}，失效傳送點{}".format(prevent_zone_id, failed_vertex_ids))
                             failed_transportation_ids = ",".join(
                                 failed_vertex_ids)
-                            self.__generate_solution(
-                                dijkstra, failed_transportation_ids, prevent_zone_id, failed_vertex_ids, 1, transportation.get_id(), str(floor_.get_elevation()))
+                            scenarios.append(self.__create_scenario(
+                                failed_transportation_ids, prevent_zone_id, failed_vertex_ids, 1, transportation.get_id(), str(floor_.get_elevation())))
 
             for floor in self.__floors:
                 for prevent_zone_id in floor.vertex_prevent_dict:
@@ -593,56 +634,120 @@ class Building:
                                     transportation.get_id(), floor_.get_elevation())
 
                                 logging.info(
-                                    "開始計算案例--失火區域：{}，維護中傳送點{}".format(prevent_zone_id, failed_vertex_id))
-                                self.__generate_solution(
-                                    dijkstra, failed_vertex_id, prevent_zone_id, failed_block, 2)
-                                logging.info(
-                                    "案例--失火區域：{}，維護中傳送點{} 計算完成".format(prevent_zone_id, failed_vertex_id))
+                                    "加入案例--失火區域：{}，維護中傳送點{}".format(prevent_zone_id, failed_vertex_id))
+                                scenarios.append(self.__create_scenario(
+                                    failed_vertex_id, prevent_zone_id, failed_block, 2))
 
+            self.__solve_scenarios(scenarios)
             logging.info("共分析了 {} 條路徑".format(self.path_counter))
 
-            with open(sol_cache_path, 'wb') as handle:
-                pickle.dump(self.solutions, handle,
-                            protocol=pickle.HIGHEST_PROTOCOL)
+            self.solutions = SolutionStore.write(
+                sol_cache_path, self.solutions, baseline=SOLUTION_DELTA_BASELINE)
+
+    def __solve_scenarios(self, scenarios):
+        """計算所有情境的最短路徑並存入 self.solutions。
 
-    def __path_analysis(self, dijkstra, sol_obj):
-        """最短路徑分析。
+        每個情境以所有終點同時出發，一次算出每點到最近終點的最短路徑。
+        workers > 1 時由 ScenarioSolver 分批交給多個 process 計算，
+        結果依情境順序合併，與逐一計算完全相同。
 
         Args:
-            instance_graph (Graph): 該情境的抽象圖
-            sol_obj (Solution): 解答儲存物件
+            scenarios ([(str, Solution)]): 情境描述字串與尚未計算的解答物件
 
         """
-        for floor in self.__floors:
-            transportations = floor.get_transportations()
-            for transportation in transportations:
-                if transportation.is_end_point():
-                    end_point_id = self.__id_join(
-                        transportation.get_id(), floor.get_elevation())
+        end_point_ids = self.__get_end_point_ids()
+        try:
+            sources = [self.__compact_graph.get_index(end_point_id)
+                       for end_point_id in end_point_ids]
+            disabled_list = [self.__get_disabled_bitset(solution)
+                             for _, solution in scenarios]
+        except:
+            logging.error("Final Graph 內容有誤，請開啟gui mode重新編輯檢查。")
+            raise Exception
 
-                    # ~= 0.07s
-                    try:
-                        connected_component_ids = self.__calculate_connected_components(
-                            self.__total_graph, dfs_start_point_id=end_point_id)
-                    except:
-                        logging.error("Final Graph 內容有誤，請開啟gui mode重新編輯檢查。")
-                        raise Exception
+        logging.info("以所有終點 {} 為源點運行 dijkstra 演算法，共 {} 個情境".format(
+            ", ".join(end_point_ids), len(scenarios)))
 
-                    logging.info("以終點 {} 為源點運行 dijkstra 演算法".format(
-                        transportation.get_id()))
+        try:
+            results = ScenarioSolver(
+                self.__dijkstra, sources, self.__workers).solve(disabled_list)
+        except Exception as e:
+            print(repr(e))
+            logging.error("Final Graph 內容有誤，請開啟gui mode重新編輯檢查。")
+            raise Exception
+
+        # 失效點集合相同的情境共用同一個結果（同一個物件），陣列只建立一次；
+        # 只保留失效防煙區劃內起點的情境，遮罩後的距離依防煙區劃另外共用
+        shared_paths = dict()
+        for (instance_str, solution), result in zip(scenarios, results):
+            key = id(result)
+            if key not in shared_paths:
+                connected_component, distance, parent, label = result
+                shared_paths[key] = PathArrays.from_component(
+                    self.__vertex_index, connected_component, distance, parent,
+                    label, end_point_ids)
+                self.path_counter += len(connected_component)
+            paths = shared_paths[key]
+            if solution.start_in_block:
+                masked_key = (key, solution.failed_block_id)
+                if masked_key not in shared_paths:
+                    # set distance to inf if start points not in failed prevent zone
+                    shared_paths[masked_key] = self.__mask_start_outside_block(
+                        solution, paths)
+                paths = shared_paths[masked_key]
+            solution.nearest = paths
+            self.solutions[instance_str] = solution
+            logging.info("案例 {} 計算完成".format(instance_str))
+
+    def get_shortest_paths(self, instance_str, end_point_id):
+        """取得某情境中以單一終點為源點的最短路徑（需要時才計算，並存入該情境的 Solution）。
 
-                    # run 0.2s
-                    try:
-                        distance, parent = dijkstra.run(
-                            connected_component_ids, self.__total_graph.get_adj_dict(gen_new=False), end_point_id)
-                    except Exception as e:
-                        print(repr(e))
-                        logging.error("Final Graph 內容有誤，請開啟gui mode重新編輯檢查。")
-                        raise Exception
+        Args:
+            instance_str (str): 情境描述字串
+            end_point_id (str): 終點 id
+
+        Returns:
+            (PathView, PathView): parent id dict, distance dict（唯讀字典視圖）
+
+        Raises:
+            ValueError: 如果情境不存在
+
+        """
+        if not instance_str in self.solutions:
+            raise ValueError("invalid instance string!")
+
+        solution = self.solutions[instance_str]
+        if end_point_id not in solution.shortest:
+            disabled = self.__get_disabled_bitset(solution)
+            connected_component_ids = self.__calculate_connected_components(
+                self.__compact_graph, dfs_start_point_id=end_point_id, disabled=disabled)
+            paths = PathArrays.from_component(
+                self.__vertex_index, connected_component_ids,
+                *self.__dijkstra.run(connected_component_ids, self.__compact_graph.get_index(end_point_id), disabled))
+            solution.shortest[end_point_id] = self.__mask_start_outside_block(
+                solution, paths)
+        return solution.shortest[end_point_id].get_views()
+
+    def __to_path_dicts(self, connected_component, distance, parent):
+        """將 Dijkstra 的陣列結果轉成以點 id 為鍵的字典。
 
-                    sol_obj.shortest_paths[self.__id_join(
-                        transportation.get_id(), floor.get_elevation())] = (parent, distance)
-                    self.path_counter += len(connected_component_ids)
+        Args:
+            connected_component ([int]): 連通分量的點索引
+            distance (np.ndarray): 距離，順序與 connected_component 相同
+            parent (np.ndarray): 父節點索引，順序與 connected_component 相同
+
+        Returns:
+            ({int}, {str}): 距離與父節點 id，只包含實際走到的點
+                （分量以無向邊標記，單向邊可能讓分量包含走不到的點）
+
+        """
+        ids = self.__compact_graph.get_ids()
+        distance_dict, parent_dict = dict(), dict()
+        for idx, dis, parent_idx in zip(connected_component, distance.tolist(), parent.tolist()):
+            if parent_idx >= 0:
+                distance_dict[ids[idx]] = int(dis)
+                parent_dict[ids[idx]] = ids[parent_idx]
+        return distance_dict, parent_dict
 
     def plot_sol(self, plot_mode, vertex_id, instance_str="none"):
         """繪圖介面。
@@ -657,19 +762,12 @@ class Building:
         if not instance_str in self.solutions:
             raise ValueError("invalid instance string!")
 
-        # 找到self.__floors所有終點, 比對同情境中起點時, 最短距離的路徑
-        is_end_points = dict()
-        for floor in self.__floors:
-            transportations = floor.get_transportations()
-            for transportation in transportations:
-                if transportation.is_end_point():
-                    try:
-                        end_point_id = self.__id_join(transportation.get_id(), floor.get_elevation())
-                        dijk_distance = self.solutions[instance_str].shortest_paths[end_point_id][1][vertex_id]
-                        is_end_points[transportation.get_id()] = dijk_distance
-                    except:
-                        print('path not found.')
-        shortest_end_id = min(is_end_points, key=lambda k: is_end_points[k])
+        # 同情境中起點往最近終點的路徑
+        dijk_parent_dict, _, nearest_end_point_dict = self.solutions[instance_str].nearest_paths
+        if not vertex_id in nearest_end_point_dict:
+            print('path not found.')
+            raise ValueError("Invalid start point.")
+        shortest_end_id = nearest_end_point_dict[vertex_id].split("_")[0]
 
         # 找到self.floors的最小值當起點(ex.'_99.45')
         lowest_floor = min(self.__floors, key=lambda x: x.get_elevation())
@@ -681,7 +779,6 @@ class Building:
                         # get path
                         end_point_id = self.__id_join(
                             transportation.get_id(), floor.get_elevation())
-                        dijk_parent_dict = self.solutions[instance_str].shortest_paths[end_point_id][0]
                         # dijk_distance = self.solutions[instance_str].shortest_paths[end_point_id][1][vertex_id]
 
                         # # 查詢同一情境, 不同出口的最遠起點
@@ -719,43 +816,48 @@ class Building:
                         # return False
         return failed_endpoint_ids
 
-    def calculate_reverse_table(self):
+    def calculate_reverse_table(self, nearest_only=False):
         """計算反向查找表。
 
         sol_table_dict -> instance -> startpoint -> endpoint -> distancevalue
 
+        Args:
+            nearest_only (bool): 每個起點只記錄最近的終點，直接取用情境的最近終點結果，
+                不逐一計算個別終點（dump_sol_table 與 export_to_excel 只取最近終點，結果相同）
+
         """
 
         logging.info("正在轉換最險峻路徑表格")
         self.sol_table_dict = dict()
 
-        all_vertex_ids = list(self.solutions["none"].shortest_paths.values())[
-            0][0].keys()
-        end_point_ids = list(self.solutions["none"].shortest_paths.keys())
+        _, none_distance_dict, _ = self.solutions["none"].nearest_paths
+        all_vertex_ids = none_distance_dict.keys()
+        end_point_ids = self.__get_end_point_ids()
+        # 走不到任何終點的起點
+        if nearest_only:
+            dead_row = {end_point_ids[0]: np.inf}
+        else:
+            dead_row = {end_point_id: np.inf for end_point_id in end_point_ids}
 
         # "none" case
-        try:
-            self.sol_table_dict[("none", "none")] = dict()
-            for start_point_id in all_vertex_ids:
-                self.sol_table_dict[("none", "none")][start_point_id] = dict()
-                for end_point_id in end_point_ids:
-                    self.sol_table_dict[
-                        ("none", "none")
-                    ][start_point_id][end_point_id] = \
-                        self.solutions["none"].shortest_paths[end_point_id][1][start_point_id]
-        except KeyError:
+        # 所有終點必須互相連通，否則抽象圖編輯有誤（沿著有向的鄰接關係實際搜尋，
+        # 單向邊不算連通）
+        end_point_indices = [self.__compact_graph.get_index(end_point_id)
+                             for end_point_id in end_point_ids]
+        _, end_point_parent = self.__dijkstra.run(end_point_indices, end_point_indices[0])
+        if (end_point_parent < 0).any():
             logging.error("建物抽象圖編輯錯誤！")
             messagebox.showerror("", "建物抽象圖編輯錯誤，請檢查是否合法有逃生路徑失效。")
+        rows = self.__get_reverse_rows("none", end_point_ids, nearest_only)
+        self.sol_table_dict[("none", "none")] = dict()
+        for start_point_id in all_vertex_ids:
+            self.sol_table_dict[("none", "none")][start_point_id] = rows.get(
+                start_point_id, dict(dead_row))
 
         # 找到self.floors的最小值當起點(ex.'_99.45')
-        min_elev = self.__floors[0].get_elevation()
-        for f in self.__floors:
-            if f.get_elevation() < min_elev:
-                min_elev = f.get_elevation()
-        
         lowest_floor = min(self.__floors, key=lambda x: x.get_elevation())
         min_elev = lowest_floor.get_elevation()
-        
+
         # initialization and start point not in failed prevent zone cases
         for instance_str in self.solutions:
             if "in" in instance_str or instance_str == "none":
@@ -765,6 +867,7 @@ class Building:
             failed_preventzone_id = instance_info[0]
             failed_transportation_id = "{}_{}".format(
                 instance_info[1], instance_info[2])
+            rows = self.__get_reverse_rows(instance_str, end_point_ids, nearest_only)
 
             self.sol_table_dict[(failed_preventzone_id,
                                  failed_transportation_id)] = dict()
@@ -774,15 +877,8 @@ class Building:
                 if str(min_elev) in start_point_id:
                     if start_point_id == failed_transportation_id:
                         continue
-                    self.sol_table_dict[(
-                        failed_preventzone_id, failed_transportation_id)][start_point_id] = dict()
-                    for end_point_id in end_point_ids:
-                        if start_point_id in self.solutions[instance_str].shortest_paths[end_point_id][1]:
-                            self.sol_table_dict[(failed_preventzone_id, failed_transportation_id)
-                                                ][start_point_id][end_point_id] = self.solutions[instance_str].shortest_paths[end_point_id][1][start_point_id]
-                        else:
-                            self.sol_table_dict[(
-                                failed_preventzone_id, failed_transportation_id)][start_point_id][end_point_id] = np.inf
+                    self.sol_table_dict[(failed_preventzone_id, failed_transportation_id)][start_point_id] = \
+                        rows.get(start_point_id, dict(dead_row))
 
         # update distance of start point which is in failed zone
         for instance_str in self.solutions:
@@ -791,18 +887,70 @@ class Building:
                 failed_preventzone_id = instance_info[0]
                 failed_transportation_id = "{}_{}".format(
                     instance_info[1], instance_info[2])
+                rows = self.__get_reverse_rows(instance_str, end_point_ids, nearest_only)
+                instance_table = self.sol_table_dict.get(
+                    (failed_preventzone_id, failed_transportation_id), dict())
 
-                for end_point_id in end_point_ids:
-                    for start_point_id in self.solutions[instance_str].shortest_paths[end_point_id][1]:
-                        if start_point_id == failed_transportation_id:
-                            continue
-                        # vertex in failed prevent zone
-                        try:
-                            if self.solutions[instance_str].shortest_paths[end_point_id][1][start_point_id] != np.inf:
-                                self.sol_table_dict[(failed_preventzone_id, failed_transportation_id)
-                                                    ][start_point_id][end_point_id] = self.solutions[instance_str].shortest_paths[end_point_id][1][start_point_id]
-                        except:
-                            error = 'error'
+                for start_point_id, row in rows.items():
+                    if start_point_id == failed_transportation_id:
+                        continue
+                    # vertex in failed prevent zone
+                    if start_point_id not in instance_table:
+                        continue
+                    if nearest_only:
+                        if next(iter(row.values())) != np.inf:
+                            instance_table[start_point_id] = row
+                        continue
+                    for end_point_id, distance in row.items():
+                        if distance != np.inf:
+                            instance_table[start_point_id][end_point_id] = distance
+
+    def __get_reverse_rows(self, instance_str, end_point_ids, nearest_only):
+        """取得情境中每個起點到終點的距離（反向查找表的一列）。
+
+        Args:
+            instance_str (str): 情境描述字串
+            end_point_ids ([str]): 終點 id
+            nearest_only (bool): 是否只記錄最近的終點
+
+        Returns:
+            {{float}}: key: 起點 id, value: {終點 id: 距離}，只包含走得到某個終點的起點；
+                nearest_only 時只有最近的終點，否則每個終點都有一項（走不到為 inf）
+
+        """
+        rows = dict()
+        if nearest_only:
+            _, distance_dict, end_point_dict = self.solutions[instance_str].nearest_paths
+            for start_point_id, distance in distance_dict.items():
+                rows[start_point_id] = {end_point_dict[start_point_id]: distance}
+            return rows
+
+        for end_point_id in end_point_ids:
+            _, distance_dict = self.get_shortest_paths(instance_str, end_point_id)
+            for start_point_id, distance in distance_dict.items():
+                if start_point_id not in rows:
+                    rows[start_point_id] = dict.fromkeys(end_point_ids, np.inf)
+                rows[start_point_id][end_point_id] = distance
+        return rows
+
+    def __get_parent_dict(self, instance_str, start_point_id, end_point_id):
+        """取得情境中起點往指定終點的父節點字典。
+
+        起點的最近終點就是指定終點時直接使用最近終點的結果，否則計算該終點的最短路徑。
+
+        Args:
+            instance_str (str): 情境描述字串
+            start_point_id (str): 起點 id
+            end_point_id (str): 終點 id
+
+        Returns:
+            PathView: parent id dict
+
+        """
+        parent_dict, _, end_point_dict = self.solutions[instance_str].nearest_paths
+        if end_point_dict.get(start_point_id) == end_point_id:
+            return parent_dict
+        return self.get_shortest_paths(instance_str, end_point_id)[0]
 
     def dump_sol_table(self):
         """整理 Solution 結果，輸出 csv。
@@ -868,8 +1016,8 @@ class Building:
                     instance_str = self.__id_join(
                         preventzone_id, transportation_id)
                 # print(instance_str, most_dangerous_end_point_id)
-                dijk_parent_dict = self.solutions[instance_str].shortest_paths[
-                    most_dangerous_end_point_id][0]
+                dijk_parent_dict = self.__get_parent_dict(
+                    instance_str, most_dangerous_start_point_id, most_dangerous_end_point_id)
                 new_row["instance_str"] = instance_str
 
                 # if new_row["最險峻路徑長度"] != np.inf:
@@ -992,8 +1140,8 @@ class Building:
                     instance_str = self.__id_join(
                         preventzone_id, transportation_id)
                 # print(instance_str, most_dangerous_end_point_id)
-                dijk_parent_dict = self.solutions[instance_str].shortest_paths[
-                    most_dangerous_end_point_id][0]
+                dijk_parent_dict = self.__get_parent_dict(
+                    instance_str, most_dangerous_start_point_id, most_dangerous_end_point_id)
                 new_row["逃生情境(火源防煙區劃_維修中垂直動線_高程)"] = instance_str
 
                 # if new_row["最險峻路徑長度"] != np.inf:
@@ -1036,9 +1184,9 @@ class Building:
 
         """
         for floor in self.__floors:
-            for prevent_zone_id in floor.vertex_prevent_dict:
-                if vertex_id in floor.vertex_prevent_dict[prevent_zone_id]:
-                    return prevent_zone_id
+            prevent_zone_id = floor.vertex_prevent_index.get(vertex_id)
+            if prevent_zone_id is not None:
+                return prevent_zone_id
         return None
 
     def get_transportation_name_by_id(self, transportation_id):
@@ -1283,7 +1431,7 @@ class Building:
 
         removed_vids = list()
         for i, floor in enumerate(self.__floors):
-            equation_layer = floor.get_equation(by_ref_only=True)
+            equation_layer = floor.get_equation()
             for j, path in enumerate(floor_paths[i]):
                 if len(path) == 3:
                     x, y, z = floor.get_graph().get_vertex_by_id(
@@ -1435,11 +1583,6 @@ class Building:
         """
         """
 
-        all_vertex_ids = list()
-        for vertex_id in self.__total_graph.get_vertex_ids():
-            all_vertex_ids.append(vertex_id)
-        dijkstra = Dijkstra(all_vertex_ids)
-
         for floor in self.__floors:
             if prevent_zone_id in floor.vertex_prevent_dict:
                 failed_block = floor.vertex_prevent_dict[prevent_zone_id]
@@ -1461,25 +1604,26 @@ class Building:
                             current_transportation_id
                         )
 
-            self.__total_graph.generate_instance(
-                "",
+            disabled = self.__compact_graph.disabled_bitset(
                 ids_of_transportation_in_block
             )
         else:
-            self.__total_graph.generate_instance("", failed_block)
+            disabled = self.__compact_graph.disabled_bitset(failed_block)
 
         connected_component_ids = self.__calculate_connected_components(
-            self.__total_graph,
-            dfs_start_point_id=start_point_id
+            self.__compact_graph,
+            dfs_start_point_id=start_point_id,
+            disabled=disabled
         )
-        distance, parent = dijkstra.run(
+        distance, parent = self.__to_path_dicts(
             connected_component_ids,
-            self.__total_graph.get_adj_dict(gen_new=False),
-            start_point_id
+            *self.__dijkstra.run(
+                connected_component_ids,
+                self.__compact_graph.get_index(start_point_id),
+                disabled
+            )
         )
 
-        self.__total_graph.restore_instance()
-
         not_available_ids = self.__stage_two_algorithm_core(
             distance,
             parent,
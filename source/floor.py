@@ -11,8 +11,12 @@ from util.structure.linear import Linear
 from util.structure.preventzone import PreventZone
 from util.structure.vertex import Vertex
 from util.structure.axis import Axis
+from util.structure.contour import Contour
+from util.structure.line import Line
 from util.structure.graph import Graph
-from util.raycasting import isPointinPolygon
+from util.raycasting import label_points
+from util.segments import merge_segments
+from util.intersection import axis_obstacles, blocked_intervals, linear_arrays
 from gui.editor import Editor
 from gui.stage_two import Selector
 from util.dijkstra import Dijkstra
@@ -25,9 +29,9 @@ class Floor:
         __name (str): 該樓層的名字
         __obstacles ([Obstacle]): 障礙物列表
         __elevation (float): 樓層的海拔高度
-        __transportations ([Transportation]): 傳送點列表
+        __transportations ((Transportation)): 傳送點（tuple，只在加入時替換）
         __contour (Contour): 建築輪廓物件
-        __equation_layer ([Linear]): 建物擺設方程式列表
+        __equation_layer ((Linear)): 建物擺設方程式（tuple，只在建立時替換）
         __border ({float}): 建物的座標邊界
             e.g. { "x_min": 0.3, "x_max": 0.5, "y_min": 0.1, "y_max": 0.7 }
         __density (float): 網格單位長度(英吋)
@@ -36,10 +40,12 @@ class Floor:
         __grid_graph (Graph): 格子點圖
         __connected_components ([ConnectedComponent]): 連接圖列表
         __threshold (int): 誤差容忍值
+        __removed_segments (int): 清理輪廓時移除的線段數量
         prevent_zones ([PreventZone]): 防煙區劃列表
 
         path_tmp: 繪圖用的路徑暫存變數
         vertex_prevent_dict ({[str]}): 以 prevent_zone_id 為 key ，防煙區劃內的點列表
+        vertex_prevent_index ({str}): vertex_prevent_dict 的反向索引，點 id -> 所在的（第一個）防煙區劃 id
 
     Args:
         name (str): 該樓層的名字
@@ -68,9 +74,9 @@ class Floor:
         self.__name = name
         self.__obstacles = list()
         self.__elevation = elevation
-        self.__transportations = list()
+        self.__transportations = tuple()
         self.__contour = None
-        self.__equation_layer = list()
+        self.__equation_layer = tuple()
         self.__border = dict()
         self.__density = density
         self.__vertical_to_xs = list()
@@ -79,10 +85,23 @@ class Floor:
 
         self.__routes = list()
         self.__threshold = 0.2
+        self.__removed_segments = 0
 
         self.path_tmp = None
         self.prevent_zones = list()
         self.vertex_prevent_dict = dict()
+        self.vertex_prevent_index = dict()
+
+    def __setstate__(self, state):
+        """讀取快取時，舊版快取中的傳送點與方程式列表轉成 tuple。
+
+        Args:
+            state (dict): 物件屬性
+
+        """
+        self.__dict__.update(state)
+        self.__transportations = tuple(self.__transportations)
+        self.__equation_layer = tuple(self.__equation_layer)
 
     def add_obstacle(self, obstacle):
         """在樓層中增加一個障礙物。
@@ -129,7 +148,8 @@ class Floor:
         if type(transportation).__name__ != 'Transportation':
             logging.critical("add_transportation 的 transportation 參數型別錯誤")
             raise TypeError("add_transportation 的 transportation 參數型別錯誤")
-        self.__transportations.append(copy.deepcopy(transportation))
+        # 以 tuple 存放，get_transportations 直接回傳不必複製
+        self.__transportations += (copy.deepcopy(transportation),)
 
     def plot(self, ax, prevent_zone_id, plot_mode):
         """繪製輪廓與障礙物圖片。
@@ -331,37 +351,87 @@ class Floor:
         """
         return copy.deepcopy(self.__contour)
 
-    def get_equation(self, by_ref_only=False):
-        if by_ref_only:
-            return self.__equation_layer
-        return copy.deepcopy(self.__equation_layer)
+    def get_equation(self):
+        """取得建物擺設方程式列表（唯讀，Linear 不可變）。
+
+        Returns:
+            (source.util.structure.linear.Linear): 建物擺設方程式，需要修改請用 copy_equation
+
+        """
+        return self.__equation_layer
+
+    def copy_equation(self):
+        """取得建物擺設方程式列表的複本。
+
+        Returns:
+            [source.util.structure.linear.Linear]: 建物擺設方程式列表複本
+
+        """
+        return list(copy.deepcopy(self.__equation_layer))
 
     def get_transportations(self):
-        """取得樓層的傳送點列表。
+        """取得樓層的傳送點列表（唯讀，Transportation 不可變）。
+
+        Returns:
+            (source.util.structure.transportation.Transportation): 樓層的傳送點，需要修改請用 copy_transportations
+
+        """
+        return self.__transportations
+
+    def copy_transportations(self):
+        """取得樓層的傳送點列表的複本。
 
         Returns:
-            [source.util.structure.transportation.Transportation]: 樓層的傳送點列表
+            [source.util.structure.transportation.Transportation]: 樓層的傳送點列表複本
 
         """
-        return copy.deepcopy(self.__transportations)
+        return list(copy.deepcopy(self.__transportations))
+
+    def get_removed_segment_count(self):
+        """取得清理輪廓時移除的線段數量。
+
+        Returns:
+            int: 移除的線段數量
+
+        """
+        return self.__removed_segments
+
+    def __clean_contour(self):
+        """清理建築輪廓：去除長度為零的線段並合併共線重疊的線段。
+        """
+        if self.__contour == None:
+            return
+        segments = np.array([
+            line.get_start_point() + line.get_end_point()
+            for line in self.__contour.get_lines()
+        ], dtype=np.float64).reshape(-1, 4)
+        merged, self.__removed_segments = merge_segments(segments)
+        self.__contour = Contour([
+            Line((x1, y1), (x2, y2)) for x1, y1, x2, y2 in merged
+        ])
+        logging.info("{} 清理輪廓：{} 條線段中移除了 {} 條".format(
+            self.__name, len(segments), self.__removed_segments))
 
     def __to_equation_layer(self):
         """將樓層資訊以方程式描繪。
         """
+        equation_layer = list(self.__equation_layer)
         if len(self.__obstacles) != 0:
             for obstacle in self.__obstacles:
                 for line in obstacle.get_contour().get_lines():
-                    self.__equation_layer.append(
+                    equation_layer.append(
                         Linear(line.get_start_point(), line.get_end_point()))
-                    # self.__equation_layer[len(self.__equation_layer)-1].display()
+                    # equation_layer[len(equation_layer)-1].display()
 
         if self.__contour != None:
             for line in self.__contour.get_lines():
                 try:
-                    self.__equation_layer.append(
+                    equation_layer.append(
                         Linear(line.get_start_point(), line.get_end_point()))
                 except ValueError:
                     pass
+        # 以 tuple 存放，get_equation 直接回傳不必複製
+        self.__equation_layer = tuple(equation_layer)
 
     def __define_border(self):
 
@@ -372,17 +442,23 @@ class Floor:
         min_y = min(self.__transportations, key=lambda s: s.get_coordinate()[1]).get_coordinate()[1]-1
         max_y = max(self.__transportations, key=lambda s: s.get_coordinate()[1]).get_coordinate()[1]+1
 
-        """(改寫)傳送點座標與equation_layer比較xy最大最小值"""
+        """(改寫)傳送點座標與equation_layer比較xy最大最小值
+        起點與終點都要比對：清理輪廓時合併的線段可能讓某個端點只剩下終點
+        """
         ""
 
-        if min([_.get_start_point()[0] for _ in self.__equation_layer]) < min_x:
-            min_x = min([_.get_start_point()[0] for _ in self.__equation_layer])
-        if max([_.get_start_point()[0] for _ in self.__equation_layer]) > max_x:
-            max_x = max([_.get_start_point()[0] for _ in self.__equation_layer])
-        if min([_.get_start_point()[1] for _ in self.__equation_layer]) < min_y:
-            min_y = min([_.get_start_point()[1] for _ in self.__equation_layer])
-        if max([_.get_start_point()[1] for _ in self.__equation_layer]) > max_y:
-            max_y = max([_.get_start_point()[1] for _ in self.__equation_layer])
+        end_points = [
+            point for _ in self.__equation_layer
+            for point in (_.get_start_point(), _.get_end_point())
+        ]
+        if min([point[0] for point in end_points]) < min_x:
+            min_x = min([point[0] for point in end_points])
+        if max([point[0] for point in end_points]) > max_x:
+            max_x = max([point[0] for point in end_points])
+        if min([point[1] for point in end_points]) < min_y:
+            min_y = min([point[1] for point in end_points])
+        if max([point[1] for point in end_points]) > max_y:
+            max_y = max([point[1] for point in end_points])
 
         """(改寫)將界線以座標標出。障礙物與傳送點都要比對最大最小xy值, 減少發生"transportation 的值超出邊界"的可能性
         """
@@ -416,104 +492,139 @@ class Floor:
     def __calculate_obstacle_points(self):
         """計算障礙物的方程式。
         """
-        for vertical_to_x in self.__vertical_to_xs:
-            for linear in self.__equation_layer:
-                vertical_to_x.get_intersections(
-                    linear, mode="x", threshold=self.__threshold)
-            # vertical_to_x.display()
-
-        for vertical_to_y in self.__vertical_to_ys:
-            for linear in self.__equation_layer:
-                vertical_to_y.get_intersections(
-                    linear, mode="y", threshold=self.__threshold)
-            # vertical_to_y.get_equation().display()
+        wall_coefficients, wall_bounds = linear_arrays(self.__equation_layer)
+
+        for axes, mode in ((self.__vertical_to_xs, "x"), (self.__vertical_to_ys, "y")):
+            axis_coefficients = np.array([
+                axis.get_equation().get_coefficients() for axis in axes
+            ], dtype=np.float64).reshape(-1, 3)
+            # 垂直 x 軸的位置為 -c / a，垂直 y 軸的位置為 -c / b
+            axis_positions = -axis_coefficients[:, 2] / \
+                axis_coefficients[:, 0 if mode == "x" else 1]
+            obstacles = axis_obstacles(
+                axis_coefficients, axis_positions,
+                wall_coefficients, wall_bounds,
+                mode=mode, threshold=self.__threshold)
+            for axis, axis_obstacle in zip(axes, obstacles):
+                axis.set_obstacles(axis_obstacle)
+
+    def __snap_transportations(self, xs, ys):
+        """計算每個傳送點所在的格子，並決定要連接的四個角落格子點。
+
+        格子索引直接由 (x - x_min) / density 算出，再檢查相鄰的索引，
+        找出所有滿足 x <= tx <= x + density 且 y <= ty <= y + density 的格子
+        （傳送點剛好在格線上時會有多個）。傳送點在第一個包含它的格子之後加入圖，
+        並連接最後一個包含它的格子的四個角落。
+
+        Args:
+            xs (np.ndarray): 垂直 x 軸的位置
+            ys (np.ndarray): 垂直 y 軸的位置
+
+        Returns:
+            {(int, int): [(Transportation, [str])]}: 第一個包含傳送點的格子 ->
+                該格子之後要加入的傳送點與其 adjacency list
+
+        Raises:
+            ValueError: transportation 的值超出邊界
+
+        """
+        def containing(positions, value, origin):
+            guess = int(np.floor((value - origin) / self.__density))
+            return [
+                k for k in range(guess - 1, guess + 2)
+                if 0 <= k < len(positions) and
+                positions[k] <= value and positions[k] + self.__density >= value
+            ]
+
+        cell_transportations = dict()
+        if len(xs) == 0 or len(ys) == 0:
+            return cell_transportations
+
+        for transportation in self.__transportations:
+            tx, ty = transportation.get_coordinate()
+            if tx > self.__border['x_max'] or tx < self.__border['x_min'] or \
+                    ty > self.__border['y_max'] or ty < self.__border['y_min']:
+                logging.warning("transportation 的值超出邊界")
+                raise ValueError("transportation 的值超出邊界")
+
+            cell_is = containing(xs, tx, self.__border['x_min'])
+            cell_js = containing(ys, ty, self.__border['y_min'])
+            if len(cell_is) == 0 or len(cell_js) == 0:
+                continue
+
+            i, j = cell_is[-1], cell_js[-1]
+            transportation_adj_list = [
+                "{}_{}_{}".format(i_, j_, self.__elevation)
+                for i_ in [i, i + 1] for j_ in [j, j + 1]
+            ]
+            cell_transportations.setdefault((cell_is[0], cell_js[0]), list()).append(
+                (transportation, transportation_adj_list))
+
+        return cell_transportations
 
     def __generate_grid_graph(self):
         """將各 Vertex 和 transportation 可前進的方向儲存為 adjacency list。
         """
         # TODO: 傳送點border 和從格子點到傳送點的 adjList 修改
 
-        for i, vertical_to_x in enumerate(self.__vertical_to_xs):
-            x = float(-vertical_to_x.get_equation().get_coefficients()
-                      [2] / vertical_to_x.get_equation().get_coefficients()[0])
-            for j, vertical_to_y in enumerate(self.__vertical_to_ys):
-                # vertical_to_y.get_equation().display()
-                y = float(-vertical_to_y.get_equation().get_coefficients()
-                          [2] / vertical_to_y.get_equation().get_coefficients()[1])
+        xs = np.array([
+            -axis.get_equation().get_coefficients()[2] / axis.get_equation().get_coefficients()[0]
+            for axis in self.__vertical_to_xs
+        ], dtype=np.float64)
+        ys = np.array([
+            -axis.get_equation().get_coefficients()[2] / axis.get_equation().get_coefficients()[1]
+            for axis in self.__vertical_to_ys
+        ], dtype=np.float64)
+
+        # up[i, j]: (i, j) <-> (i, j + 1) 可通行；right[i, j]: (i, j) <-> (i + 1, j) 可通行
+        up = ~blocked_intervals(
+            [axis.get_obstacles() for axis in self.__vertical_to_xs],
+            ys[:-1], ys[:-1] + self.__density)
+        up &= (ys[:-1] + self.__density <= self.__border["y_max"])[None, :]
+        right = ~blocked_intervals(
+            [axis.get_obstacles() for axis in self.__vertical_to_ys],
+            xs[:-1], xs[:-1] + self.__density).T
+        right &= (xs[:-1] + self.__density <= self.__border["x_max"])[:, None]
+
+        n_x, n_y = len(xs), len(ys)
+        ids = [
+            ["{}_{}_{}".format(i, j, self.__elevation) for j in range(n_y)]
+            for i in range(n_x)
+        ]
+        up = up.tolist()
+        right = right.tolist()
+        cell_transportations = self.__snap_transportations(xs, ys)
+        xs = xs.tolist()
+        ys = ys.tolist()
+
+        for i in range(n_x):
+            x = xs[i]
+            for j in range(n_y):
+                y = ys[j]
                 adj_list = list()
                 # upper
-                if y + self.__density <= self.__border["y_max"]:
-                    blocked = False
-                    for block in vertical_to_x.get_obstacles():
-                        if y <= block and y + self.__density >= block:
-                            blocked = True
-                            break
-                    if not blocked:
-                        adj_list.append("{}_{}_{}".format(
-                            i, j+1, self.__elevation))
-
+                if j + 1 < n_y and up[i][j]:
+                    adj_list.append(ids[i][j + 1])
                 # lower
-                if y - self.__density >= self.__border["y_min"]:
-                    blocked = False
-                    for block in vertical_to_x.get_obstacles():
-                        if y >= block and y - self.__density <= block:
-                            blocked = True
-                            break
-                    if not blocked:
-                        adj_list.append("{}_{}_{}".format(
-                            i, j-1, self.__elevation))
+                if j > 0 and up[i][j - 1]:
+                    adj_list.append(ids[i][j - 1])
                 # right
-                if x + self.__density <= self.__border["x_max"]:
-                    blocked = False
-                    for block in vertical_to_y.get_obstacles():
-                        if x <= block and x + self.__density >= block:
-                            blocked = True
-                            break
-                    if not blocked:
-                        adj_list.append("{}_{}_{}".format(
-                            i+1, j, self.__elevation))
-
+                if i + 1 < n_x and right[i][j]:
+                    adj_list.append(ids[i + 1][j])
                 # left
-                if x - self.__density >= self.__border["x_min"]:
-                    blocked = False
-                    for block in vertical_to_y.get_obstacles():
-                        if x >= block and x - self.__density <= block:
-                            blocked = True
-                            break
-                    if not blocked:
-                        adj_list.append("{}_{}_{}".format(
-                            i-1, j, self.__elevation))
-
-                v = Vertex(x, y, self.__elevation,
-                           "{}_{}_{}".format(i, j, self.__elevation))
+                if i > 0 and right[i - 1][j]:
+                    adj_list.append(ids[i - 1][j])
+
+                v = Vertex(x, y, self.__elevation, ids[i][j])
                 self.__grid_graph.add_vertex(v, adj_list)
 
-                for transportation in self.__transportations:
-                    if transportation.get_coordinate()[0] > self.__border['x_max'] or \
-                            transportation.get_coordinate()[0] < self.__border['x_min'] or \
-                            transportation.get_coordinate()[1] > self.__border['y_max'] or \
-                            transportation.get_coordinate()[1] < self.__border['y_min']:
-                        logging.warning("transportation 的值超出邊界")
-                        raise ValueError("transportation 的值超出邊界")
-                    if x <= transportation.get_coordinate()[0] and x + self.__density >= transportation.get_coordinate()[0] and \
-                            y <= transportation.get_coordinate()[1] and y + self.__density >= transportation.get_coordinate()[1]:
-                        transportation_adj_list = list()
-                        for i_ in [i, i+1]:
-                            for j_ in [j, j+1]:
-                                has_intersection = False  # TODO for demo, add back in real case
-                                # for linear in self.__equation_layer:
-                                #     if linear.has_intersection_with((transportation.get_coordinate()[0], transportation.get_coordinate()[1]),
-                                #                                     (i_*self.__density+self.__border["x_min"], j_*self.__density+self.__border["y_min"])):
-                                #         has_intersection = True
-                                #         break
-                                if has_intersection == False:
-                                    transportation_adj_list.append(
-                                        "{}_{}_{}".format(i_, j_, self.__elevation))
-                                # transportation_adj_list.append("{}_{}_{}".format(i_, j_, self.__elevation)) # TODO delete  in real case
-                        v = Vertex(transportation.get_coordinate()[0], transportation.get_coordinate()[1], self.__elevation,
-                                   transportation.get_id())
-                        self.__grid_graph.add_vertex(
-                            v, transportation_adj_list)
+                # 第一個包含傳送點的格子加入後，緊接著加入傳送點
+                for transportation, transportation_adj_list in cell_transportations.get((i, j), list()):
+                    x_, y_ = transportation.get_coordinate()
+                    v = Vertex(x_, y_, self.__elevation,
+                               transportation.get_id())
+                    self.__grid_graph.add_vertex(
+                        v, transportation_adj_list)
 
         for transportation in self.__transportations:
             grid_list = self.__grid_graph.get_adj_list_by_id(
@@ -525,49 +636,33 @@ class Floor:
     def __construct_prevent_zone(self):
         """建構防煙區劃。
         """
-        for prevent_zone in self.prevent_zones:  # prevent_zone is a PreventZone object
-            self.vertex_prevent_dict[prevent_zone.id] = list()
-            boundaries = prevent_zone.boundaries
-            xs = [boundaries[0].get_start_point()[0]]
-            ys = [boundaries[0].get_start_point()[1]]
-            end_x = boundaries[0].get_end_point()[0]
-            end_y = boundaries[0].get_end_point()[1]
-            for _ in range(len(boundaries)):
-                for boundary in boundaries:
-                    start = boundary.get_start_point()
-                    if end_x == start[0] and end_y == start[1]:
-                        xs.append(start[0])
-                        ys.append(start[1])
-                        end_x = boundary.get_end_point()[0]
-                        end_y = boundary.get_end_point()[1]
-                        break
-
-            # get prevent zone border
-            max_x = max(xs)
-            min_x = min(xs)
-            max_y = max(ys)
-            min_y = min(ys)
-
-            vertex_ids = self.__grid_graph.get_vertex_ids()
+        vertex_ids = self.__grid_graph.get_vertex_ids()
+        coordinates = self.__grid_graph.get_coordinates()[:, :2]
+        polygons = [
+            np.column_stack(prevent_zone.get_polygon())
+            for prevent_zone in self.prevent_zones  # prevent_zone is a PreventZone object
+        ]
+        labels = label_points(coordinates, polygons)
+
+        transportation_ids = set(
+            transportation.get_id() for transportation in self.__transportations)
+        for prevent_zone, label in zip(self.prevent_zones, labels):
+            self.vertex_prevent_dict[prevent_zone.id] = [
+                "{}_{}".format(vertex_id, str(self.__elevation))
+                if vertex_id in transportation_ids else vertex_id
+                for vertex_id in (vertex_ids[k] for k in np.flatnonzero(label))
+            ]
+        self.build_vertex_prevent_index()
+
+    def build_vertex_prevent_index(self):
+        """由 vertex_prevent_dict 建立點 id -> 防煙區劃 id 的反向索引。
+
+        一個點若落在多個防煙區劃內，以 vertex_prevent_dict 中較前面的防煙區劃為準。
+        """
+        self.vertex_prevent_index = dict()
+        for prevent_zone_id, vertex_ids in self.vertex_prevent_dict.items():
             for vertex_id in vertex_ids:
-                x, y, __ = self.__grid_graph.get_coordinate_by_vertex_id(
-                    vertex_id)
-                in_border = x <= max_x and x >= min_x and y <= max_y and y >= min_y
-                if in_border:
-                    # is in current prevent zone
-                    if isPointinPolygon([x, y], list(zip(xs, ys))):
-                        is_transportation = False
-                        for transportation in self.__transportations:
-
-                            if vertex_id == transportation.get_id():
-                                is_transportation = True
-                                break
-                        if is_transportation:
-                            self.vertex_prevent_dict[prevent_zone.id].append(
-                                "{}_{}".format(vertex_id, str(self.__elevation)))
-                        else:
-                            self.vertex_prevent_dict[prevent_zone.id].append(
-                                vertex_id)
+                self.vertex_prevent_index.setdefault(vertex_id, prevent_zone_id)
 
     def to_grid_graph(self, from_cache):
         """將樓層資訊轉為抽象圖，存入self.__grid_graph。
@@ -577,6 +672,8 @@ class Floor:
 
         """
         if not from_cache:
+            logging.debug("clean contour（清理重複、共線的輪廓線段）")
+            self.__clean_contour()
             logging.debug("to equation layer（將樓層資訊以方程式描繪）")
             self.__to_equation_layer()
             logging.debug("define border（將界線以座標標出）")
@@ -595,6 +692,46 @@ class Floor:
         # logging.debug("calculate connected components（計算連通分量）")
         # self.__calculate_connected_components()
 
+    def export_grid(self):
+        """將 to_grid_graph 的結果轉成精簡、容易 pickle 的描述（用於跨 process 傳遞）。
+
+        網格軸線（__vertical_to_xs, __vertical_to_ys）只在產生格子點時使用，因此不輸出。
+
+        Returns:
+            dict: 網格描述
+
+        """
+        return {
+            "contour": np.array([
+                line.get_start_point() + line.get_end_point()
+                for line in self.__contour.get_lines()
+            ], dtype=np.float64).reshape(-1, 4) if self.__contour != None else None,
+            "removed_segments": self.__removed_segments,
+            "border": dict(self.__border),
+            "graph": self.__grid_graph.to_description(),
+            "vertex_prevent_dict": self.vertex_prevent_dict,
+        }
+
+    def import_grid(self, description):
+        """讀入 export_grid 產生的網格描述，結果等同於在本 process 執行 to_grid_graph。
+
+        Args:
+            description (dict): 網格描述
+
+        """
+        if description["contour"] is not None:
+            self.__contour = Contour([
+                Line((x1, y1), (x2, y2))
+                for x1, y1, x2, y2 in description["contour"]
+            ])
+        self.__removed_segments = description["removed_segments"]
+        self.__equation_layer = tuple()
+        self.__to_equation_layer()
+        self.__border = description["border"]
+        self.__grid_graph = Graph.from_description(description["graph"])
+        self.vertex_prevent_dict = description["vertex_prevent_dict"]
+        self.build_vertex_prevent_index()
+
     def edit_graph_gui(self, use_cache):
         """開啟編輯視窗，對圖進行人工編輯。
 
@@ -631,3 +768,17 @@ class Floor:
                             self.__transportations, self.__elevation, self.__density)
         end_point_id = selector.select()
         return end_point_id
+
+
+def build_floor_grid(floor):
+    """在子 process 中產生樓層的抽象圖（供 ProcessPoolExecutor 使用）。
+
+    Args:
+        floor (Floor): 尚未產生抽象圖的樓層
+
+    Returns:
+        dict: 網格描述（見 Floor.export_grid）
+
+    """
+    floor.to_grid_graph(False)
+    return floor.export_grid()
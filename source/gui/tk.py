@@ -7,12 +7,13 @@ import time
 import datetime
 import pandas as pd
 
-from tkinter import Tk, messagebox, filedialog, Label, Button, simpledialog
+from tkinter import Tk, messagebox, filedialog, Label, Button, Entry, simpledialog
 from tkinter.constants import NONE
 from util.structure.transportation import Transportation
 from datetime import datetime
 
 from building import Building
+from util.solution_store import SOLUTION_STORE_SUFFIX
 from gui.stage_two import get_prevent_zone_id
 
 
@@ -149,6 +150,14 @@ class TkApp:
         _.config(font=("Courier", 12))
         _.pack()
 
+        # 產生抽象圖與計算情境時使用的 process 數量（預設 1，不開新的 process）
+        workers_label = Label(self.root, text="process 數量")
+        workers_label.config(font=("Courier", 8))
+        workers_label.pack()
+        self.workers_entry = Entry(self.root, width=6, justify="center")
+        self.workers_entry.insert(0, "1")
+        self.workers_entry.pack()
+
         buttonCommit2 = Button(
             self.root,
             height=1,
@@ -198,16 +207,30 @@ class TkApp:
     def __copy_cache(self, suffix: str = ".pickle"):
 
         for dir in os.walk(self.output_cache_dir): # 搜尋底下所有子資料夾
+            self.__skip_solution_stores(dir[1])
             os.chdir(dir[0])
             directory = os.getcwd()
             if not os.path.samefile(self.output_cache_dir, directory):
                 for fileName in os.listdir(self.output_cache_dir):
+                    if os.path.exists(os.path.join(directory, fileName)):
+                        continue
                     if suffix in fileName:
-                        if not os.path.exists(os.path.join(directory, fileName)):                            
-                            shutil.copy(
-                                os.path.join(self.output_cache_dir, fileName),
-                                os.path.join(directory, fileName)
-                            )
+                        shutil.copy(
+                            os.path.join(self.output_cache_dir, fileName),
+                            os.path.join(directory, fileName)
+                        )
+                    elif fileName.endswith(SOLUTION_STORE_SUFFIX):
+                        # 情境解答存放資料夾（見 util.solution_store）
+                        shutil.copytree(
+                            os.path.join(self.output_cache_dir, fileName),
+                            os.path.join(directory, fileName)
+                        )
+
+    @staticmethod
+    def __skip_solution_stores(dir_names) -> None:
+        """os.walk 時略過情境解答存放資料夾，它們不是樓層快取資料夾。"""
+        dir_names[:] = [
+            name for name in dir_names if SOLUTION_STORE_SUFFIX not in name]
 
     def __handleChangeFile(self, target_label: Label, title_: str, type: str, default_path: str) -> None:
         target_label["text"] = os.path.join(
@@ -236,12 +259,21 @@ class TkApp:
         elif type == 2:
             self.output_cache_dir = target_label["text"]
 
+    def __get_workers(self) -> int:
+        """讀取介面上的 process 數量，格式錯誤時使用 1。"""
+        try:
+            return max(1, int(self.workers_entry.get()))
+        except ValueError:
+            logging.warning("process 數量格式錯誤，改用 1")
+            return 1
+
     def __default_set(self, output_cache_dir):
         self.building = Building(
                 density=(0.2 ** 0.5),
                 use_cache=True,
                 cache_dir=output_cache_dir,
-                output_dir=self.output_dir
+                output_dir=self.output_dir,
+                workers=self.__get_workers()
             )
         self.building.load_infos(
             contours_path=self.xml_path,
@@ -251,7 +283,7 @@ class TkApp:
         self.building.to_grid_graph()
         self.building.connect_floors()
         self.building.instances_analysis()
-        self.building.calculate_reverse_table()
+        self.building.calculate_reverse_table(nearest_only=True)
 
         while not self.__check_output_dir_existence_and_premission(self.output_dir):
             self.output_dir = filedialog.askdirectory(
@@ -278,7 +310,8 @@ class TkApp:
             density=(0.2 ** 0.5),
             use_cache=True,
             cache_dir=self.output_cache_dir,
-            output_dir=self.output_dir
+            output_dir=self.output_dir,
+            workers=self.__get_workers()
         )
         self.building.load_infos(
             contours_path=self.xml_path,
@@ -304,6 +337,7 @@ class TkApp:
 
         # 搜尋Output cache資料夾中, 所有子資料夾
         for dir in os.walk(self.output_cache_dir): # 搜尋底下所有子資料夾
+            self.__skip_solution_stores(dir[1])
             os.chdir(dir[0])
             self.output_cache_dir = os.getcwd()
 
@@ -314,7 +348,8 @@ class TkApp:
                 density=(0.2 ** 0.5),
                 use_cache=True,
                 cache_dir=self.output_cache_dir,
-                output_dir=self.output_dir
+                output_dir=self.output_dir,
+                workers=self.__get_workers()
             )
             self.building.load_infos(
                 contours_path=self.xml_path,
@@ -323,7 +358,7 @@ class TkApp:
 
             self.building.connect_floors()
             self.building.instances_analysis()
-            self.building.calculate_reverse_table()
+            self.building.calculate_reverse_table(nearest_only=True)
 
             while not self.__check_output_dir_existence_and_premission(self.output_dir):
                 self.output_dir = filedialog.askdirectory(
@@ -4,6 +4,7 @@ import time
 import signal
 import logging
 import datetime
+import multiprocessing
 import traceback
 import coloredlogs
 import matplotlib.pyplot as plt
@@ -52,6 +53,8 @@ def main():
                         default=".outputs", help="輸出（output）的資料夾位置")
     parser.add_argument("-dc", "--disable_cache", action="store_true", default=False,
                         help="whether to disable cache function")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="產生抽象圖與計算情境時使用的 process 數量（預設 1，不開新的 process）")
     parser.add_argument("-v", "--verbose", type=bool,
                         default=True, help="輸出日誌層級")
     args = parser.parse_args()
@@ -114,7 +117,8 @@ def main():
         density=args.density,
         use_cache=(not args.disable_cache),
         cache_dir=args.cache,
-        output_dir=args.output_dir
+        output_dir=args.output_dir,
+        workers=args.workers
     )
     LG10.load_infos(
         contours_path=extended_gbxml_path
@@ -125,7 +129,7 @@ def main():
         LG10.edit_graph_gui()
     LG10.connect_floors()
     LG10.instances_analysis()
-    LG10.calculate_reverse_table()
+    LG10.calculate_reverse_table(nearest_only=True)
     LG10.dump_sol_table()
 
     while True:
@@ -153,6 +157,7 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     console = Console()
     try:
         main()
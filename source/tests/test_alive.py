@@ -41,3 +41,15 @@ def test_alive():
     LG10.instances_analysis()
     LG10.calculate_reverse_table()
     # LG10.dump_sol_table()
+
+    # 預設每個起點記錄每個終點的距離，nearest_only 只記錄最近的終點
+    sol_table_dict = LG10.sol_table_dict
+    end_point_ids = set(next(iter(sol_table_dict[("none", "none")].values())))
+    LG10.calculate_reverse_table(nearest_only=True)
+    assert sol_table_dict.keys() == LG10.sol_table_dict.keys()
+    for instance, table in sol_table_dict.items():
+        assert table.keys() == LG10.sol_table_dict[instance].keys()
+        for start_point_id, end_point_distances in table.items():
+            nearest = LG10.sol_table_dict[instance][start_point_id]
+            assert end_point_distances.keys() == end_point_ids and len(nearest) == 1
+            assert min(end_point_distances.values()) == list(nearest.values())[0]
@@ -0,0 +1,897 @@
+import os
+import sys
+import inspect
+
+import numpy as np
+
+
+currentdir = os.path.dirname(os.path.abspath(
+    inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+
+_GBXML_FIXTURE = """<?xml version="1.0" encoding="UTF-8"?>
+<gbXML xmlns="http://www.gbxml.org/schema" version="0.37">
+<BasePoint><prjNS>12.5</prjNS><prjWE>-3.25</prjWE><angle>30.0</angle></BasePoint>
+<Campus id="c"><Building id="b">
+<Surface id="su0" surfaceType="ExteriorWall"><Name>s0</Name>
+<RectangularGeometry><CartesianPoint><Coordinate>9</Coordinate><Coordinate>9</Coordinate><Coordinate>9</Coordinate></CartesianPoint></RectangularGeometry>
+<PlanarGeometry><PolyLoop>
+<CartesianPoint><Coordinate>0.5</Coordinate><Coordinate>-6.25</Coordinate><Coordinate>90.0</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>20.75</Coordinate><Coordinate>5.125</Coordinate><Coordinate>90.0</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>20.75</Coordinate><Coordinate>5.125</Coordinate><Coordinate>93.0</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>0.5</Coordinate><Coordinate>-6.25</Coordinate><Coordinate>93.0</Coordinate></CartesianPoint>
+</PolyLoop></PlanarGeometry>
+<Opening id="op0" openingType="NonSlidingDoor"><PlanarGeometry><PolyLoop>
+<CartesianPoint><Coordinate>5</Coordinate><Coordinate>1</Coordinate><Coordinate>90.0</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>6</Coordinate><Coordinate>1</Coordinate><Coordinate>90.0</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>6</Coordinate><Coordinate>1</Coordinate><Coordinate>92.0</Coordinate></CartesianPoint>
+</PolyLoop></PlanarGeometry></Opening>
+</Surface>
+<Surface id="su1" surfaceType="Roof"><Name>s1</Name><PlanarGeometry><PolyLoop>
+<CartesianPoint><Coordinate>0</Coordinate><Coordinate>0</Coordinate><Coordinate>95.0</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>1</Coordinate><Coordinate>0</Coordinate><Coordinate>95.0</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>1</Coordinate><Coordinate>1</Coordinate><Coordinate>95.0</Coordinate></CartesianPoint>
+</PolyLoop></PlanarGeometry></Surface>
+<Surface id="su2" surfaceType="InteriorWall"><Name>s2</Name><PlanarGeometry><PolyLoop>
+<CartesianPoint><Coordinate>3</Coordinate><Coordinate>4</Coordinate><Coordinate>84.5</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>3</Coordinate><Coordinate>9</Coordinate><Coordinate>84.5</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>3</Coordinate><Coordinate>9</Coordinate><Coordinate>87.5</Coordinate></CartesianPoint>
+<CartesianPoint><Coordinate>3</Coordinate><Coordinate>4</Coordinate><Coordinate>87.5</Coordinate></CartesianPoint>
+</PolyLoop></PlanarGeometry></Surface>
+</Building></Campus>
+<SentPoint>
+<Element Level="B1" Category="樓梯" Name="S1" Id="ST01" IsEnd="否"><Coordinate>1.5</Coordinate><Coordinate>-3.25</Coordinate><Coordinate>90.0</Coordinate></Element>
+<Element Level="B1" Category="出口" Name="X1" Id="EX01" IsEnd="是"><Coordinate>16.0</Coordinate><Coordinate>10.5</Coordinate><Coordinate>90.0</Coordinate></Element>
+<Element Level="B2" Category="樓梯" Name="S1" Id="ST01" IsEnd="否"><Coordinate>1.5</Coordinate><Coordinate>-3.25</Coordinate><Coordinate>84.5</Coordinate></Element>
+</SentPoint>
+<PreventZones>
+<Area Level="B1" Id="PZ0A" Name="B1-A"><PolyLoop>
+<Curve><StartCoordinate>0.75</StartCoordinate><StartCoordinate>7.5</StartCoordinate><StartCoordinate>90.0</StartCoordinate><EndCoordinate>-5.75</EndCoordinate><EndCoordinate>3.5</EndCoordinate><EndCoordinate>91.0</EndCoordinate></Curve>
+<Curve><StartCoordinate>-5.75</StartCoordinate><StartCoordinate>3.5</StartCoordinate><StartCoordinate>90.0</StartCoordinate><EndCoordinate>0.75</EndCoordinate><EndCoordinate>7.5</EndCoordinate><EndCoordinate>90.0</EndCoordinate></Curve>
+</PolyLoop></Area>
+<Area Level="B2" Id="PZ1A" Name="B2-A"><PolyLoop>
+<Curve><StartCoordinate>1</StartCoordinate><StartCoordinate>2</StartCoordinate><StartCoordinate>84.5</StartCoordinate><EndCoordinate>3</EndCoordinate><EndCoordinate>4</EndCoordinate><EndCoordinate>84.5</EndCoordinate></Curve>
+</PolyLoop></Area>
+</PreventZones>
+</gbXML>
+"""
+
+
+def _gbxml_reference(path, accept_layers):
+    """以 BeautifulSoup 讀取（原本 Building.__load_contours 的寫法）。"""
+    from bs4 import BeautifulSoup
+
+    with open(path, "rb") as f:
+        soup = BeautifulSoup(f.read(), "xml")
+    base_point = soup.find("BasePoint")
+    surfaces = list()
+    for sf in soup.find_all("Surface"):
+        if sf.get("surfaceType") in accept_layers:
+            surfaces.append([
+                [float(p.find_all("Coordinate")[i].text) for i in range(3)]
+                for p in sf.find("PolyLoop").find_all("CartesianPoint")
+            ])
+    sent_points = [
+        (point["Level"], point["Category"], point["Name"], point["Id"], point["IsEnd"],
+         [float(c.text) for c in point.find_all("Coordinate")[:3]])
+        for point in soup.find("SentPoint").find_all("Element")
+    ]
+    prevent_zones = list()
+    for area in soup.find("PreventZones").find_all("Area"):
+        curves = list()
+        for curve in area.find("PolyLoop").find_all("Curve"):
+            start = [float(c.text) for c in curve.find_all("StartCoordinate")]
+            end = [float(c.text) for c in curve.find_all("EndCoordinate")]
+            curves.append([start, [end[0], end[1], start[2]]])
+        prevent_zones.append((area["Level"], area["Id"], area["Name"], curves))
+    return (
+        [float(base_point.find(name).text) for name in ("prjNS", "prjWE", "angle")],
+        surfaces, sent_points, prevent_zones)
+
+
+def test_gbxml_matches_beautifulsoup(tmp_path):
+    from util.gbxml import ExtendedGbXML
+    from util.geometry import ACCEPT_LAYERS
+
+    path = tmp_path / "station.xml"
+    path.write_text(_GBXML_FIXTURE, encoding="utf-8")
+    base_point, surfaces, sent_points, prevent_zones = _gbxml_reference(
+        str(path), ACCEPT_LAYERS)
+    # 開口（Opening）的 PolyLoop 與非牆面的 Surface 都不會被讀入
+    assert len(surfaces) == 2 and len(surfaces[0]) == 4
+
+    gbxml = ExtendedGbXML(str(path), accept_layers=ACCEPT_LAYERS)
+    assert [gbxml.prjNS, gbxml.prjWE, gbxml.angle] == base_point
+    assert gbxml.get_surface_count() == len(surfaces)
+    assert [gbxml.get_surface_vertices(k).tolist()
+            for k in range(gbxml.get_surface_count())] == surfaces
+    assert list(zip(
+        gbxml.sent_point_levels.tolist(), gbxml.sent_point_categories.tolist(),
+        gbxml.sent_point_names.tolist(), gbxml.sent_point_ids.tolist(),
+        gbxml.sent_point_is_ends.tolist(), gbxml.sent_point_coordinates.tolist()
+    )) == sent_points
+    assert list(zip(
+        gbxml.prevent_zone_levels.tolist(), gbxml.prevent_zone_ids.tolist(),
+        gbxml.prevent_zone_names.tolist(),
+        [gbxml.get_prevent_zone_curves(k).tolist() for k in range(len(gbxml.prevent_zone_ids))]
+    )) == prevent_zones
+
+
+def _slice_reference(surfaces, elevation):
+    """逐邊、逐高度切割（原本 Building.__load_contours 的寫法）。"""
+    lines = list()
+    for vertex_parsed in surfaces:
+        flag = False
+        start_point = None
+        vertex_parsed = np.vstack((vertex_parsed, vertex_parsed[0]))
+        for p1, p2 in zip(vertex_parsed[:-1], vertex_parsed[1:]):
+            p, t = p1, (p2 - p1)
+            for add_height in range(1, 20, 1):
+                z0 = elevation + add_height / 10.0
+                if (p1[2] > z0 and p2[2] < z0) or (p1[2] < z0 and p2[2] > z0):
+                    t_value = ((z0 - p[2]) / t[2]) if t[2] else 0
+                    if not flag:
+                        flag = True
+                        start_point = (p1 + t_value * t)
+                    else:
+                        flag = False
+                        end_point = (p1 + t_value * t)
+                        lines.append((start_point[0], start_point[1],
+                                      end_point[0], end_point[1]))
+                elif p[2] == z0 and t[2] == 0:
+                    lines.append((p1[0], p1[1], p2[0], p2[1]))
+    return lines
+
+
+def test_slice_surfaces_matches_reference():
+    from util.slicing import slice_surfaces
+
+    rng = np.random.default_rng(0)
+    elevation = 90.0
+    surfaces = [
+        # 垂直牆
+        np.array([[0, 0, 90], [5, 0, 90], [5, 0, 93], [0, 0, 93]], dtype=float),
+        # 剛好在切割平面上的水平面
+        np.array([[1, 1, 91], [2, 1, 91], [2, 2, 91], [1, 2, 91]], dtype=float),
+        # 其他樓層
+        np.array([[0, 0, 80], [5, 0, 80], [5, 0, 83], [0, 0, 83]], dtype=float),
+    ]
+    for _ in range(20):
+        n = rng.integers(3, 7)
+        surface = rng.uniform(0, 10, size=(n, 3))
+        surface[:, 2] = rng.uniform(89, 93, size=n)
+        surfaces.append(surface)
+
+    vertices = np.vstack(surfaces)
+    offsets = np.concatenate(([0], np.cumsum([len(s) for s in surfaces])))
+
+    segments = slice_surfaces(vertices, offsets, [elevation])[0]
+    expected = np.array(_slice_reference(surfaces, elevation))
+
+    assert segments.shape == expected.shape
+    assert np.array_equal(segments, expected)
+
+
+def test_merge_segments():
+    from util.segments import merge_segments
+
+    segments = np.array([
+        [0, 0, 2, 0],
+        [3, 0, 1, 0],   # 反向且與上一條重疊
+        [3, 0, 5, 0],   # 相接
+        [0, 0, 2, 0],   # 重複
+        [4, 4, 4, 4],   # 長度為零
+        [0, 1, 2, 1],   # 平行但不共線
+        [7, 0, 8, 0],   # 共線但不相接
+    ], dtype=float)
+    merged, removed = merge_segments(segments)
+
+    assert removed == 4
+    # 依原本的順序，方向與合併段中最早的線段相同
+    assert merged.tolist() == [[0, 0, 5, 0], [0, 1, 2, 1], [7, 0, 8, 0]]
+    reversed_merged, _ = merge_segments(segments[[1, 0, 2]])
+    assert reversed_merged.tolist() == [[5, 0, 0, 0]]
+
+
+def _contour_floor(segments):
+    from floor import Floor
+    from util.structure.contour import Contour
+    from util.structure.line import Line
+    from util.structure.transportation import Transportation
+
+    floor = Floor("F", 0.0, 0.5)
+    floor.add_contour(Contour([
+        Line((x1, y1), (x2, y2)) for x1, y1, x2, y2 in segments
+    ]))
+    floor.add_transportation(Transportation("T", "T1", "樓梯", (2.0, 1.0), "是"))
+    return floor
+
+
+def test_clean_contour_keeps_border(monkeypatch):
+    from floor import Floor
+    from util.segments import merge_segments
+
+    triangle = [[10.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 4.0], [0.0, 4.0, 10.0, 0.0]]
+    # 沒有可合併的線段時，順序與方向都不變
+    merged, removed = merge_segments(np.array(triangle))
+    assert removed == 0
+    assert merged.tolist() == triangle
+
+    # 反向重複的線段被合併後，x = 10 只剩下終點
+    duplicated = [[0.0, 0.0, 10.0, 0.0], [10.0, 0.0, 0.0, 0.0],
+                  [0.0, 0.0, 0.0, 4.0], [0.0, 4.0, 10.0, 0.0]]
+    merged, removed = merge_segments(np.array(duplicated))
+    assert removed == 1
+    assert max(merged[:, 0]) == 0.0
+
+    for segments in (triangle, duplicated):
+        cleaned = _contour_floor(segments)
+        cleaned.to_grid_graph(False)
+        with monkeypatch.context() as patch:
+            patch.setattr(Floor, "_Floor__clean_contour", lambda self: None)
+            raw = _contour_floor(segments)
+            raw.to_grid_graph(False)
+
+        assert cleaned._Floor__border == raw._Floor__border
+        assert cleaned._Floor__border["x_max"] == 10.0
+        assert len(cleaned.get_graph().get_vertex_ids()) == len(raw.get_graph().get_vertex_ids())
+
+
+def test_surface_z_index_matches_brute_force():
+    from util.slicing import SurfaceZIndex
+
+    rng = np.random.default_rng(1)
+    counts = rng.integers(3, 6, size=50)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    vertices = rng.uniform(0, 10, size=(offsets[-1], 3))
+    vertices[:, 2] = rng.uniform(0, 30, size=offsets[-1])
+
+    z_index = SurfaceZIndex(vertices, offsets, max_span=5.0)
+    for zlow in np.arange(0, 30, 0.7):
+        zhigh = zlow + 1.8
+        expected = [
+            i for i in range(len(counts))
+            if vertices[offsets[i]:offsets[i + 1], 2].min() <= zhigh
+            and vertices[offsets[i]:offsets[i + 1], 2].max() >= zlow
+        ]
+        assert z_index.query(zlow, zhigh).tolist() == expected
+
+
+def test_axis_obstacles_matches_linear_intersection():
+    from util.intersection import axis_obstacles, linear_arrays
+    from util.structure.linear import Linear
+
+    rng = np.random.default_rng(2)
+    walls = [Linear((0.0, 0.0), (10.0, 0.0)), Linear((3.0, -1.0), (3.0, 9.0))]
+    for _ in range(60):
+        x1, y1, x2, y2 = rng.uniform(0, 10, size=4).tolist()
+        walls.append(Linear((x1, y1), (x2, y2)))
+    wall_coefficients, wall_bounds = linear_arrays(walls)
+
+    xs = np.arange(-1, 11, 0.45)
+    ys = np.arange(-1, 11, 0.45)
+    for mode, positions in (("x", xs), ("y", ys)):
+        if mode == "x":
+            axes = [Linear((float(x), -1.0), (float(x), 11.0)) for x in positions]
+        else:
+            axes = [Linear((-1.0, float(y)), (11.0, float(y))) for y in positions]
+        axis_coefficients, _ = linear_arrays(axes)
+        obstacles = axis_obstacles(
+            axis_coefficients, positions, wall_coefficients, wall_bounds,
+            mode=mode, threshold=0.2)
+        for axis, result in zip(axes, obstacles):
+            expected = [axis.get_intersection(w, mode, 0.2) for w in walls]
+            expected = np.sort([e for e in expected if e is not None])
+            assert result.shape == expected.shape
+            assert np.allclose(result, expected, rtol=0, atol=1e-9)
+
+
+def _grid_adjacency_reference(floor):
+    """逐邊、逐障礙物判斷可通行（原本 Floor.__generate_grid_graph 的寫法）。"""
+    density = floor._Floor__density
+    border = floor._Floor__border
+    elevation = floor.get_elevation()
+    adj_dict = dict()
+    for i, vertical_to_x in enumerate(floor._Floor__vertical_to_xs):
+        x = float(-vertical_to_x.get_equation().get_coefficients()
+                  [2] / vertical_to_x.get_equation().get_coefficients()[0])
+        for j, vertical_to_y in enumerate(floor._Floor__vertical_to_ys):
+            y = float(-vertical_to_y.get_equation().get_coefficients()
+                      [2] / vertical_to_y.get_equation().get_coefficients()[1])
+            adj_list = list()
+            if y + density <= border["y_max"] and not any(
+                    y <= block <= y + density for block in vertical_to_x.get_obstacles()):
+                adj_list.append("{}_{}_{}".format(i, j + 1, elevation))
+            if y - density >= border["y_min"] and not any(
+                    y - density <= block <= y for block in vertical_to_x.get_obstacles()):
+                adj_list.append("{}_{}_{}".format(i, j - 1, elevation))
+            if x + density <= border["x_max"] and not any(
+                    x <= block <= x + density for block in vertical_to_y.get_obstacles()):
+                adj_list.append("{}_{}_{}".format(i + 1, j, elevation))
+            if x - density >= border["x_min"] and not any(
+                    x - density <= block <= x for block in vertical_to_y.get_obstacles()):
+                adj_list.append("{}_{}_{}".format(i - 1, j, elevation))
+            adj_dict["{}_{}_{}".format(i, j, elevation)] = adj_list
+    return adj_dict
+
+
+def test_grid_masks_match_per_edge_adjacency():
+    from floor import Floor
+    from util.structure.contour import Contour
+    from util.structure.line import Line
+    from util.structure.transportation import Transportation
+
+    rng = np.random.default_rng(4)
+    lines = [Line((0.0, 0.0), (10.0, 0.0)), Line((3.0, 0.0), (3.0, 8.0))]
+    for _ in range(30):
+        x1, y1, x2, y2 = rng.uniform(0, 10, size=4).tolist()
+        lines.append(Line((x1, y1), (x2, y2)))
+    floor = Floor("F", 0.0, 0.45)
+    floor.add_contour(Contour(lines))
+    floor.add_transportation(Transportation("T", "T1", "樓梯", (5.0, 5.0), "是"))
+    floor.to_grid_graph(False)
+
+    expected = _grid_adjacency_reference(floor)
+    adj_dict = floor.get_graph().get_adj_dict(gen_new=False)
+    grid_ids = set(expected)
+    assert grid_ids <= set(adj_dict)
+    # 確認有牆擋住的邊，也有可通行的邊
+    n_x, n_y = len(floor._Floor__vertical_to_xs), len(floor._Floor__vertical_to_ys)
+    assert 0 < sum(len(adj_list) for adj_list in expected.values()) < 2 * (2 * n_x * n_y - n_x - n_y)
+    for v_id, adj_list in expected.items():
+        assert [u_id for u_id in adj_dict[v_id] if u_id in grid_ids] == adj_list
+
+
+def _snap_reference(floor, xs, ys):
+    """逐格子檢查每個傳送點（原本 Floor.__generate_grid_graph 的寫法）：
+    傳送點在第一個包含它的格子之後加入，adjacency list 以最後一個包含它的格子為準。"""
+    density = floor._Floor__density
+    elevation = floor.get_elevation()
+    snapped = dict()
+    for i, x in enumerate(xs):
+        for j, y in enumerate(ys):
+            for transportation in floor.get_transportations():
+                tx, ty = transportation.get_coordinate()
+                if x <= tx and x + density >= tx and y <= ty and y + density >= ty:
+                    adj_list = [
+                        "{}_{}_{}".format(i_, j_, elevation)
+                        for i_ in [i, i + 1] for j_ in [j, j + 1]
+                    ]
+                    first_cell = snapped.get(transportation.get_id(), ((i, j), None))[0]
+                    snapped[transportation.get_id()] = (first_cell, adj_list)
+    return snapped
+
+
+def test_snap_transportations_matches_cell_scan():
+    from floor import Floor
+    from util.structure.contour import Contour
+    from util.structure.line import Line
+    from util.structure.transportation import Transportation
+
+    floor = Floor("F", 0.0, 0.45)
+    floor.add_contour(Contour([
+        Line((0.0, 0.0), (10.0, 0.0)), Line((10.0, 0.0), (10.0, 8.0)),
+        Line((10.0, 8.0), (0.0, 8.0)), Line((0.0, 8.0), (0.0, 0.0)),
+    ]))
+    floor.add_transportation(Transportation("T", "T1", "樓梯", (5.0, 5.0), "是"))
+    floor.to_grid_graph(False)
+
+    xs = np.array([
+        -axis.get_equation().get_coefficients()[2] / axis.get_equation().get_coefficients()[0]
+        for axis in floor._Floor__vertical_to_xs
+    ])
+    ys = np.array([
+        -axis.get_equation().get_coefficients()[2] / axis.get_equation().get_coefficients()[1]
+        for axis in floor._Floor__vertical_to_ys
+    ])
+    border = floor._Floor__border
+    rng = np.random.default_rng(5)
+    coordinates = [tuple(point) for point in rng.uniform((0, 0), (10, 8), size=(20, 2)).tolist()]
+    coordinates += [
+        (float(xs[3]), 2.3),                       # 在垂直 x 軸的格線上
+        (4.1, float(ys[7])),                       # 在垂直 y 軸的格線上
+        (float(xs[6]), float(ys[2])),              # 在格子點上
+        (border["x_min"], border["y_min"]),        # 邊界角落
+        (border["x_max"], 3.3),                    # 右邊界
+        (6.2, border["y_max"]),                    # 上邊界
+    ]
+    for k, coordinate in enumerate(coordinates):
+        floor.add_transportation(Transportation(
+            "S{}".format(k), "S{}".format(k), "樓梯", coordinate, "否"))
+
+    expected = _snap_reference(floor, xs.tolist(), ys.tolist())
+    snapped = dict()
+    for cell, transportations in floor._Floor__snap_transportations(xs, ys).items():
+        for transportation, adj_list in transportations:
+            snapped[transportation.get_id()] = (cell, adj_list)
+    assert snapped == expected
+
+
+def test_points_in_polygon_matches_scalar():
+    from util.raycasting import isPointinPolygon, points_in_polygon
+
+    polygon = np.array([[0, 0], [4, 0], [4, 2], [2, 2], [2, 4], [0, 4], [0, 0]], dtype=float)
+    grid = np.arange(-1, 5.5, 0.5)
+    points = np.array([(x, y) for x in grid for y in grid])
+    rng = np.random.default_rng(3)
+    points = np.vstack((points, rng.uniform(-1, 5, size=(200, 2))))
+
+    expected = [isPointinPolygon(list(p), polygon.tolist()) for p in points]
+    assert points_in_polygon(points, polygon).tolist() == expected
+
+
+def _dijkstra_reference(component, adj_dict, source_id):
+    """字串 id、binary heap 版本的最短路徑（原本 util.dijkstra.Dijkstra.run 的寫法）。
+
+    鬆弛時使用邊實際的權重（已計步家族的傳送點為 0），heap 中距離相同的點以放入順序為準。
+    """
+    import heapq
+
+    class DijkNode:
+        def __init__(self, idx, dis, order):
+            self.idx = idx
+            self.dis = dis
+            self.order = order
+
+        def __lt__(self, other):
+            return (self.dis, self.order) < (other.dis, other.order)
+
+    distance = dict((id_, np.inf) for id_ in adj_dict)
+    visited = dict((id_, False) for id_ in adj_dict)
+    parent = dict((id_, None) for id_ in adj_dict)
+    distance[source_id] = 0
+    parent[source_id] = source_id
+    h = [DijkNode(source_id, 0, 0)]
+    pushed = 1
+    save_sentpoint = []
+    for _ in range(len(component)):
+        id_ = None
+        while len(h):
+            id_ = h[0].idx
+            if visited[id_]:
+                heapq.heappop(h)
+            else:
+                break
+        if id_ == None:
+            break
+        visited[id_] = True
+        for node_id in adj_dict[id_]:
+            family = node_id.split('_')[0] if len(node_id.split('_')) == 2 else None
+            weight = 0 if family in save_sentpoint else 1
+            if not visited[node_id] and distance[id_] + weight < distance[node_id]:
+                if family is not None and weight == 1:
+                    save_sentpoint.append(family)
+                distance[node_id] = distance[id_] + weight
+                parent[node_id] = id_
+                heapq.heappush(h, DijkNode(node_id, distance[node_id], pushed))
+                pushed += 1
+    return {i: distance[i] for i in component}, {i: parent[i] for i in component}
+
+
+def _two_floor_graph():
+    from util.structure.graph import Graph
+    from util.structure.vertex import Vertex
+
+    graph = Graph()
+    for z in (0.0, 5.0):
+        for i in range(6):
+            for j in range(5):
+                adj = ["{}_{}_{}".format(i + di, j + dj, z)
+                       for di, dj in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                       if 0 <= i + di < 6 and 0 <= j + dj < 5]
+                if (i, j) == (5, 4):
+                    adj.append("ST01_{}".format(z))
+                graph.add_vertex(
+                    Vertex(float(i), float(j), z, "{}_{}_{}".format(i, j, z)), adj)
+        graph.add_vertex(Vertex(5.0, 4.0, z, "ST01_{}".format(z)),
+                         ["5_4_{}".format(z), "ST01_{}".format(5.0 - z)])
+    graph.add_vertex(Vertex(0.0, 0.0, 5.0, "EX01_5.0"), ["0_0_5.0"])
+    graph.add_vertex_to_adj_list_by_id("0_0_5.0", "EX01_5.0")
+    return graph
+
+
+def _chain_graph():
+    """三層樓的網格，ST01 與 ES01 以 connect_floors 的方式串成 <id>_0、<id>_1 鏈，
+    EL01 在同一層有兩個入口。"""
+    from util.structure.graph import Graph
+    from util.structure.vertex import Vertex
+
+    graph = Graph()
+    links = {
+        "ST01": {0.0: (4, 3), 5.0: (4, 3)},
+        "ES01": {5.0: (0, 0), 10.0: (1, 2)},
+    }
+    for z in (0.0, 5.0, 10.0):
+        for i in range(5):
+            for j in range(4):
+                adj = ["{}_{}_{}".format(i + di, j + dj, z)
+                       for di, dj in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                       if 0 <= i + di < 5 and 0 <= j + dj < 4]
+                graph.add_vertex(
+                    Vertex(float(i), float(j), z, "{}_{}_{}".format(i, j, z)), adj)
+
+    def attach(v_id, cell, z, adj):
+        grid_ids = ["{}_{}_{}".format(cell[0] + di, cell[1] + dj, z)
+                    for di in (0, 1) for dj in (0, 1)
+                    if cell[0] + di < 5 and cell[1] + dj < 4]
+        graph.add_vertex(Vertex(float(cell[0]), float(cell[1]), z, v_id), grid_ids + adj)
+        for grid_id in grid_ids:
+            graph.add_vertex_to_adj_list_by_id(grid_id, v_id)
+
+    for name, floors in links.items():
+        (low, low_cell), (high, high_cell) = sorted(floors.items())
+        attach("{}_{}".format(name, low), low_cell, low, ["{}_0".format(name)])
+        attach("{}_{}".format(name, high), high_cell, high, ["{}_1".format(name)])
+        graph.add_vertex(Vertex(float(low_cell[0]), float(low_cell[1]), low, "{}_0".format(name)),
+                         ["{}_{}".format(name, low), "{}_1".format(name)])
+        graph.add_vertex(Vertex(float(high_cell[0]), float(high_cell[1]), high, "{}_1".format(name)),
+                         ["{}_0".format(name), "{}_{}".format(name, high)])
+    attach("EL01_0.0", (0, 1), 0.0, ["EL01_9"])
+    attach("EL01_9", (3, 1), 0.0, ["EL01_0.0"])
+    return graph
+
+
+def _without_vertices(graph, failed):
+    """移除失效點與其所有邊後的新圖（原本 Graph.generate_instance 的結果）。"""
+    from util.structure.graph import Graph
+
+    instance = Graph()
+    for ID in graph.get_vertex_ids():
+        adj_list = list() if ID in failed else [
+            v_id for v_id in graph.get_adj_list_by_id(ID) if v_id not in failed]
+        instance.add_vertex(graph.get_vertex_by_id(ID), adj_list)
+    return instance
+
+
+def test_compact_graph_matches_string_graph():
+    from util.dijkstra import Dijkstra
+    from util.structure.compact_graph import CompactGraph
+
+    graph = _two_floor_graph()
+    compact = CompactGraph.from_graph(graph)
+    dijkstra = Dijkstra(compact)
+    source = compact.get_index("EX01_5.0")
+
+    for failed in ([], ["2_1_5.0", "2_2_5.0", "2_3_5.0"], ["ST01_5.0"], ["0_0_5.0"]):
+        instance = _without_vertices(graph, failed)
+        disabled = compact.disabled_bitset(failed)
+
+        expected_component = instance.calculate_connected_components("EX01_5.0")
+        component = compact.connected_component(source, disabled)
+        assert sorted(compact.get_ids_by_indices(component)) == sorted(expected_component)
+
+        expected = _dijkstra_reference(
+            expected_component, instance.get_adj_dict(gen_new=False), "EX01_5.0")
+        distance, parent = dijkstra.run(component, source, disabled)
+        vertex_ids = compact.get_ids_by_indices(component)
+        distance = dict(zip(vertex_ids, distance.tolist()))
+        parent = dict(zip(vertex_ids, compact.get_ids_by_indices(parent.tolist())))
+        assert distance == expected[0]
+        assert parent == expected[1]
+
+
+def test_solver_matches_heap_reference():
+    from util.dijkstra import Dijkstra
+    from util.structure.compact_graph import CompactGraph
+
+    graph = _chain_graph()
+    compact = CompactGraph.from_graph(graph)
+    dijkstra = Dijkstra(compact)
+    adj_dict = graph.get_adj_dict(gen_new=False)
+    all_ids = graph.get_vertex_ids()
+
+    for source_id in ("0_0_0.0", "2_1_0.0", "4_3_5.0", "3_3_10.0", "ST01_5.0", "EL01_9"):
+        expected_distance, expected_parent = _dijkstra_reference(all_ids, adj_dict, source_id)
+        component = compact.connected_component(compact.get_index(source_id))
+        distance, parent = dijkstra.run(component, compact.get_index(source_id))
+        vertex_ids = compact.get_ids_by_indices(component)
+        assert dict(zip(vertex_ids, distance.tolist())) == expected_distance
+        assert dict(zip(vertex_ids, compact.get_ids_by_indices(parent.tolist()))) == expected_parent
+
+        if source_id == "2_1_0.0":
+            # EL01 的兩個入口距離相同：EL01_0.0 先以 2 步計步，之後經由 EL01_9（權重 0）更新為 1 步
+            assert expected_distance["EL01_0.0"] == 1
+            assert expected_parent["EL01_0.0"] == "EL01_9"
+
+
+def test_read_only_accessors():
+    import pytest
+    from util.structure.axis import Axis
+    from util.structure.linear import Linear
+
+    axis = Axis(Linear((1.0, 0.0), (1.0, 5.0)))
+    axis.set_obstacles([3.0, 1.0])
+    obstacles = axis.get_obstacles()
+    assert obstacles is axis.get_obstacles()
+    with pytest.raises(ValueError):
+        obstacles[0] = 0.0
+
+    copied = axis.copy_obstacles()
+    copied[0] = 0.0
+    assert axis.get_obstacles().tolist() == [1.0, 3.0]
+
+    graph = _two_floor_graph()
+    assert graph.get_vertex_by_id("0_0_0.0") is graph.get_vertex_by_id("0_0_0.0")
+    adj = graph.copy_adj_list_by_id("0_0_0.0")
+    adj.append("EX01_5.0")
+    assert "EX01_5.0" not in graph.get_adj_list_by_id("0_0_0.0")
+    # 唯讀的 getter 回傳存放的物件本身，修改圖之後回傳新的物件
+    stored = graph.get_adj_list_by_id("0_0_0.0")
+    assert stored is graph.get_adj_list_by_id("0_0_0.0")
+    graph.add_vertex_to_adj_list_by_id("0_0_0.0", "EX01_5.0")
+    assert stored == tuple(adj[:-1])
+    assert graph.get_adj_list_by_id("0_0_0.0") == tuple(adj)
+    graph.set_adj_list_by_id("0_0_0.0", "EX01_5.0", "ST01_5.0")
+    assert graph.get_adj_list_by_id("0_0_0.0")[-1] == "ST01_5.0"
+
+    floor = _contour_floor([[0.0, 0.0, 10.0, 0.0], [10.0, 0.0, 0.0, 4.0]])
+    floor.to_grid_graph(False)
+    assert floor.get_transportations() is floor.get_transportations()
+    assert floor.get_equation() is floor.get_equation()
+    transportations = floor.copy_transportations()
+    transportations.pop()
+    assert len(floor.get_transportations()) == 1
+
+
+def test_multi_source_matches_nearest_single_source():
+    from util.dijkstra import Dijkstra
+    from util.structure.compact_graph import CompactGraph
+    from util.structure.vertex import Vertex
+
+    graph = _two_floor_graph()
+    graph.add_vertex(Vertex(5.0, 0.0, 0.0, "EX02_0.0"), ["5_0_0.0"])
+    graph.add_vertex_to_adj_list_by_id("5_0_0.0", "EX02_0.0")
+    compact = CompactGraph.from_graph(graph)
+    dijkstra = Dijkstra(compact)
+    sources = [compact.get_index("EX01_5.0"), compact.get_index("EX02_0.0")]
+
+    for failed in ([], ["ST01_0.0"], ["4_0_0.0", "4_1_0.0", "5_1_0.0"]):
+        disabled = compact.disabled_bitset(failed)
+        component = compact.component_members(compact.component_labels(disabled), sources)
+        distance, parent, label = dijkstra.run_multi_source(component, sources, disabled)
+
+        singles = list()
+        for source in sources:
+            single_component = compact.connected_component(source, disabled)
+            single_distance, _ = dijkstra.run(single_component, source, disabled)
+            singles.append(dict(zip(single_component, single_distance.tolist())))
+
+        assert set(component) == set().union(*singles)
+        for idx, d, p, l in zip(component, distance.tolist(), parent.tolist(), label.tolist()):
+            assert d == min(single.get(idx, np.inf) for single in singles)
+            assert singles[l][idx] == d
+            if p != idx:
+                assert label[component.index(p)] == l
+
+
+def test_unreached_vertices_are_not_reported():
+    from util.dijkstra import Dijkstra
+    from util.structure.compact_graph import CompactGraph
+
+    # 0 <-> 1，2 -> 1 單向：2 與 0 在同一分量，但從 0 走不到 2
+    compact = CompactGraph(["0", "1", "2"], [0, 1, 2, 3], [1, 0, 1], np.zeros((3, 3)))
+    component = compact.connected_component(0)
+    assert component == [0, 1, 2]
+
+    dijkstra = Dijkstra(compact)
+    for _ in range(2):
+        distance, parent = dijkstra.run(component, 0)
+        assert distance.tolist() == [0, 1, np.inf]
+        assert parent.tolist() == [0, 0, -1]
+
+        distance, parent, label = dijkstra.run_multi_source(component, [1])
+        assert distance.tolist() == [1, 0, np.inf]
+        assert parent.tolist() == [1, 1, -1]
+        assert label.tolist() == [0, 0, -1]
+
+
+def test_scenario_keeps_only_reached_vertices():
+    from util.dijkstra import Dijkstra
+    from util.scenario import solve_scenario
+    from util.structure.compact_graph import CompactGraph
+
+    # 0 <-> 1 <-> 2，3 -> 2 單向：無向標記時 3 在分量內，但從終點 0 走不到
+    compact = CompactGraph(
+        ["0", "1", "2", "3"], [0, 1, 3, 4, 5], [1, 0, 2, 1, 2], np.zeros((4, 3)))
+    assert compact.connected_component(0) == [0, 1, 2, 3]
+
+    dijkstra = Dijkstra(compact)
+    component, distance, parent, label = solve_scenario(dijkstra, [0])
+    assert component.tolist() == [0, 1, 2]
+    assert distance.tolist() == [0, 1, 2]
+    assert parent.tolist() == [0, 0, 1]
+    assert label.tolist() == [0, 0, 0]
+
+    component, distance, parent, label = solve_scenario(
+        dijkstra, [0], compact.disabled_bitset(["1"]))
+    assert component.tolist() == [0]
+
+
+def test_parallel_scenarios_match_serial():
+    from util.dijkstra import Dijkstra
+    from util.scenario import ScenarioSolver
+    from util.structure.compact_graph import CompactGraph
+
+    compact = CompactGraph.from_graph(_two_floor_graph())
+    sources = [compact.get_index("EX01_5.0")]
+    disabled_list = [None] + [compact.disabled_bitset(failed) for failed in (
+        ["ST01_0.0"], ["ST01_5.0"], ["4_0_0.0", "4_1_0.0", "5_1_0.0"])]
+
+    serial = ScenarioSolver(Dijkstra(compact), sources).solve(disabled_list)
+    parallel = ScenarioSolver(Dijkstra(compact), sources, workers=2).solve(disabled_list)
+    assert len(serial) == len(parallel) == len(disabled_list)
+    for expected, result in zip(serial, parallel):
+        for expected_array, array in zip(expected, result):
+            np.testing.assert_array_equal(expected_array, array)
+
+
+def test_duplicate_scenarios_solved_once():
+    from util.dijkstra import Dijkstra
+    from util.scenario import ScenarioSolver, plan_scenarios
+    from util.structure.compact_graph import CompactGraph
+
+    compact = CompactGraph.from_graph(_two_floor_graph())
+    disabled_list = [
+        None,
+        compact.disabled_bitset(["ST01_0.0", "4_0_0.0"]),
+        compact.disabled_bitset([]),
+        compact.disabled_bitset(["4_0_0.0", "ST01_0.0", "4_0_0.0"]),
+        compact.disabled_bitset(["ST01_5.0"]),
+    ]
+    unique_disabled, assignment = plan_scenarios(disabled_list)
+    assert len(unique_disabled) == 3
+    assert assignment == [0, 1, 0, 1, 2]
+
+    solver = ScenarioSolver(Dijkstra(compact), [compact.get_index("EX01_5.0")])
+    results = solver.solve(disabled_list)
+    assert solver.get_saved_solves() == 2
+    assert results[0] is results[2] and results[1] is results[3]
+    assert results[1] is not results[4]
+
+
+def test_solution_views_match_path_dicts():
+    import pickle
+    import pytest
+    from util.dijkstra import Dijkstra
+    from util.solution import PathArrays, Solution, VertexIndex
+    from util.structure.compact_graph import CompactGraph
+
+    compact = CompactGraph.from_graph(_two_floor_graph())
+    disabled = compact.disabled_bitset(["ST01_0.0"])
+    source = compact.get_index("EX01_5.0")
+    component = compact.connected_component(source, disabled)
+    distance, parent = Dijkstra(compact).run(component, source, disabled)
+    ids = compact.get_ids_by_indices(component)
+    expected_parent = dict(zip(ids, compact.get_ids_by_indices(parent.tolist())))
+    expected_distance = dict(zip(ids, distance.tolist()))
+
+    vertex_index = VertexIndex(compact.get_ids())
+    solution = Solution("", "")
+    solution.nearest = PathArrays.from_component(
+        vertex_index, component, distance, parent, [0] * len(component), ["EX01_5.0"])
+    keep = np.zeros(compact.get_vertex_count(), dtype=bool)
+    keep[source] = True
+    solution.shortest["EX01_5.0"] = solution.nearest.masked(keep)
+    solution = pickle.loads(pickle.dumps(solution))
+
+    parent_view, distance_view, end_point_view = solution.nearest_paths
+    assert dict(parent_view) == expected_parent
+    assert dict(distance_view) == expected_distance
+    assert list(distance_view) == ids
+    assert set(end_point_view.values()) == {"EX01_5.0"}
+    assert "ST01_0.0" not in distance_view and "ST01_0.0" in compact.get_ids()
+    with pytest.raises(KeyError):
+        distance_view["ST01_0.0"]
+
+    masked_parent, masked_distance = solution.shortest_paths["EX01_5.0"]
+    assert dict(masked_parent) == expected_parent
+    assert masked_distance["EX01_5.0"] == 0
+    assert all(masked_distance[ID] == np.inf for ID in ids if ID != "EX01_5.0")
+    assert solution.nearest.vertex_index is solution.shortest["EX01_5.0"].vertex_index
+
+
+def test_solution_store_round_trip(tmp_path):
+    from util.dijkstra import Dijkstra
+    from util.solution import PathArrays, Solution, VertexIndex
+    from util.solution_store import SolutionStore
+    from util.structure.compact_graph import CompactGraph
+
+    compact = CompactGraph.from_graph(_two_floor_graph())
+    vertex_index = VertexIndex(compact.get_ids())
+    dijkstra = Dijkstra(compact)
+    source = compact.get_index("EX01_5.0")
+    solutions = dict()
+    for instance_str, failed in (("none", []), ("A_ST01_0.0", ["ST01_0.0"]), ("B_ST01_0.0", ["ST01_0.0"])):
+        disabled = compact.disabled_bitset(failed)
+        component = compact.connected_component(source, disabled)
+        distance, parent = dijkstra.run(component, source, disabled)
+        solution = Solution(",".join(failed), instance_str[0])
+        solution.failed_vertex_ids = failed
+        if instance_str == "B_ST01_0.0":
+            solution.nearest = solutions["A_ST01_0.0"].nearest
+        else:
+            solution.nearest = PathArrays.from_component(
+                vertex_index, component, distance, parent, [0] * len(component), ["EX01_5.0"])
+        solutions[instance_str] = solution
+
+    store = SolutionStore.write(str(tmp_path / "key.solutions"), solutions, capacity=1)
+    assert SolutionStore.exists(str(tmp_path / "key.solutions"))
+    assert len(list(tmp_path.glob("key.solutions/*.npy"))) == 2
+    assert list(store) == list(solutions) and "none" in store
+    for instance_str, solution in solutions.items():
+        loaded = store[instance_str]
+        assert loaded.failed_block_id == solution.failed_block_id
+        assert loaded.failed_vertex_ids == solution.failed_vertex_ids
+        for view, expected in zip(loaded.nearest_paths, solution.nearest_paths):
+            assert dict(view) == dict(expected)
+    assert store["none"] is not store["A_ST01_0.0"]
+
+
+def test_solution_store_delta_against_baseline(tmp_path):
+    from util.dijkstra import Dijkstra
+    from util.solution import PathArrays, Solution, VertexIndex
+    from util.solution_store import SolutionStore
+    from util.structure.compact_graph import CompactGraph
+
+    compact = CompactGraph.from_graph(_two_floor_graph())
+    vertex_index = VertexIndex(compact.get_ids())
+    dijkstra = Dijkstra(compact)
+    sources = [compact.get_index("EX01_5.0")]
+    solutions = dict()
+    for instance_str, failed in (("none", []), ("A", ["4_0_0.0", "4_1_0.0"]), ("B", ["ST01_0.0"])):
+        disabled = compact.disabled_bitset(failed)
+        component = compact.component_members(compact.component_labels(disabled), sources)
+        distance, parent, label = dijkstra.run_multi_source(component, sources, disabled)
+        solution = Solution(",".join(failed), instance_str)
+        solution.nearest = PathArrays.from_component(
+            vertex_index, component, distance, parent, label, ["EX01_5.0"])
+        solutions[instance_str] = solution
+    keep = np.zeros(compact.get_vertex_count(), dtype=bool)
+    keep[:5] = True
+    solutions["inA"] = Solution("", "A")
+    solutions["inA"].nearest = solutions["A"].nearest.masked(keep)
+
+    store = SolutionStore.write(str(tmp_path / "key.solutions"), solutions, baseline="none")
+    assert sorted(path.name for path in tmp_path.glob("key.solutions/*.np*")) == \
+        ["0.npy", "1.npz", "2.npz", "3.npz"]
+    for instance_str, solution in solutions.items():
+        loaded = store[instance_str].nearest
+        np.testing.assert_array_equal(loaded.parent, solution.nearest.parent)
+        np.testing.assert_array_equal(loaded.distance, solution.nearest.distance)
+        np.testing.assert_array_equal(loaded.end_point, solution.nearest.end_point)
+
+
+def test_component_labels_match_traversal():
+    from util.structure.compact_graph import CompactGraph
+
+    rng = np.random.default_rng(5)
+    vertex_count = 300
+    edges = rng.integers(0, vertex_count, size=(260, 2))
+    adj_lists = [list() for _ in range(vertex_count)]
+    for u, v in edges.tolist():
+        adj_lists[u].append(v)
+        adj_lists[v].append(u)
+    offsets = np.concatenate(([0], np.cumsum([len(a) for a in adj_lists])))
+    neighbors = np.array([v for a in adj_lists for v in a])
+    compact = CompactGraph([str(i) for i in range(vertex_count)], offsets,
+                           neighbors, np.zeros((vertex_count, 3)))
+
+    for disabled in (None, rng.random(vertex_count) < 0.1, rng.random(vertex_count) < 0.3):
+        labels = compact.component_labels(
+            None if disabled is None else np.packbits(disabled, bitorder="little"))
+        for source in range(vertex_count):
+            # 逐點走訪得到的分量
+            visited = {source}
+            stack = [source]
+            while stack:
+                current = stack.pop()
+                if disabled is not None and disabled[current]:
+                    continue
+                for node in adj_lists[current]:
+                    if node not in visited and (disabled is None or not disabled[node]):
+                        visited.add(node)
+                        stack.append(node)
+            assert set(np.flatnonzero(labels == labels[source]).tolist()) == visited
+            assert labels[source] == min(visited)
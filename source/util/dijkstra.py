@@ -1,81 +1,184 @@
-import heapq
-
 import numpy as np
 
 
-class DijkNode:
-    """Maintain for future usage (maybe).
+class Dijkstra:
+    """在 CompactGraph 上以整數索引計算最短路徑。
+
+    網格上每條邊的權重都是 1，只有同一家族的傳送點（id 剛好有一個 '_'，
+    '_' 前的字串相同）在第一次進入時計一步、之後的權重為 0。
+    因此不需要 binary heap，改以兩個 FIFO 佇列分別存放目前距離與下一個距離的點：
+    權重 0 的點接在目前佇列的尾端，權重 1 的點放到下一個佇列。
+    點的取出順序與以 (距離, 放入順序) 為鍵的 heap 完全相同，
+    所以距離與父節點（距離相同時以先放入者為準）都與 heap 版本一致。
+
+    距離、父節點與造訪狀態預先配置成整張圖大小的陣列，並以世代編號（stamp）
+    判斷是否屬於本次計算，所以每次 run 不必重設整張圖，只花費實際走到的點。
+
+    Attributes:
+        __graph (source.util.structure.compact_graph.CompactGraph): 精簡圖
+        __offsets, __neighbors, __families ([int]): 圖的 CSR 陣列與傳送點家族編號
+        __distance ([int]): 各點距離，只有 __stamp 等於目前世代時有效
+        __parent ([int]): 各點父節點索引，只有 __stamp 等於目前世代時有效
+        __label ([int]): 各點最近源點的編號（多源點計算時使用），只有 __stamp 等於目前世代時有效
+        __stamp ([int]): 各點距離最後一次被設定的世代
+        __visited ([int]): 各點最後一次被造訪的世代
+        __generation (int): 目前世代
+
+    Args:
+        graph (source.util.structure.compact_graph.CompactGraph): 精簡圖
+
     """
 
-    def __init__(self, idx, dis):
-        self.idx = idx
-        self.dis = dis
+    def __init__(self, graph):
+        self.__graph = graph
+        vertex_count = graph.get_vertex_count()
+        self.__offsets = graph.get_offsets().tolist()
+        self.__neighbors = graph.get_neighbors().tolist()
+        self.__families = graph.get_families().tolist()
+        self.__distance = [0] * vertex_count
+        self.__parent = [0] * vertex_count
+        self.__label = [0] * vertex_count
+        self.__stamp = [0] * vertex_count
+        self.__visited = [0] * vertex_count
+        self.__generation = 0
+
+    def get_graph(self):
+        """取得計算用的精簡圖。
+
+        Returns:
+            source.util.structure.compact_graph.CompactGraph: 精簡圖
 
-    def __lt__(self, other):
-        """define the behaviour of pq.
         """
-        return self.dis < other.dis
+        return self.__graph
 
+    def run(self, connected_component, source, disabled=None):
+        """計算連通分量內每點到源點的最短距離。
 
-class Dijkstra:
-    def __init__(self, all_id):
-        self.__distance_template = dict((id_, np.inf) for id_ in all_id)
-        self.__visited_template = dict((id_, False) for id_ in all_id)
-        self.__parent_template = dict((id_, None) for id_ in all_id)
-
-    def __clear_prev_results(self):
-        for id_ in self.__distance_template:
-            self.__distance_template[id_] = np.inf
-        for id_ in self.__visited_template:
-            self.__visited_template[id_] = False
-        for id_ in self.__parent_template:
-            self.__parent_template[id_] = None
-
-    def run(self, connected_component_id, grid_graph, source_id):
-
-        self.__clear_prev_results()
-
-        self.__distance_template[source_id] = 0
-        self.__visited_template[source_id] = False
-        self.__parent_template[source_id] = source_id
-        h = []  # from document, do NOT modify
-        heapq.heappush(h, DijkNode(source_id, 0))
-        
-        save_sentpoint = [] # 傳送點只記錄一次
-        cc_length = len(connected_component_id)
-        for _ in range(cc_length):
-
-            id_ = None
-            while len(h):
-                id_ = h[0].idx
-                if self.__visited_template[id_]:
-                    heapq.heappop(h)
-                else:
-                    break
-
-            if id_ == None:
-                break
-            self.__visited_template[id_] = True
-
-            for node_id in grid_graph[id_]:
-                if self.__visited_template[node_id] == False and self.__distance_template[id_] + 1 < self.__distance_template[node_id]:
-                    if len(node_id.split('_')) == 2:
-                        if not node_id.split('_')[0] in save_sentpoint:
-                            self.__distance_template[node_id] = self.__distance_template[id_] + 1
-                            save_sentpoint.append(node_id.split('_')[0])
-                        else:
-                            self.__distance_template[node_id] = self.__distance_template[id_]
-                    else:
-                        self.__distance_template[node_id] = self.__distance_template[id_] + 1
-                    self.__parent_template[node_id] = id_
-                    heapq.heappush(h, DijkNode(
-                        node_id, self.__distance_template[node_id]))
-
-        distance_ret = dict()
-        for id_ in connected_component_id:
-            distance_ret[id_] = self.__distance_template[id_]
-        parent_ret = dict()
-        for id_ in connected_component_id:
-            parent_ret[id_] = self.__parent_template[id_]
-
-        return distance_ret, parent_ret
+        Args:
+            connected_component ([int]): 源點所在的連通分量（點索引）
+            source (int): 源點索引
+            disabled (np.ndarray): 停用點 bitset（CompactGraph.disabled_bitset），None 代表沒有失效點
+
+        Returns:
+            (np.ndarray, np.ndarray): 距離與父節點索引，順序與 connected_component 相同，
+                源點的父節點為自己；沒有走到的點距離為 inf、父節點為 -1
+
+        """
+        self.__search([source], disabled)
+        return self.__gather(self.__distance, connected_component, np.inf, np.float64), \
+            self.__gather(self.__parent, connected_component, -1, np.int64)
+
+    def run_multi_source(self, connected_component, sources, disabled=None):
+        """所有源點（例如所有終點）同時以距離 0 出發，一次算出每點最近的源點與距離。
+
+        傳送點家族的計步對每個源點分開記錄，與各源點分別執行 run 的規則相同。
+
+        Args:
+            connected_component ([int]): 所有源點可到達的點（點索引）
+            sources ([int]): 源點索引
+            disabled (np.ndarray): 停用點 bitset（CompactGraph.disabled_bitset），None 代表沒有失效點
+
+        Returns:
+            (np.ndarray, np.ndarray, np.ndarray): 距離、父節點索引與最近源點在 sources 中的位置，
+                順序與 connected_component 相同；沒有走到的點分別為 inf、-1、-1
+
+        """
+        self.__search(sources, disabled)
+        return self.__gather(self.__distance, connected_component, np.inf, np.float64), \
+            self.__gather(self.__parent, connected_component, -1, np.int64), \
+            self.__gather(self.__label, connected_component, -1, np.int64)
+
+    def __gather(self, values, indices, missing, dtype):
+        """取出 indices 對應的值，本次計算沒有走到的點（stamp 不是目前世代）填入 missing。
+
+        Args:
+            values ([int]): 整張圖大小的狀態陣列
+            indices ([int]): 點索引
+            missing (int | float): 沒有走到的點的值
+            dtype (np.dtype): 回傳陣列的型別
+
+        Returns:
+            np.ndarray: 對應的值
+
+        """
+        stamp = self.__stamp
+        generation = self.__generation
+        return np.fromiter(
+            (values[idx] if stamp[idx] == generation else missing for idx in indices),
+            dtype=dtype, count=len(indices))
+
+    def __search(self, sources, disabled):
+        """從所有源點同時出發，結果寫入 __distance、__parent 與 __label。
+
+        鬆弛時使用邊實際的權重（0 或 1）：已計步家族的傳送點，
+        即使先前以多一步的距離放入佇列，之後仍可以權重 0 的路徑更新。
+
+        Args:
+            sources ([int]): 源點索引
+            disabled (np.ndarray): 停用點 bitset（CompactGraph.disabled_bitset），None 代表沒有失效點
+
+        """
+        self.__generation += 1
+        generation = self.__generation
+        offsets = self.__offsets
+        neighbors = self.__neighbors
+        families = self.__families
+        distance = self.__distance
+        parent = self.__parent
+        label = self.__label
+        stamp = self.__stamp
+        visited = self.__visited
+        disabled = set(self.__graph.disabled_indices(disabled).tolist())
+        source_count = len(sources)
+
+        current = list()  # 距離為 dis 的點，依放入順序
+        for source_label, source in enumerate(sources):
+            if stamp[source] == generation:
+                continue
+            distance[source] = 0
+            parent[source] = source
+            label[source] = source_label
+            stamp[source] = generation
+            current.append(source)
+
+        save_sentpoint = set()  # 傳送點只記錄一次（每個源點分開記錄）
+        dis = 0
+        while current:
+            upcoming = list()  # 距離為 dis + 1 的點，依放入順序
+            position = 0
+            # 權重 0 的點會接在 current 尾端，所以迴圈中 current 會變長
+            while position < len(current):
+                idx = current[position]
+                position += 1
+                if visited[idx] == generation or distance[idx] != dis:
+                    # 已取出過，或之後以更短的距離重新放入（舊的項目作廢）
+                    continue
+                visited[idx] = generation
+                if idx in disabled:
+                    continue
+
+                idx_label = label[idx]
+                for k in range(offsets[idx], offsets[idx + 1]):
+                    node = neighbors[k]
+                    if visited[node] == generation or node in disabled:
+                        continue
+                    family = families[node]
+                    charged = family * source_count + idx_label
+                    if family >= 0 and charged in save_sentpoint:
+                        # 同一家族的傳送點已經計過一步，權重為 0
+                        if stamp[node] != generation or dis < distance[node]:
+                            stamp[node] = generation
+                            parent[node] = idx
+                            label[node] = idx_label
+                            distance[node] = dis
+                            current.append(node)
+                    elif stamp[node] != generation or dis + 1 < distance[node]:
+                        if family >= 0:
+                            save_sentpoint.add(charged)
+                        stamp[node] = generation
+                        parent[node] = idx
+                        label[node] = idx_label
+                        distance[node] = dis + 1
+                        upcoming.append(node)
+            current = upcoming
+            dis += 1
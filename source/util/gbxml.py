@@ -0,0 +1,291 @@
+import array
+import logging
+import numpy as np
+
+from xml.etree import ElementTree
+
+
+def _local_name(tag):
+    """去除 xml tag 的 namespace。
+
+    Args:
+        tag (str): e.g. "{http://www.gbxml.org/schema}Surface"
+
+    Returns:
+        str: e.g. "Surface"
+
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+def _find(element, name):
+    """尋找第一個名稱為 name 的子孫元素（忽略 namespace）。
+    """
+    for child in element.iter():
+        if child is not element and _local_name(child.tag) == name:
+            return child
+    return None
+
+
+def _find_all(element, name):
+    """尋找所有名稱為 name 的子孫元素（忽略 namespace）。
+    """
+    return [
+        child for child in element.iter()
+        if child is not element and _local_name(child.tag) == name
+    ]
+
+
+class ExtendedGbXML:
+    """以串流（iterparse）方式一次讀完 Extended gbXML，存成精簡的 NumPy 陣列。
+
+    不建立整份文件的搜索樹，每個 Surface、SentPoint、PreventZone 與 BasePoint
+    元素處理完就立即從樹上移除。
+
+    Attributes:
+        prjNS, prjWE, angle (float): BasePoint 位置資訊
+        surface_types (np.ndarray): 每個 Surface 的 surfaceType
+        surface_offsets (np.ndarray): 第 i 個 Surface 的頂點為
+            surface_vertices[surface_offsets[i]:surface_offsets[i + 1]]
+        surface_vertices (np.ndarray): 所有 Surface 的 PolyLoop 頂點，(N, 3)
+        sent_point_levels, sent_point_categories, sent_point_names,
+        sent_point_ids, sent_point_is_ends (np.ndarray): 傳送點屬性
+        sent_point_coordinates (np.ndarray): 傳送點座標，(M, 3)
+        prevent_zone_levels, prevent_zone_ids, prevent_zone_names (np.ndarray): 防煙區劃屬性
+        prevent_zone_offsets (np.ndarray): 第 i 個防煙區劃的邊界為
+            prevent_zone_curves[prevent_zone_offsets[i]:prevent_zone_offsets[i + 1]]
+        prevent_zone_curves (np.ndarray): 防煙區劃邊界的起終點，(K, 2, 3)
+
+    Args:
+        path (str): Extended gbXML 檔案路徑
+        accept_layers ([str]): 只保留這些 surfaceType 的 Surface，None 表示全部保留
+
+    """
+
+    def __init__(self, path, accept_layers=None):
+        """ExtendedGbXML 建構子。
+
+        Args:
+            path (str): Extended gbXML 檔案路徑
+            accept_layers ([str]): 只保留這些 surfaceType 的 Surface，None 表示全部保留
+
+        """
+        self.prjNS = None
+        self.prjWE = None
+        self.angle = None
+
+        self.__accept_layers = None if accept_layers is None else set(accept_layers)
+
+        self.__surface_types = list()
+        self.__surface_offsets = array.array('q', [0])
+        self.__surface_vertices = array.array('d')
+
+        self.__sent_point_attrs = list()
+        self.__sent_point_coordinates = array.array('d')
+
+        self.__prevent_zone_attrs = list()
+        self.__prevent_zone_offsets = array.array('q', [0])
+        self.__prevent_zone_curves = array.array('d')
+
+        self.__parse(path)
+        self.__to_arrays()
+
+    def __parse(self, path):
+        """逐一讀取元素並解析。
+
+        只有正在解析的元素（Surface、SentPoint 的 Element、PreventZones 的 Area、
+        BasePoint）會暫時保留子樹，其餘元素讀完即丟棄。
+
+        Args:
+            path (str): Extended gbXML 檔案路徑
+
+        Raises:
+            ValueError: 如果找不到 BasePoint
+
+        """
+        stack = list()
+        capture_depth = None
+        sent_point_depth = None
+        prevent_zones_depth = None
+        sent_point_done = False
+        prevent_zones_done = False
+        base_point_done = False
+
+        with open(path, "rb") as f:
+            for event, element in ElementTree.iterparse(f, events=("start", "end")):
+                name = _local_name(element.tag)
+
+                if event == "start":
+                    stack.append(element)
+                    if capture_depth is not None:
+                        continue
+                    if name == "Surface" or \
+                            (name == "Element" and sent_point_depth is not None) or \
+                            (name == "Area" and prevent_zones_depth is not None) or \
+                            (name == "BasePoint" and not base_point_done):
+                        capture_depth = len(stack)
+                    elif name == "SentPoint" and not sent_point_done and sent_point_depth is None:
+                        sent_point_depth = len(stack)
+                    elif name == "PreventZones" and not prevent_zones_done and prevent_zones_depth is None:
+                        prevent_zones_depth = len(stack)
+                    continue
+
+                if capture_depth is not None and len(stack) > capture_depth:
+                    # 子元素留給正在解析的元素使用
+                    stack.pop()
+                    continue
+
+                if capture_depth == len(stack):
+                    capture_depth = None
+                    if name == "Surface":
+                        self.__add_surface(element)
+                    elif name == "Element":
+                        self.__add_sent_point(element)
+                    elif name == "Area":
+                        self.__add_prevent_zone(element)
+                    else:
+                        self.prjNS = float(_find(element, "prjNS").text)
+                        self.prjWE = float(_find(element, "prjWE").text)
+                        self.angle = float(_find(element, "angle").text)
+                        base_point_done = True
+                elif name == "SentPoint" and sent_point_depth == len(stack):
+                    sent_point_depth = None
+                    sent_point_done = True
+                elif name == "PreventZones" and prevent_zones_depth == len(stack):
+                    prevent_zones_depth = None
+                    prevent_zones_done = True
+
+                # 讀完即丟棄，避免整份文件留在記憶體中
+                stack.pop()
+                element.clear()
+                if stack:
+                    stack[-1].remove(element)
+
+        if not base_point_done:
+            logging.critical("gbXML 中找不到 BasePoint")
+            raise ValueError("gbXML 中找不到 BasePoint")
+
+    def __add_surface(self, element):
+        """加入一個 Surface。
+        """
+        type_ = element.get("surfaceType")
+        if self.__accept_layers is not None and type_ not in self.__accept_layers:
+            return
+        poly_loop = _find(element, "PolyLoop")
+        if poly_loop is None:
+            return
+        for point in _find_all(poly_loop, "CartesianPoint"):
+            coordinates = _find_all(point, "Coordinate")
+            self.__surface_vertices.extend(
+                float(coordinates[i].text) for i in range(3))
+        self.__surface_types.append(type_)
+        self.__surface_offsets.append(len(self.__surface_vertices) // 3)
+
+    def __add_sent_point(self, element):
+        """加入一個傳送點。
+        """
+        coordinates = _find_all(element, "Coordinate")
+        self.__sent_point_coordinates.extend(
+            float(coordinates[i].text) for i in range(3))
+        self.__sent_point_attrs.append((
+            element.get("Level"),
+            element.get("Category"),
+            element.get("Name"),
+            element.get("Id"),
+            element.get("IsEnd")
+        ))
+
+    def __add_prevent_zone(self, element):
+        """加入一個防煙區劃。
+        """
+        poly_loop = _find(element, "PolyLoop")
+        curves = _find_all(poly_loop, "Curve") if poly_loop is not None else list()
+        for curve in curves:
+            start_coordinate = _find_all(curve, "StartCoordinate")
+            end_coordinate = _find_all(curve, "EndCoordinate")
+            self.__prevent_zone_curves.extend((
+                float(start_coordinate[0].text),
+                float(start_coordinate[1].text),
+                float(start_coordinate[2].text),
+                float(end_coordinate[0].text),
+                float(end_coordinate[1].text),
+                # 終點高程沿用起點高程
+                float(start_coordinate[2].text)
+            ))
+        self.__prevent_zone_attrs.append((
+            element.get("Level"),
+            element.get("Id"),
+            element.get("Name")
+        ))
+        self.__prevent_zone_offsets.append(len(self.__prevent_zone_curves) // 6)
+
+    def __to_arrays(self):
+        """將暫存的資料轉成 NumPy 陣列。
+        """
+        def columns(rows, width):
+            if len(rows) == 0:
+                return [np.array(list(), dtype=str) for _ in range(width)]
+            return [np.array(column, dtype=str) for column in zip(*rows)]
+
+        self.surface_types = np.array(self.__surface_types, dtype=str)
+        self.surface_offsets = np.frombuffer(
+            self.__surface_offsets, dtype=np.int64).copy()
+        self.surface_vertices = np.frombuffer(
+            self.__surface_vertices, dtype=np.float64).reshape(-1, 3).copy()
+
+        (
+            self.sent_point_levels,
+            self.sent_point_categories,
+            self.sent_point_names,
+            self.sent_point_ids,
+            self.sent_point_is_ends
+        ) = columns(self.__sent_point_attrs, 5)
+        self.sent_point_coordinates = np.frombuffer(
+            self.__sent_point_coordinates, dtype=np.float64).reshape(-1, 3).copy()
+
+        (
+            self.prevent_zone_levels,
+            self.prevent_zone_ids,
+            self.prevent_zone_names
+        ) = columns(self.__prevent_zone_attrs, 3)
+        self.prevent_zone_offsets = np.frombuffer(
+            self.__prevent_zone_offsets, dtype=np.int64).copy()
+        self.prevent_zone_curves = np.frombuffer(
+            self.__prevent_zone_curves, dtype=np.float64).reshape(-1, 2, 3).copy()
+
+        del self.__surface_types, self.__surface_offsets, self.__surface_vertices
+        del self.__sent_point_attrs, self.__sent_point_coordinates
+        del self.__prevent_zone_attrs, self.__prevent_zone_offsets, self.__prevent_zone_curves
+
+    def get_surface_count(self):
+        """取得 Surface 數量。
+
+        Returns:
+            int: Surface 數量
+
+        """
+        return len(self.surface_types)
+
+    def get_surface_vertices(self, idx):
+        """取得第 idx 個 Surface 的頂點。
+
+        Args:
+            idx (int): Surface 索引
+
+        Returns:
+            np.ndarray: 頂點座標，(n, 3)
+
+        """
+        return self.surface_vertices[self.surface_offsets[idx]:self.surface_offsets[idx + 1]]
+
+    def get_prevent_zone_curves(self, idx):
+        """取得第 idx 個防煙區劃的邊界。
+
+        Args:
+            idx (int): 防煙區劃索引
+
+        Returns:
+            np.ndarray: 邊界起終點座標，(n, 2, 3)
+
+        """
+        return self.prevent_zone_curves[self.prevent_zone_offsets[idx]:self.prevent_zone_offsets[idx + 1]]
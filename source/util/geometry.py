@@ -0,0 +1,249 @@
+import hashlib
+import logging
+import numpy as np
+
+from util.gbxml import ExtendedGbXML
+from util.slicing import slice_surfaces
+from util.transform import BasePointTransform
+
+
+# 只有這些 surfaceType 會被當成輪廓
+ACCEPT_LAYERS = ["ExteriorWall", "InteriorWall", "Shade",
+                 "UndergroundWall", "UndergroundSlab"]
+
+# 樓層高程取到小數點後第幾位
+ELEVATIONS_ACCURACY = 4
+
+
+class StationGeometry:
+    """解析、轉換、切割完成的車站幾何資料（與 density 無關），以欄位式陣列存放。
+
+    可以存成不需要 pickle 的 .npz 檔，之後不論 density 為何，
+    都可以直接從檔案建立樓層，不必再讀 gbXML。
+
+    Attributes:
+        prjNS, prjWE, angle (float): BasePoint 位置資訊
+        floor_names (np.ndarray): 樓層名稱，(F,)
+        floor_elevations (np.ndarray): 樓層高程，(F,)
+        floor_fingerprints (np.ndarray): 各樓層內容（牆線段、傳送點、防煙區劃）的 md5，(F,)
+        wall_offsets (np.ndarray): 第 i 層的牆線段為 wall_segments[wall_offsets[i]:wall_offsets[i + 1]]
+        wall_segments (np.ndarray): 各樓層切出的牆線段 [x1, y1, x2, y2]，(K, 4)
+        sent_point_levels, sent_point_categories, sent_point_names,
+        sent_point_ids, sent_point_is_ends (np.ndarray): 傳送點屬性，(M,)
+        sent_point_coordinates (np.ndarray): 轉換後的傳送點座標，(M, 2)
+        prevent_zone_levels, prevent_zone_ids, prevent_zone_names (np.ndarray): 防煙區劃屬性，(Z,)
+        prevent_zone_offsets (np.ndarray): 第 i 個防煙區劃的邊界為
+            prevent_zone_lines[prevent_zone_offsets[i]:prevent_zone_offsets[i + 1]]
+        prevent_zone_lines (np.ndarray): 轉換後的防煙區劃邊界 [x1, y1, x2, y2]，(L, 4)
+
+    """
+
+    FIELDS = [
+        "prjNS", "prjWE", "angle",
+        "floor_names", "floor_elevations", "floor_fingerprints",
+        "wall_offsets", "wall_segments",
+        "sent_point_levels", "sent_point_categories", "sent_point_names",
+        "sent_point_ids", "sent_point_is_ends", "sent_point_coordinates",
+        "prevent_zone_levels", "prevent_zone_ids", "prevent_zone_names",
+        "prevent_zone_offsets", "prevent_zone_lines",
+    ]
+
+    @classmethod
+    def from_gbxml(cls, contours_path):
+        """讀取 Extended gbXML，轉換座標並切出各樓層的牆線段。
+
+        Args:
+            contours_path (str): 建物輪廓相對路徑
+
+        Returns:
+            StationGeometry: 車站幾何資料
+
+        """
+        logging.info("以串流方式讀取 gbXML 檔案 ...")
+        gbxml = ExtendedGbXML(contours_path, accept_layers=ACCEPT_LAYERS)
+        transform = BasePointTransform(gbxml.prjNS, gbxml.prjWE, gbxml.angle)
+
+        geometry = cls()
+        geometry.prjNS = gbxml.prjNS
+        geometry.prjWE = gbxml.prjWE
+        geometry.angle = gbxml.angle
+
+        # We need stable-unique so this magic operation is neccessary
+        floor_names = gbxml.sent_point_levels
+        geometry.floor_names = floor_names[sorted(
+            np.unique(floor_names, return_index=True)[1]
+        )]
+        floor_elevations = np.round(
+            gbxml.sent_point_coordinates[:, 2],
+            ELEVATIONS_ACCURACY + 1
+        )
+        floor_elevations = floor_elevations[sorted(
+            np.unique(floor_elevations, return_index=True)[1]
+        )]
+        # 與原本 zip(floor_names, floor_elevations) 的行為一致
+        n_floors = min(len(geometry.floor_names), len(floor_elevations))
+        geometry.floor_names = geometry.floor_names[:n_floors]
+        geometry.floor_elevations = floor_elevations[:n_floors]
+
+        # 所有座標各只轉換一次
+        surface_vertices = transform.apply(gbxml.surface_vertices)
+        wall_segments = slice_surfaces(
+            surface_vertices, gbxml.surface_offsets,
+            [float(elevation) for elevation in geometry.floor_elevations])
+        geometry.wall_offsets = np.concatenate((
+            [0], np.cumsum([len(s) for s in wall_segments], dtype=np.int64)
+        )).astype(np.int64)
+        geometry.wall_segments = np.vstack(
+            wall_segments + [np.zeros((0, 4))]).astype(np.float64)
+
+        geometry.sent_point_levels = gbxml.sent_point_levels
+        geometry.sent_point_categories = gbxml.sent_point_categories
+        geometry.sent_point_names = gbxml.sent_point_names
+        geometry.sent_point_ids = gbxml.sent_point_ids
+        geometry.sent_point_is_ends = gbxml.sent_point_is_ends
+        geometry.sent_point_coordinates = transform.apply(
+            gbxml.sent_point_coordinates)[:, :2]
+
+        geometry.prevent_zone_levels = gbxml.prevent_zone_levels
+        geometry.prevent_zone_ids = gbxml.prevent_zone_ids
+        geometry.prevent_zone_names = gbxml.prevent_zone_names
+        geometry.prevent_zone_offsets = gbxml.prevent_zone_offsets
+        geometry.prevent_zone_lines = transform.apply(
+            gbxml.prevent_zone_curves)[:, :, :2].reshape(-1, 4)
+
+        geometry.floor_fingerprints = np.array([
+            geometry.__floor_fingerprint(floor_idx)
+            for floor_idx in range(n_floors)
+        ], dtype=str)
+
+        return geometry
+
+    def __floor_fingerprint(self, floor_idx):
+        """計算某樓層內容的 md5，只包含屬於該樓層的牆線段、傳送點與防煙區劃。
+
+        Args:
+            floor_idx (int): 樓層索引
+
+        Returns:
+            str: md5 hex digest
+
+        """
+        name = str(self.floor_names[floor_idx])
+        md5 = hashlib.md5()
+        md5.update(name.encode("utf-8"))
+        md5.update(repr(float(self.floor_elevations[floor_idx])).encode("utf-8"))
+        md5.update(np.ascontiguousarray(
+            self.get_wall_segments(floor_idx), dtype=np.float64).tobytes())
+
+        for sp_idx in self.get_sent_point_indices(name):
+            md5.update("\0".join((
+                str(self.sent_point_names[sp_idx]),
+                str(self.sent_point_ids[sp_idx]),
+                str(self.sent_point_categories[sp_idx]),
+                str(self.sent_point_is_ends[sp_idx]),
+            )).encode("utf-8"))
+            md5.update(np.ascontiguousarray(
+                self.sent_point_coordinates[sp_idx], dtype=np.float64).tobytes())
+
+        for pz_idx in self.get_prevent_zone_indices(name):
+            md5.update("\0".join((
+                str(self.prevent_zone_ids[pz_idx]),
+                str(self.prevent_zone_names[pz_idx]),
+            )).encode("utf-8"))
+            md5.update(np.ascontiguousarray(
+                self.get_prevent_zone_lines(pz_idx), dtype=np.float64).tobytes())
+
+        return md5.hexdigest()
+
+    @classmethod
+    def load(cls, path):
+        """從 .npz 檔讀取車站幾何資料。
+
+        Args:
+            path (str): .npz 檔路徑
+
+        Returns:
+            StationGeometry: 車站幾何資料
+
+        Raises:
+            ValueError: 如果檔案缺少欄位
+
+        """
+        geometry = cls()
+        with np.load(path, allow_pickle=False) as data:
+            missing = [field for field in cls.FIELDS if field not in data.files]
+            if missing:
+                raise ValueError("幾何快取缺少欄位：{}".format(missing))
+            for field in cls.FIELDS:
+                setattr(geometry, field, data[field])
+        geometry.prjNS = float(geometry.prjNS)
+        geometry.prjWE = float(geometry.prjWE)
+        geometry.angle = float(geometry.angle)
+        return geometry
+
+    def save(self, path):
+        """存成 .npz 檔（不壓縮、不使用 pickle）。
+
+        Args:
+            path (str): .npz 檔路徑
+
+        """
+        with open(path, "wb") as f:
+            np.savez(f, **{field: getattr(self, field) for field in self.FIELDS})
+
+    def get_floor_count(self):
+        """取得樓層數量。
+
+        Returns:
+            int: 樓層數量
+
+        """
+        return len(self.floor_names)
+
+    def get_wall_segments(self, floor_idx):
+        """取得第 floor_idx 層的牆線段。
+
+        Args:
+            floor_idx (int): 樓層索引
+
+        Returns:
+            np.ndarray: 牆線段 [x1, y1, x2, y2]，(k, 4)
+
+        """
+        return self.wall_segments[self.wall_offsets[floor_idx]:self.wall_offsets[floor_idx + 1]]
+
+    def get_sent_point_indices(self, floor_name):
+        """取得某樓層的傳送點索引。
+
+        Args:
+            floor_name (str): 樓層名稱
+
+        Returns:
+            np.ndarray: 傳送點索引
+
+        """
+        return np.flatnonzero(self.sent_point_levels == floor_name)
+
+    def get_prevent_zone_indices(self, floor_name):
+        """取得某樓層的防煙區劃索引。
+
+        Args:
+            floor_name (str): 樓層名稱
+
+        Returns:
+            np.ndarray: 防煙區劃索引
+
+        """
+        return np.flatnonzero(self.prevent_zone_levels == floor_name)
+
+    def get_prevent_zone_lines(self, idx):
+        """取得第 idx 個防煙區劃的邊界。
+
+        Args:
+            idx (int): 防煙區劃索引
+
+        Returns:
+            np.ndarray: 邊界 [x1, y1, x2, y2]，(n, 4)
+
+        """
+        return self.prevent_zone_lines[self.prevent_zone_offsets[idx]:self.prevent_zone_offsets[idx + 1]]
@@ -0,0 +1,125 @@
+import numpy as np
+
+
+# 以軸的位置預先篩選候選線段時額外放寬的範圍，避免浮點誤差漏掉交點
+_SEARCH_SLACK = 1e-9
+
+
+def linear_arrays(linears):
+    """將 Linear 列表轉成係數與外框陣列。
+
+    Args:
+        linears ([Linear]): 線性函數列表
+
+    Returns:
+        (np.ndarray, np.ndarray): 係數 [a, b, c]，(N, 3)；
+            線段外框 [x_min, x_max, y_min, y_max]，(N, 4)
+
+    """
+    coefficients = np.array(
+        [linear.get_coefficients() for linear in linears],
+        dtype=np.float64).reshape(-1, 3)
+    points = np.array(
+        [linear.get_start_point() + linear.get_end_point() for linear in linears],
+        dtype=np.float64).reshape(-1, 4)
+    bounds = np.column_stack((
+        np.minimum(points[:, 0], points[:, 2]),
+        np.maximum(points[:, 0], points[:, 2]),
+        np.minimum(points[:, 1], points[:, 3]),
+        np.maximum(points[:, 1], points[:, 3]),
+    ))
+    return coefficients, bounds
+
+
+def axis_obstacles(axis_coefficients, axis_positions, wall_coefficients, wall_bounds, mode, threshold=0):
+    """一次計算所有與座標軸平行的網格軸線和所有牆線段的交點（封閉解）。
+
+    與 Linear.get_intersection 的判斷相同：兩線不平行，且交點落在牆線段外框
+    （上下左右各放寬 threshold）內，就算是一個障礙點。每條牆線段只會和位置落在
+    其外框範圍內的軸線配對，所以計算量和交點數量成正比，而不是軸線數 × 線段數。
+
+    Args:
+        axis_coefficients (np.ndarray): 軸線係數 [a, b, c]，(A, 3)
+        axis_positions (np.ndarray): 軸線位置（mode 'x' 為 x 座標、'y' 為 y 座標），需遞增，(A,)
+        wall_coefficients (np.ndarray): 牆線段係數 [a, b, c]，(W, 3)
+        wall_bounds (np.ndarray): 牆線段外框 [x_min, x_max, y_min, y_max]，(W, 4)
+        mode (str): 軸線為垂直'x'軸或垂直'y'軸
+        threshold (float): 容忍值
+
+    Returns:
+        [np.ndarray]: 每條軸線上的障礙點座標（mode 'x' 為 y 座標、'y' 為 x 座標），已排序
+
+    Raises:
+        ValueError: 如果mode為'x', 'y'以外的值或容忍值小於零
+
+    """
+    if mode != 'x' and mode != 'y':
+        raise ValueError("mode 不為'x'或'y'")
+    elif threshold < 0:
+        raise ValueError("threshold 小於 0")
+
+    axis_positions = np.asarray(axis_positions, dtype=np.float64)
+    n_axes = len(axis_positions)
+    if n_axes == 0:
+        return list()
+
+    # 每條牆線段配對的軸線範圍 [lo, hi)
+    if mode == 'x':
+        low, high = wall_bounds[:, 0], wall_bounds[:, 1]
+    else:
+        low, high = wall_bounds[:, 2], wall_bounds[:, 3]
+    lo = np.searchsorted(
+        axis_positions, low - threshold - _SEARCH_SLACK, side="left")
+    hi = np.searchsorted(
+        axis_positions, high + threshold + _SEARCH_SLACK, side="right")
+    counts = np.maximum(hi - lo, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return [np.zeros(0) for _ in range(n_axes)]
+
+    wall_idx = np.repeat(np.arange(len(counts)), counts)
+    axis_idx = np.arange(total) + np.repeat(lo - (np.cumsum(counts) - counts), counts)
+
+    a1, b1, c1 = axis_coefficients[axis_idx].T
+    a2, b2, c2 = wall_coefficients[wall_idx].T
+    det = a1 * b2 - b1 * a2
+    # 平行（無解）的配對不算交點
+    parallel = det == 0
+    det = np.where(parallel, 1.0, det)
+    x = (b1 * c2 - c1 * b2) / det
+    y = (a2 * c1 - a1 * c2) / det
+
+    bounds = wall_bounds[wall_idx]
+    hit = ~parallel & \
+        (x <= bounds[:, 1] + threshold) & (x >= bounds[:, 0] - threshold) & \
+        (y <= bounds[:, 3] + threshold) & (y >= bounds[:, 2] - threshold)
+
+    axis_idx = axis_idx[hit]
+    values = (y if mode == 'x' else x)[hit]
+    order = np.lexsort((values, axis_idx))
+    axis_idx, values = axis_idx[order], values[order]
+    splits = np.searchsorted(axis_idx, np.arange(1, n_axes))
+    return np.split(values, splits)
+
+
+def blocked_intervals(obstacles, starts, ends):
+    """判斷每條軸線上的每段區間 [starts[k], ends[k]] 是否有障礙點（含端點）。
+
+    Args:
+        obstacles ([np.ndarray]): 每條軸線上已排序的障礙點座標，長度 A
+        starts (np.ndarray): 區間起點，(N,)
+        ends (np.ndarray): 區間終點，(N,)
+
+    Returns:
+        np.ndarray: blocked[a, k] 為第 a 條軸線的第 k 段區間內是否有障礙點，(A, N)
+
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    blocked = np.zeros((len(obstacles), len(starts)), dtype=bool)
+    for a, axis_obstacle in enumerate(obstacles):
+        if len(axis_obstacle) == 0:
+            continue
+        blocked[a] = np.searchsorted(axis_obstacle, ends, side="right") > \
+            np.searchsorted(axis_obstacle, starts, side="left")
+    return blocked
@@ -1,3 +1,10 @@
+import numpy as np
+
+
+# points_in_polygon 每批暫存陣列的元素數量上限
+_PIP_CHUNK_ELEMENTS = 1 << 20
+
+
 def isPointinPolygon(point, rangelist):  # [[0,0],[1,1],[0,1],[0,0]] [1,0.8]
     lnglist = []
     latlist = []
@@ -23,3 +30,66 @@ def isPointinPolygon(point, rangelist):  # [[0,0],[1,1],[0,1],[0,0]] [1,0.8]
         return False
     else:
         return True
+
+
+def points_in_polygon(points, polygon):
+    """isPointinPolygon 的向量化版本：一次判斷多個點是否在多邊形內。
+
+    判斷規則與 isPointinPolygon 完全相同（點剛好在多邊形頂點或邊上視為不在內部），
+    多邊形外框之外的點直接略過。
+
+    Args:
+        points (np.ndarray): 點座標 [x, y]，(N, 2)
+        polygon (np.ndarray): 多邊形頂點（頭尾相接），(M, 2)
+
+    Returns:
+        np.ndarray: 每個點是否在多邊形內，(N,)
+
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    inside = np.zeros(len(points), dtype=bool)
+    if len(polygon) < 2 or len(points) == 0:
+        return inside
+
+    # 外框篩選
+    candidates = np.flatnonzero(
+        (points[:, 0] <= polygon[:, 0].max()) & (points[:, 0] >= polygon[:, 0].min()) &
+        (points[:, 1] <= polygon[:, 1].max()) & (points[:, 1] >= polygon[:, 1].min()))
+
+    x1, y1 = polygon[:-1, 0], polygon[:-1, 1]
+    x2, y2 = polygon[1:, 0], polygon[1:, 1]
+    # 分批計算，避免 (點數 × 邊數) 的暫存陣列過大
+    chunk = max(1, _PIP_CHUNK_ELEMENTS // len(x1))
+    for begin in range(0, len(candidates), chunk):
+        idx = candidates[begin:begin + chunk]
+        px = points[idx, 0, None]
+        py = points[idx, 1, None]
+
+        on_vertex = ((px == x1) & (py == y1)) | ((px == x2) & (py == y2))
+        crossing = ((y1 < py) & (y2 >= py)) | ((y1 >= py) & (y2 < py))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lng = x2 - (y2 - py) * (x2 - x1) / (y2 - y1)
+        on_edge = crossing & (lng == px)
+        count = np.count_nonzero(crossing & (lng < px), axis=1)
+
+        inside[idx] = ~on_vertex.any(axis=1) & ~on_edge.any(axis=1) & (count % 2 == 1)
+    return inside
+
+
+def label_points(points, polygons):
+    """一次標記所有點落在哪些多邊形內。
+
+    Args:
+        points (np.ndarray): 點座標 [x, y]，(N, 2)
+        polygons ([np.ndarray]): 多邊形頂點（頭尾相接），每個 (M, 2)
+
+    Returns:
+        np.ndarray: labels[z, n] 為第 n 個點是否在第 z 個多邊形內，(Z, N)
+
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    labels = np.zeros((len(polygons), len(points)), dtype=bool)
+    for z, polygon in enumerate(polygons):
+        labels[z] = points_in_polygon(points, polygon)
+    return labels
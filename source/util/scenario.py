@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from util.dijkstra import Dijkstra
+
+
+# worker process 內共用的最短路徑物件與源點（由 _init_worker 設定）
+_worker_dijkstra = None
+_worker_sources = None
+
+
+def scenario_fingerprint(disabled):
+    """計算停用點集合的指紋，停用點相同的情境指紋相同。
+
+    bitset 與失效點 id 的列出順序、重複無關，本身就是集合的標準形式。
+
+    Args:
+        disabled (np.ndarray): 停用點 bitset（CompactGraph.disabled_bitset），None 代表沒有失效點
+
+    Returns:
+        str: 停用點集合的指紋
+
+    """
+    if disabled is None or not disabled.any():
+        return "none"
+    return hashlib.sha1(np.ascontiguousarray(disabled).tobytes()).hexdigest()
+
+
+def plan_scenarios(disabled_list):
+    """將停用點集合相同的情境合併，每個不同的集合只需計算一次。
+
+    Args:
+        disabled_list ([np.ndarray]): 每個情境的停用點 bitset，None 代表沒有失效點
+
+    Returns:
+        ([np.ndarray], [int]): 不重複的停用點 bitset（依第一次出現的順序），
+            以及每個情境對應到的不重複集合位置
+
+    """
+    unique_disabled = list()
+    assignment = list()
+    positions = dict()
+    for disabled in disabled_list:
+        fingerprint = scenario_fingerprint(disabled)
+        if fingerprint not in positions:
+            positions[fingerprint] = len(unique_disabled)
+            unique_disabled.append(disabled)
+        assignment.append(positions[fingerprint])
+    return unique_disabled, assignment
+
+
+def solve_scenario(dijkstra, sources, disabled=None):
+    """計算單一情境：所有源點同時出發，求每點最近的源點與距離。
+
+    Args:
+        dijkstra (Dijkstra): 最短路徑計算物件
+        sources ([int]): 源點（終點）索引
+        disabled (np.ndarray): 停用點 bitset（CompactGraph.disabled_bitset），None 代表沒有失效點
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray, np.ndarray): 所有源點可到達的點索引，
+            以及對應的距離、父節點索引與最近源點在 sources 中的位置
+
+    """
+    graph = dijkstra.get_graph()
+    # 每個情境只標記一次連通分量（只重算包含失效點的分量）
+    labels = graph.component_labels(disabled)
+    component = graph.component_members(labels, sources)
+    distance, parent, label = dijkstra.run_multi_source(
+        component, sources, disabled)
+    # 分量以無向邊標記，單向邊可能讓分量包含走不到的點，只保留實際走到的點
+    reached = parent >= 0
+    component = np.array(component, dtype=np.int64)[reached]
+    return component, distance[reached], parent[reached], label[reached]
+
+
+def _init_worker(graph, sources):
+    """worker process 初始化：每個 process 建立自己的 Dijkstra（狀態陣列不共用）。
+
+    Args:
+        graph (CompactGraph): 唯讀的精簡圖
+        sources ([int]): 源點索引
+
+    """
+    global _worker_dijkstra, _worker_sources
+    _worker_dijkstra = Dijkstra(graph)
+    _worker_sources = sources
+
+
+def _solve_in_worker(disabled):
+    """在 worker process 中計算單一情境（供 ProcessPoolExecutor.map 使用）。
+
+    Args:
+        disabled (np.ndarray): 停用點 bitset，None 代表沒有失效點
+
+    Returns:
+        tuple: 同 solve_scenario
+
+    """
+    return solve_scenario(_worker_dijkstra, _worker_sources, disabled)
+
+
+class ScenarioSolver:
+    """批次計算多個情境的最短路徑，workers > 1 時以多個 process 平行計算。
+
+    停用點集合相同的情境只計算一次（見 plan_scenarios），共用同一個結果。
+
+    情境只以停用點 bitset 表示，精簡圖本身唯讀：支援 fork 的平台上 worker 直接
+    繼承父 process 的圖（不需序列化），其餘平台在每個 worker 啟動時傳送一次。
+    結果依輸入順序回傳，與逐一計算的結果完全相同。
+
+    Attributes:
+        __dijkstra (Dijkstra): 在本 process 計算時使用的最短路徑物件
+        __sources ([int]): 源點索引
+        __workers (int): 使用的 process 數量
+        __saved_solves (int): 上一次 solve 因失效點集合重複而省下的計算次數
+
+    Args:
+        dijkstra (Dijkstra): 最短路徑計算物件（其精簡圖會給所有 worker 共用）
+        sources ([int]): 源點索引
+        workers (int): 使用的 process 數量，1 表示不開新的 process
+
+    """
+
+    def __init__(self, dijkstra, sources, workers=1):
+        self.__dijkstra = dijkstra
+        self.__sources = list(sources)
+        self.__workers = max(1, int(workers))
+        self.__saved_solves = 0
+
+    def solve(self, disabled_list):
+        """計算所有情境。
+
+        Args:
+            disabled_list ([np.ndarray]): 每個情境的停用點 bitset，None 代表沒有失效點
+
+        Returns:
+            [tuple]: 每個情境的結果（見 solve_scenario），順序與 disabled_list 相同；
+                失效點集合相同的情境是同一個物件
+
+        """
+        disabled_list = list(disabled_list)
+        unique_disabled, assignment = plan_scenarios(disabled_list)
+        self.__saved_solves = len(disabled_list) - len(unique_disabled)
+        if self.__saved_solves:
+            logging.info("{} 個情境中只有 {} 種不同的失效點集合，省下 {} 次計算".format(
+                len(disabled_list), len(unique_disabled), self.__saved_solves))
+
+        results = self.__solve_unique(unique_disabled)
+        return [results[position] for position in assignment]
+
+    def get_saved_solves(self):
+        """取得上一次 solve 因失效點集合重複而省下的計算次數。
+
+        Returns:
+            int: 省下的計算次數
+
+        """
+        return self.__saved_solves
+
+    def __solve_unique(self, disabled_list):
+        """計算停用點集合互不相同的情境。
+
+        Args:
+            disabled_list ([np.ndarray]): 每個情境的停用點 bitset，None 代表沒有失效點
+
+        Returns:
+            [tuple]: 每個情境的結果（見 solve_scenario），順序與 disabled_list 相同
+
+        """
+        workers = min(self.__workers, len(disabled_list))
+        if workers <= 1:
+            return [solve_scenario(self.__dijkstra, self.__sources, disabled)
+                    for disabled in disabled_list]
+
+        graph = self.__dijkstra.get_graph()
+        # 先算好整張圖的連通分量編號，worker 繼承後不必各自重算
+        graph.component_labels()
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        # 每個 worker 一次取一批情境，減少 process 間往返
+        chunksize = max(1, len(disabled_list) // (workers * 4))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(graph, self.__sources)
+        ) as executor:
+            return list(executor.map(
+                _solve_in_worker, disabled_list, chunksize=chunksize))
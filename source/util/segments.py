@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def merge_segments(segments, tolerance=1e-6, angle_tolerance=1e-6):
+    """清理線段：去除長度為零的線段，並合併共線且重疊（或相接）的線段。
+
+    線段的方向與位置先對齊到容忍值的格子上，方向與位置相同的線段視為共線；
+    共線的線段再依投影位置合併。合併後的端點一律取自原本的端點，不會改動座標；
+    輸出的順序與方向跟著原本的線段（合併的線段以其中最早的一條為準），
+    沒有合併的線段與輸入完全相同。
+
+    Args:
+        segments (np.ndarray): 線段 [x1, y1, x2, y2]，(N, 4)
+        tolerance (float): 距離容忍值（公尺）
+        angle_tolerance (float): 方向容忍值（弧度）
+
+    Returns:
+        (np.ndarray, int): 清理後的線段 (M, 4) 與被移除的線段數量 N - M
+
+    """
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    n_segments = len(segments)
+
+    dx = segments[:, 2] - segments[:, 0]
+    dy = segments[:, 3] - segments[:, 1]
+    length = np.hypot(dx, dy)
+    segments = segments[length > tolerance]
+    dx, dy, length = dx[length > tolerance], dy[length > tolerance], length[length > tolerance]
+    if len(segments) == 0:
+        return segments, n_segments
+
+    # 方向統一為 (-pi/2, pi/2]
+    flip = (dx < 0) | ((dx == 0) & (dy < 0))
+    ux = np.where(flip, -dx, dx) / length
+    uy = np.where(flip, -dy, dy) / length
+    theta = np.arctan2(uy, ux)
+    rho = ux * segments[:, 1] - uy * segments[:, 0]
+
+    keys = np.column_stack((
+        np.round(theta / angle_tolerance),
+        np.round(rho / tolerance)
+    ))
+    _, group_first, group = np.unique(
+        keys, axis=0, return_inverse=True, return_index=True)
+    group = group.reshape(-1)
+
+    # 以同一組第一條線段的方向做投影
+    gx = ux[group_first][group]
+    gy = uy[group_first][group]
+    t1 = gx * segments[:, 0] + gy * segments[:, 1]
+    t2 = gx * segments[:, 2] + gy * segments[:, 3]
+    swap = t2 < t1
+    lo = np.where(swap, t2, t1)
+    hi = np.where(swap, t1, t2)
+    lo_points = np.where(swap[:, None], segments[:, 2:], segments[:, :2])
+    hi_points = np.where(swap[:, None], segments[:, :2], segments[:, 2:])
+
+    order = np.lexsort((lo, group))
+    runs = list()  # (最早的原始線段, 低端點, 高端點)
+    current_group = None
+    for idx in order:
+        if group[idx] == current_group and lo[idx] <= current_hi + tolerance:
+            current_first = min(current_first, idx)
+            if hi[idx] > current_hi:
+                current_hi = hi[idx]
+                current_end = hi_points[idx]
+            continue
+        if current_group is not None:
+            runs.append((current_first, current_start, current_end))
+        current_group = group[idx]
+        current_first = idx
+        current_hi = hi[idx]
+        current_start = lo_points[idx]
+        current_end = hi_points[idx]
+    runs.append((current_first, current_start, current_end))
+
+    # 依原本的順序輸出，方向與該段最早的原始線段相同；沒有合併的線段維持原樣
+    merged = list()
+    for first, start, end in sorted(runs, key=lambda run: run[0]):
+        if swap[first]:
+            start, end = end, start
+        merged.append((start[0], start[1], end[0], end[1]))
+
+    merged = np.array(merged, dtype=np.float64).reshape(-1, 4)
+    return merged, n_segments - len(merged)
@@ -0,0 +1,206 @@
+import logging
+import numpy as np
+
+
+# 切割平面相對於樓層高程的高度（0.1m ~ 1.9m）
+ADD_HEIGHTS = np.arange(1, 20, 1) / 10.0
+
+
+def surface_edges(vertices, offsets):
+    """將所有 Surface 的 PolyLoop 展開成邊（最後一點會接回第一點）。
+
+    Args:
+        vertices (np.ndarray): 所有 Surface 的頂點，(N, 3)
+        offsets (np.ndarray): 第 i 個 Surface 的頂點為 vertices[offsets[i]:offsets[i + 1]]
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray): 邊的起點 (E, 3)、終點 (E, 3) 與所屬 Surface 索引 (E,)
+
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    counts = np.diff(offsets)
+    surface_index = np.repeat(np.arange(len(counts)), counts)
+
+    start_idx = np.arange(len(vertices))
+    end_idx = start_idx + 1
+    # 每個 Surface 的最後一個點接回第一個點
+    last = offsets[1:][counts > 0] - 1
+    end_idx[last] = offsets[:-1][counts > 0]
+
+    return vertices[start_idx], vertices[end_idx], surface_index
+
+
+def surface_edge_indices(offsets, surfaces):
+    """取得指定 Surface 的所有邊的索引（邊與頂點一一對應，見 surface_edges）。
+
+    Args:
+        offsets (np.ndarray): 第 i 個 Surface 的頂點為 vertices[offsets[i]:offsets[i + 1]]
+        surfaces (np.ndarray): Surface 索引（需遞增）
+
+    Returns:
+        np.ndarray: 邊的索引，依 Surface 排序
+
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    surfaces = np.asarray(surfaces, dtype=np.int64)
+    starts = offsets[surfaces]
+    counts = offsets[surfaces + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    # 每段 range(start, start + count) 串接起來
+    shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return np.arange(total, dtype=np.int64) + shift
+
+
+class SurfaceZIndex:
+    """Surface 高程範圍（zmin, zmax）的區間索引，用來找出會被某段高程切到的 Surface。
+
+    高度不超過 max_span 的 Surface 依 zmin 排序，查詢時以二分搜尋只取出 zmin 落在
+    [zlow - max_span, zhigh] 的候選；少數特別高的 Surface 則另外存放、每次直接檢查。
+
+    Attributes:
+        zmin (np.ndarray): 每個 Surface 的最低高程
+        zmax (np.ndarray): 每個 Surface 的最高高程
+
+    Args:
+        vertices (np.ndarray): 所有 Surface 的頂點，(N, 3)
+        offsets (np.ndarray): 第 i 個 Surface 的頂點為 vertices[offsets[i]:offsets[i + 1]]
+        max_span (float): 以二分搜尋處理的 Surface 最大高度（公尺）
+
+    """
+
+    def __init__(self, vertices, offsets, max_span=10.0):
+        """SurfaceZIndex 建構子。
+
+        Args:
+            vertices (np.ndarray): 所有 Surface 的頂點，(N, 3)
+            offsets (np.ndarray): 第 i 個 Surface 的頂點為 vertices[offsets[i]:offsets[i + 1]]
+            max_span (float): 以二分搜尋處理的 Surface 最大高度（公尺）
+
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        counts = np.diff(offsets)
+        n_surfaces = len(counts)
+
+        self.zmin = np.full(n_surfaces, np.inf)
+        self.zmax = np.full(n_surfaces, -np.inf)
+        non_empty = counts > 0
+        if non_empty.any():
+            z = vertices[:, 2]
+            starts = offsets[:-1][non_empty]
+            self.zmin[non_empty] = np.minimum.reduceat(z, starts)
+            self.zmax[non_empty] = np.maximum.reduceat(z, starts)
+
+        self.__max_span = max_span
+        span = self.zmax - self.zmin
+        short = np.flatnonzero(non_empty & (span <= max_span))
+        order = np.argsort(self.zmin[short], kind="stable")
+        self.__short = short[order]
+        self.__short_zmin = self.zmin[self.__short]
+        self.__long = np.flatnonzero(non_empty & (span > max_span))
+
+    def query(self, zlow, zhigh):
+        """找出高程範圍與 [zlow, zhigh] 重疊的 Surface。
+
+        Args:
+            zlow (float): 最低高程
+            zhigh (float): 最高高程
+
+        Returns:
+            np.ndarray: Surface 索引（遞增）
+
+        """
+        begin = np.searchsorted(self.__short_zmin, zlow - self.__max_span, side="left")
+        end = np.searchsorted(self.__short_zmin, zhigh, side="right")
+        candidates = np.concatenate((self.__short[begin:end], self.__long))
+        candidates = candidates[
+            (self.zmin[candidates] <= zhigh) & (self.zmax[candidates] >= zlow)]
+        return np.sort(candidates)
+
+
+def slice_edges(p1, p2, surface_index, elevation, add_heights=ADD_HEIGHTS):
+    """用數個水平面（elevation + add_heights）一次切割所有邊，回傳切出的線段。
+
+    同一個 Surface 中的交點依（邊, 高度）的順序兩兩配對成一條線段；
+    剛好躺在切割平面上的水平邊則整條當成線段。
+
+    Args:
+        p1 (np.ndarray): 邊的起點，(E, 3)
+        p2 (np.ndarray): 邊的終點，(E, 3)
+        surface_index (np.ndarray): 邊所屬 Surface 索引（需依 Surface 排序），(E,)
+        elevation (float): 樓層高程
+        add_heights (np.ndarray): 切割平面相對於樓層高程的高度
+
+    Returns:
+        np.ndarray: 線段 [x1, y1, x2, y2]，(K, 4)
+
+    """
+    n_heights = len(add_heights)
+    z0 = elevation + add_heights
+    t = p2 - p1
+
+    z1 = p1[:, 2, None]
+    z2 = p2[:, 2, None]
+    crossing = ((z1 > z0) & (z2 < z0)) | ((z1 < z0) & (z2 > z0))
+    flat = (z1 == z0) & (t[:, 2, None] == 0)
+
+    # 交點，依（邊, 高度）排序
+    edge_idx, height_idx = np.nonzero(crossing)
+    t_value = (z0[height_idx] - p1[edge_idx, 2]) / t[edge_idx, 2]
+    xs = p1[edge_idx, 0] + t_value * t[edge_idx, 0]
+    ys = p1[edge_idx, 1] + t_value * t[edge_idx, 1]
+
+    # 同一個 Surface 內的第幾個交點，偶數為起點、奇數為終點
+    surface_of = surface_index[edge_idx]
+    is_first = np.ones(len(surface_of), dtype=bool)
+    is_first[1:] = surface_of[1:] != surface_of[:-1]
+    group_start = np.maximum.accumulate(
+        np.where(is_first, np.arange(len(surface_of)), 0))
+    rank = np.arange(len(surface_of)) - group_start
+    ends = np.flatnonzero(rank % 2 == 1)
+
+    crossing_segments = np.column_stack(
+        (xs[ends - 1], ys[ends - 1], xs[ends], ys[ends]))
+    crossing_keys = edge_idx[ends] * n_heights + height_idx[ends]
+
+    flat_edge_idx, flat_height_idx = np.nonzero(flat)
+    flat_segments = np.column_stack((
+        p1[flat_edge_idx, 0], p1[flat_edge_idx, 1],
+        p2[flat_edge_idx, 0], p2[flat_edge_idx, 1]
+    ))
+    flat_keys = flat_edge_idx * n_heights + flat_height_idx
+
+    # 依原本逐邊、逐高度的順序輸出
+    segments = np.vstack((crossing_segments, flat_segments))
+    keys = np.concatenate((crossing_keys, flat_keys))
+    return segments[np.argsort(keys, kind="stable")]
+
+
+def slice_surfaces(vertices, offsets, elevations, add_heights=ADD_HEIGHTS):
+    """以各樓層的切割平面切割所有 Surface。
+
+    依 Surface 的高程範圍建立索引，每層只切割跨過切割平面的 Surface。
+
+    Args:
+        vertices (np.ndarray): 所有 Surface 的頂點，(N, 3)
+        offsets (np.ndarray): 第 i 個 Surface 的頂點為 vertices[offsets[i]:offsets[i + 1]]
+        elevations ([float]): 各樓層高程
+        add_heights (np.ndarray): 切割平面相對於樓層高程的高度
+
+    Returns:
+        [np.ndarray]: 每個樓層切出的線段 [x1, y1, x2, y2]，(K, 4)
+
+    """
+    p1, p2, surface_index = surface_edges(vertices, offsets)
+    z_index = SurfaceZIndex(vertices, offsets)
+    segments = list()
+    for elevation in elevations:
+        z0 = elevation + add_heights
+        surfaces = z_index.query(z0.min(), z0.max())
+        logging.info("高程 {} 切割 {} / {} 個 Surface".format(
+            elevation, len(surfaces), len(offsets) - 1))
+        edges = surface_edge_indices(offsets, surfaces)
+        segments.append(slice_edges(
+            p1[edges], p2[edges], surface_index[edges], elevation, add_heights))
+    return segments
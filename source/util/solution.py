@@ -1,14 +1,221 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class VertexIndex:
+    """所有解答共用的點索引（索引 -> 點 id），與 CompactGraph 的索引相同。
+
+    同一次分析的所有 PathArrays 共用同一個 VertexIndex，序列化時只存一份 id 列表；
+    id -> 索引的字典不序列化，第一次查詢時重建。
+
+    Attributes:
+        __ids ([str]): 索引 -> 點 id
+        __index ({int}): 點 id -> 索引，第一次使用時建立
+
+    Args:
+        ids ([str]): 索引 -> 點 id
+
+    """
+
+    def __init__(self, ids):
+        self.__ids = list(ids)
+        self.__index = None
+
+    def __getstate__(self):
+        return {"ids": self.__ids}
+
+    def __setstate__(self, state):
+        self.__ids = state["ids"]
+        self.__index = None
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def get_ids(self):
+        """取得所有點 id（依索引排列）。
+
+        Returns:
+            [str]: 所有點 id
+        """
+        return self.__ids
+
+    def find(self, ID):
+        """利用 id 取得點的索引。
+
+        Args:
+            ID (str): 點 id
+
+        Returns:
+            int: 點的索引，找不到時為 -1
+
+        """
+        if self.__index is None:
+            self.__index = {v_id: idx for idx, v_id in enumerate(self.__ids)}
+        return self.__index.get(ID, -1)
+
+
+class PathArrays:
+    """一組最短路徑結果，以點索引對齊的陣列儲存。
+
+    Attributes:
+        vertex_index (VertexIndex): 共用的點索引
+        parent (np.ndarray): 父節點索引，無法到達的點為 -1，int32，(V,)
+        distance (np.ndarray): 距離（步數），float32，(V,)；被遮罩的起點為 inf
+        end_point (np.ndarray): 最近終點在 end_point_ids 中的位置，int16，(V,)；單一終點時為 None
+        end_point_ids ([str]): 終點 id
+
+    Args:
+        vertex_index (VertexIndex): 共用的點索引
+        parent (np.ndarray): 父節點索引，(V,)
+        distance (np.ndarray): 距離，(V,)
+        end_point (np.ndarray): 最近終點的位置，(V,)
+        end_point_ids ([str]): 終點 id
+
+    """
+
+    def __init__(self, vertex_index, parent, distance, end_point=None, end_point_ids=None):
+        self.vertex_index = vertex_index
+        self.parent = np.asarray(parent, dtype=np.int32)
+        self.distance = np.asarray(distance, dtype=np.float32)
+        self.end_point = None if end_point is None else np.asarray(
+            end_point, dtype=np.int16)
+        self.end_point_ids = end_point_ids
+
+    @classmethod
+    def from_component(cls, vertex_index, connected_component, distance, parent,
+                       end_point=None, end_point_ids=None):
+        """由 Dijkstra 在連通分量上的結果建立。
+
+        Args:
+            vertex_index (VertexIndex): 共用的點索引
+            connected_component ([int]): 連通分量的點索引
+            distance (np.ndarray): 距離，順序與 connected_component 相同
+            parent (np.ndarray): 父節點索引，順序與 connected_component 相同
+            end_point (np.ndarray): 最近終點的位置，順序與 connected_component 相同
+            end_point_ids ([str]): 終點 id
+
+        Returns:
+            PathArrays: 路徑結果
+
+        """
+        vertex_count = len(vertex_index)
+        full_parent = np.full(vertex_count, -1, dtype=np.int32)
+        full_distance = np.full(vertex_count, np.inf, dtype=np.float32)
+        full_parent[connected_component] = parent
+        full_distance[connected_component] = distance
+        full_end_point = None
+        if end_point is not None:
+            full_end_point = np.full(vertex_count, -1, dtype=np.int16)
+            full_end_point[connected_component] = end_point
+        return cls(vertex_index, full_parent, full_distance, full_end_point, end_point_ids)
+
+    def masked(self, keep):
+        """將不在 keep 內的點距離設為 inf（父節點與最近終點共用原本的陣列）。
+
+        Args:
+            keep (np.ndarray): 保留距離的點，bool，(V,)
+
+        Returns:
+            PathArrays: 遮罩後的路徑結果
+
+        """
+        distance = np.where(keep, self.distance, np.float32(np.inf))
+        return PathArrays(self.vertex_index, self.parent, distance,
+                          self.end_point, self.end_point_ids)
+
+    def get_reachable_count(self):
+        """取得可到達的點數。
+
+        Returns:
+            int: 可到達的點數
+        """
+        return int(np.count_nonzero(self.parent >= 0))
+
+    def get_views(self):
+        """取得 (parent id dict, distance dict) 形式的唯讀字典視圖。
+
+        Returns:
+            (PathView, PathView): 父節點 id 與距離
+        """
+        return PathView(self, "parent"), PathView(self, "distance")
+
+
+class PathView(Mapping):
+    """PathArrays 的唯讀字典視圖：點 id -> 值，只包含可到達的點，依索引排列。
+
+    Args:
+        paths (PathArrays): 路徑結果
+        field (str): 'parent'（父節點 id）、'distance'（距離）或 'end_point'（最近終點 id）
+
+    Raises:
+        ValueError: 如果 field 不是上述的值
+
+    """
+
+    def __init__(self, paths, field):
+        if field not in ("parent", "distance", "end_point"):
+            raise ValueError("field 不為'parent', 'distance'或'end_point'")
+        self.__paths = paths
+        self.__field = field
+
+    def __getitem__(self, ID):
+        paths = self.__paths
+        idx = paths.vertex_index.find(ID)
+        parent = paths.parent.item(idx) if idx >= 0 else -1
+        if parent < 0:
+            raise KeyError(ID)
+        if self.__field == "parent":
+            return paths.vertex_index.get_ids()[parent]
+        if self.__field == "end_point":
+            return paths.end_point_ids[paths.end_point.item(idx)]
+        # 距離以 float32 儲存，取出時還原成步數（int）或 inf
+        distance = paths.distance.item(idx)
+        return np.inf if distance == np.inf else int(distance)
+
+    def __iter__(self):
+        ids = self.__paths.vertex_index.get_ids()
+        return (ids[idx] for idx in np.flatnonzero(self.__paths.parent >= 0).tolist())
+
+    def __len__(self):
+        return self.__paths.get_reachable_count()
+
+    def __contains__(self, ID):
+        idx = self.__paths.vertex_index.find(ID)
+        return idx >= 0 and self.__paths.parent.item(idx) >= 0
+
+
 class Solution:
     """
     Attributes:
-        shortest_paths ({({str}, {float})}): key: 終點, value: (parent id dict, distance dict)
+        nearest (PathArrays): 每點往最近終點的路徑結果，所有終點同時出發一次算出
+        shortest ({PathArrays}): key: 終點, value: 以該終點為源點的路徑結果，
+            個別終點的結果只在需要時計算（Building.get_shortest_paths）
+        nearest_paths ((PathView, PathView, PathView)): nearest 的 (parent id dict, distance dict, 最近終點 id dict) 視圖
+        shortest_paths ({(PathView, PathView)}): shortest 的 (parent id dict, distance dict) 視圖
         failed_transportation_id (str): 失效傳送點id
         failed_block_id (str): 失效防煙區劃id
-    
+        failed_vertex_ids ([str]): 本情境移除的點 id
+        start_in_block (bool): 是否只保留起點位於失效防煙區劃內的距離（其餘設為 inf）
+
     """
 
     def __init__(self, failed_transportation_id, failed_block_id):
         self.failed_transportation_id = failed_transportation_id
         self.failed_block_id = failed_block_id
-        self.shortest_paths = dict()
+        self.failed_vertex_ids = list()
+        self.start_in_block = False
+        self.nearest = None
+        self.shortest = dict()
+
+    @property
+    def nearest_paths(self):
+        if self.nearest is None:
+            return dict(), dict(), dict()
+        return self.nearest.get_views() + (PathView(self.nearest, "end_point"),)
+
+    @property
+    def shortest_paths(self):
+        return {end_point_id: paths.get_views()
+                for end_point_id, paths in self.shortest.items()}
     pass
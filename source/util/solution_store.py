@@ -0,0 +1,336 @@
+import os
+import pickle
+import logging
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+from util.solution import PathArrays, Solution
+
+
+# 解答存放資料夾的副檔名（快取資料夾中以此結尾的資料夾不是樓層快取）
+SOLUTION_STORE_SUFFIX = ".solutions"
+# 同時保留在記憶體中的情境數量
+DEFAULT_CAPACITY = 16
+
+_MANIFEST_NAME = "manifest.pickle"
+_SHARD_DTYPE = np.dtype([
+    ("parent", "<i4"),
+    ("distance", "<f4"),
+    ("end_point", "<i2"),
+])
+# 差異 shard 中每筆改變的點：點索引 + 該點在情境中的值
+_DELTA_DTYPE = np.dtype([("index", "<i4")] + _SHARD_DTYPE.descr)
+
+
+class SolutionStore(Mapping):
+    """存在硬碟上、依需要才讀取的情境解答（instance_str -> Solution）。
+
+    每個情境的路徑陣列存成一個 shard（.npy，以 memory map 讀取），
+    manifest 記錄情境順序、各情境的失效資訊與對應的 shard；
+    失效點集合相同的情境共用同一個 shard。讀取過的情境保留在 LRU 快取中，
+    最多 capacity 個，所以查詢或繪製單一情境只需要讀取一個 shard。
+
+    寫入時指定基準情境（例如 "none"）的話，其餘情境只存與基準不同的點
+    （差異 shard，.npz）：父節點、距離或最近終點改變的點、變成無法到達的點，
+    以及只保留失效防煙區劃內起點而距離被設為 inf 的點（bitset）。
+    讀取時以基準還原，對呼叫端完全透明。
+
+    Attributes:
+        __directory (str): 存放資料夾
+        __vertex_index (VertexIndex): 所有情境共用的點索引
+        __shards ([dict]): 每個 shard 的檔名、終點 id 與是否為差異 shard
+        __baseline_shard (int): 基準情境的 shard 編號，沒有基準時為 None
+        __baseline (PathArrays): 基準情境的路徑結果，第一次讀取差異 shard 時載入
+        __instances (OrderedDict): instance_str -> (shard 編號, Solution 的失效資訊)
+        __capacity (int): LRU 快取的情境數量上限
+        __loaded (OrderedDict): LRU 快取，instance_str -> Solution
+
+    Args:
+        directory (str): 存放資料夾（SolutionStore.write 寫出的資料夾）
+        capacity (int): LRU 快取的情境數量上限
+
+    Raises:
+        FileNotFoundError: 如果資料夾中沒有 manifest
+
+    """
+
+    def __init__(self, directory, capacity=DEFAULT_CAPACITY):
+        self.__directory = directory
+        with open(os.path.join(directory, _MANIFEST_NAME), "rb") as f:
+            manifest = pickle.load(f)
+        self.__vertex_index = manifest["vertex_index"]
+        self.__shards = manifest["shards"]
+        self.__baseline_shard = manifest["baseline_shard"]
+        self.__baseline = None
+        self.__instances = manifest["instances"]
+        self.__capacity = max(1, int(capacity))
+        self.__loaded = OrderedDict()
+
+    @staticmethod
+    def exists(directory):
+        """判斷資料夾中是否有完整寫出的解答（manifest 最後才寫入）。
+
+        Args:
+            directory (str): 存放資料夾
+
+        Returns:
+            bool: 是否有完整的解答
+
+        """
+        return os.path.isfile(os.path.join(directory, _MANIFEST_NAME))
+
+    @classmethod
+    def write(cls, directory, solutions, capacity=DEFAULT_CAPACITY, baseline=None):
+        """將情境解答寫入資料夾，並回傳讀取該資料夾的 SolutionStore。
+
+        Args:
+            directory (str): 存放資料夾
+            solutions ({Solution}): instance_str -> Solution（nearest 已計算）
+            capacity (int): LRU 快取的情境數量上限
+            baseline (str): 基準情境的 instance_str，其餘情境只存與它不同的點；
+                None 代表每個情境都存完整的 shard
+
+        Returns:
+            SolutionStore: 解答存放物件
+
+        """
+        os.makedirs(directory, exist_ok=True)
+        vertex_index = None
+        shards = list()
+        shard_numbers = dict()
+        instances = OrderedDict()
+
+        baseline_paths = None
+        if baseline in solutions and solutions[baseline].nearest is not None:
+            # 基準情境永遠存完整的 shard
+            baseline_paths = solutions[baseline].nearest
+            vertex_index = baseline_paths.vertex_index
+            shard_numbers[id(baseline_paths)] = len(shards)
+            shards.append(cls.__write_shard(directory, len(shards), baseline_paths))
+        baseline_shard = shard_numbers.get(id(baseline_paths))
+
+        for instance_str, solution in solutions.items():
+            paths = solution.nearest
+            shard_number = None
+            if paths is not None:
+                if vertex_index is None:
+                    vertex_index = paths.vertex_index
+                # 共用同一個 PathArrays 的情境只寫一個 shard
+                shard_number = shard_numbers.get(id(paths))
+                if shard_number is None:
+                    shard_number = len(shards)
+                    shard_numbers[id(paths)] = shard_number
+                    delta = None if baseline_paths is None else \
+                        _encode_delta(paths, baseline_paths)
+                    if delta is None:
+                        shards.append(cls.__write_shard(
+                            directory, shard_number, paths))
+                    else:
+                        shards.append(cls.__write_delta_shard(
+                            directory, shard_number, paths, delta))
+            info = {key: value for key, value in vars(solution).items()
+                    if key not in ("nearest", "shortest")}
+            instances[instance_str] = (shard_number, info)
+
+        manifest_path = os.path.join(directory, _MANIFEST_NAME)
+        with open(manifest_path + ".tmp", "wb") as handle:
+            pickle.dump({
+                "vertex_index": vertex_index,
+                "shards": shards,
+                "baseline_shard": baseline_shard,
+                "instances": instances,
+            }, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        logging.debug("寫入 {} 個情境、{} 個 shard 至 {}".format(
+            len(instances), len(shards), directory))
+        return cls(directory, capacity)
+
+    @staticmethod
+    def __write_shard(directory, shard_number, paths):
+        """將一組路徑結果寫成一個 shard。
+
+        Args:
+            directory (str): 存放資料夾
+            shard_number (int): shard 編號
+            paths (PathArrays): 路徑結果
+
+        Returns:
+            dict: shard 的檔名與終點 id
+
+        """
+        shard = np.empty(len(paths.parent), dtype=_SHARD_DTYPE)
+        shard["parent"] = paths.parent
+        shard["distance"] = paths.distance
+        shard["end_point"] = -1 if paths.end_point is None else paths.end_point
+        file_name = "{}.npy".format(shard_number)
+        np.save(os.path.join(directory, file_name), shard)
+        return {
+            "file_name": file_name,
+            "has_end_point": paths.end_point is not None,
+            "end_point_ids": paths.end_point_ids,
+            "delta": False,
+        }
+
+    @staticmethod
+    def __write_delta_shard(directory, shard_number, paths, delta):
+        """將一組路徑結果與基準的差異寫成一個 shard。
+
+        Args:
+            directory (str): 存放資料夾
+            shard_number (int): shard 編號
+            paths (PathArrays): 路徑結果
+            delta (dict): _encode_delta 的結果
+
+        Returns:
+            dict: shard 的檔名與終點 id
+
+        """
+        file_name = "{}.npz".format(shard_number)
+        np.savez(os.path.join(directory, file_name), **delta)
+        return {
+            "file_name": file_name,
+            "has_end_point": paths.end_point is not None,
+            "end_point_ids": paths.end_point_ids,
+            "delta": True,
+        }
+
+    def __getitem__(self, instance_str):
+        if instance_str in self.__loaded:
+            self.__loaded.move_to_end(instance_str)
+            return self.__loaded[instance_str]
+
+        shard_number, info = self.__instances[instance_str]
+        solution = Solution(info["failed_transportation_id"], info["failed_block_id"])
+        vars(solution).update(info)
+        if shard_number is not None:
+            solution.nearest = self.__read_shard(shard_number)
+
+        self.__loaded[instance_str] = solution
+        if len(self.__loaded) > self.__capacity:
+            self.__loaded.popitem(last=False)
+        return solution
+
+    def __read_shard(self, shard_number):
+        """讀取一個 shard：完整的 shard 以 memory map 讀取，差異 shard 以基準還原。
+
+        Args:
+            shard_number (int): shard 編號
+
+        Returns:
+            PathArrays: 路徑結果
+
+        """
+        shard_info = self.__shards[shard_number]
+        if shard_info["delta"]:
+            with np.load(os.path.join(self.__directory, shard_info["file_name"])) as delta:
+                return _apply_delta(self.__get_baseline(), delta)
+        shard = np.load(os.path.join(self.__directory, shard_info["file_name"]),
+                        mmap_mode="r")
+        end_point = shard["end_point"] if shard_info["has_end_point"] else None
+        return PathArrays(self.__vertex_index, shard["parent"], shard["distance"],
+                          end_point, shard_info["end_point_ids"])
+
+    def __get_baseline(self):
+        """取得基準情境的路徑結果（只讀取一次，不受 LRU 影響）。
+
+        Returns:
+            PathArrays: 基準情境的路徑結果
+
+        """
+        if self.__baseline is None:
+            self.__baseline = self.__read_shard(self.__baseline_shard)
+        return self.__baseline
+
+    def __iter__(self):
+        return iter(self.__instances)
+
+    def __len__(self):
+        return len(self.__instances)
+
+    def __contains__(self, instance_str):
+        return instance_str in self.__instances
+
+    def get_directory(self):
+        """取得存放資料夾。
+
+        Returns:
+            str: 存放資料夾
+        """
+        return self.__directory
+
+
+def _encode_delta(paths, baseline):
+    """計算路徑結果與基準的差異。
+
+    Args:
+        paths (PathArrays): 路徑結果
+        baseline (PathArrays): 基準的路徑結果
+
+    Returns:
+        dict: 差異陣列（records、unreachable、masked）；無法編碼或差異不比
+            完整的 shard 小時為 None
+
+    """
+    if len(paths.parent) != len(baseline.parent) or \
+            (paths.end_point is None) != (baseline.end_point is None) or \
+            paths.end_point_ids != baseline.end_point_ids:
+        return None
+
+    reachable = paths.parent >= 0
+    # 只保留失效防煙區劃內起點時，其餘起點的距離為 inf，以 bitset 記錄
+    masked = reachable & np.isinf(paths.distance) & ~np.isinf(baseline.distance)
+    changed = (paths.parent != baseline.parent) | \
+        ((paths.distance != baseline.distance) & ~masked)
+    if paths.end_point is not None:
+        changed |= paths.end_point != baseline.end_point
+    changed = np.flatnonzero(reachable & changed)
+
+    records = np.empty(len(changed), dtype=_DELTA_DTYPE)
+    records["index"] = changed
+    records["parent"] = paths.parent[changed]
+    records["distance"] = paths.distance[changed]
+    records["end_point"] = -1 if paths.end_point is None else paths.end_point[changed]
+    delta = {
+        "records": records,
+        "unreachable": np.flatnonzero(~reachable & (baseline.parent >= 0)).astype("<i4"),
+        "masked": np.packbits(masked, bitorder="little") if masked.any() else np.zeros(0, np.uint8),
+    }
+    if sum(array.nbytes for array in delta.values()) >= len(paths.parent) * _SHARD_DTYPE.itemsize:
+        return None
+    return delta
+
+
+def _apply_delta(baseline, delta):
+    """以基準與差異還原路徑結果。
+
+    Args:
+        baseline (PathArrays): 基準的路徑結果
+        delta (Mapping): _encode_delta 的結果
+
+    Returns:
+        PathArrays: 還原的路徑結果
+
+    """
+    parent = np.array(baseline.parent)
+    distance = np.array(baseline.distance)
+    end_point = None if baseline.end_point is None else np.array(baseline.end_point)
+
+    unreachable = delta["unreachable"]
+    parent[unreachable] = -1
+    distance[unreachable] = np.inf
+    if end_point is not None:
+        end_point[unreachable] = -1
+
+    masked = delta["masked"]
+    if len(masked):
+        distance[np.unpackbits(masked, count=len(distance), bitorder="little").view(bool)] = np.inf
+
+    records = delta["records"]
+    parent[records["index"]] = records["parent"]
+    distance[records["index"]] = records["distance"]
+    if end_point is not None:
+        end_point[records["index"]] = records["end_point"]
+    return PathArrays(baseline.vertex_index, parent, distance,
+                      end_point, baseline.end_point_ids)
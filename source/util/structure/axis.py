@@ -1,5 +1,6 @@
 import copy
 import logging
+import numpy as np
 
 
 class Axis:
@@ -7,7 +8,7 @@ class Axis:
 
     Attributes:
         __equation (source.util.structure.linear.Linear): 本軸線的線性方程式
-        __obstacles ([float]): 和本軸線相交的障礙物列表，列表裡面的值為與自身代表的軸正交的座標
+        __obstacles (np.ndarray): 和本軸線相交的障礙物（已排序），裡面的值為與自身代表的軸正交的座標
 
     Args:
         linear (source.util.structure.linear.Linear): 本軸線的線性方程式
@@ -32,16 +33,30 @@ class Axis:
             raise TypeError("Axis 的 linear 參數型別錯誤")
 
         self.__equation = copy.deepcopy(linear)
-        self.__obstacles = list()
+        self.__obstacles = self.__read_only(np.zeros(0))
+
+    @staticmethod
+    def __read_only(array):
+        """將陣列設為唯讀，讓 get_obstacles 可以直接回傳而不必複製。
+
+        Args:
+            array (np.ndarray): 陣列
+
+        Returns:
+            np.ndarray: 唯讀的同一個陣列
+
+        """
+        array.flags.writeable = False
+        return array
 
     def get_equation(self):
-        """取得本軸之方程式。
+        """取得本軸之方程式（Linear 不可變，不複製）。
 
         Returns:
             source.util.structure.linear.Linear: 本軸的方程式
         
         """
-        return copy.deepcopy(self.__equation)
+        return self.__equation
 
     def get_intersections(self, obstacle_linear, mode=None, threshold=0):
         """計算本軸與障礙物的交點列表。
@@ -68,19 +83,39 @@ class Axis:
 
         _ = self.__equation.get_intersection(obstacle_linear, mode, threshold)
         if _ != None:
-            self.__obstacles.append(_)
+            self.__obstacles = self.__read_only(np.insert(
+                self.__obstacles, np.searchsorted(self.__obstacles, _), _))
+
+    def set_obstacles(self, obstacles):
+        """直接設定本軸與障礙物的交點（例如由 util.intersection.axis_obstacles 一次算好）。
+
+        Args:
+            obstacles (np.ndarray): 本軸與障礙物交點
+
+        """
+        self.__obstacles = self.__read_only(
+            np.sort(np.asarray(obstacles, dtype=np.float64)))
 
     # def add_obstacle_point(self, point): seems usless?
     #     self.obstacles.append(point)
 
     def get_obstacles(self):
-        """取得本軸與障礙物交點列表。
+        """取得本軸與障礙物交點列表（唯讀）。
+
+        Returns:
+            np.ndarray: 本軸與障礙物交點（已排序、唯讀），需要修改請用 copy_obstacles
+        
+        """
+        return self.__obstacles
+
+    def copy_obstacles(self):
+        """取得本軸與障礙物交點列表的複本。
 
         Returns:
-            [float]: 本軸與障礙物交點列表
+            np.ndarray: 本軸與障礙物交點（已排序）
         
         """
-        return copy.deepcopy(self.__obstacles)
+        return self.__obstacles.copy()
 
     def display(self):
         """印出本軸與障礙物資訊。
@@ -0,0 +1,411 @@
+import logging
+import numpy as np
+
+
+class CompactGraph:
+    """以整數索引、CSR 格式存放的唯讀抽象圖。
+
+    Graph 以字串 id 為鍵、每個點一個 list 存放鄰居，車站規模的總圖會有上百萬個
+    字串與 list。CompactGraph 只在建立時把 id 轉成連續的整數索引一次，
+    之後最短路徑與連通分量都在整數陣列上計算。所有陣列都是唯讀的；
+    情境（失效的點）以停用點 bitset 表示，不會修改圖本身，
+    所以同一張圖可以同時給多個情境的計算共用。
+
+    Attributes:
+        __ids ([str]): 索引 -> 點 id
+        __index ({int}): 點 id -> 索引
+        __offsets (np.ndarray): 第 i 點的鄰居為 __neighbors[__offsets[i]:__offsets[i + 1]]，(V + 1,)
+        __neighbors (np.ndarray): 所有鄰居索引串接，(E,)
+        __coordinates (np.ndarray): 點座標，float32，(V, 3)
+        __families (np.ndarray): 傳送點家族編號（id 剛好有一個 '_' 時，以 '_' 前的字串分組），
+            其餘點為 -1，(V,)
+        __labels (np.ndarray): 沒有失效點時各點所屬連通分量的編號，第一次使用時計算，(V,)
+
+    Args:
+        ids ([str]): 索引 -> 點 id
+        offsets (np.ndarray): CSR 偏移，(V + 1,)
+        neighbors (np.ndarray): CSR 鄰居索引，(E,)
+        coordinates (np.ndarray): 點座標，(V, 3)
+
+    Raises:
+        ValueError: 如果陣列長度不一致
+
+    """
+
+    def __init__(self, ids, offsets, neighbors, coordinates):
+        """CompactGraph 建構子。
+
+        Args:
+            ids ([str]): 索引 -> 點 id
+            offsets (np.ndarray): CSR 偏移，(V + 1,)
+            neighbors (np.ndarray): CSR 鄰居索引，(E,)
+            coordinates (np.ndarray): 點座標，(V, 3)
+
+        Raises:
+            ValueError: 如果陣列長度不一致
+
+        """
+        self.__ids = list(ids)
+        self.__index = {ID: idx for idx, ID in enumerate(self.__ids)}
+        self.__offsets = np.array(offsets, dtype=np.int64)
+        self.__neighbors = np.array(neighbors, dtype=np.int32)
+        self.__coordinates = np.array(
+            coordinates, dtype=np.float32).reshape(-1, 3)
+
+        if len(self.__index) != len(self.__ids):
+            raise ValueError("CompactGraph 的 ids 有重複")
+        if len(self.__offsets) != len(self.__ids) + 1 or \
+                self.__offsets[-1] != len(self.__neighbors):
+            raise ValueError("CompactGraph 的 offsets 與 neighbors 長度不一致")
+        if len(self.__coordinates) != len(self.__ids):
+            raise ValueError("CompactGraph 的 coordinates 與 ids 長度不一致")
+
+        self.__labels = None
+        for array in (self.__offsets, self.__neighbors, self.__coordinates):
+            array.flags.writeable = False
+
+        family_names = dict()
+        self.__families = np.full(len(self.__ids), -1, dtype=np.int32)
+        for idx, ID in enumerate(self.__ids):
+            parts = ID.split('_')
+            if len(parts) == 2:
+                self.__families[idx] = family_names.setdefault(
+                    parts[0], len(family_names))
+        self.__families.flags.writeable = False
+
+    def __setstate__(self, state):
+        """反序列化（例如傳給 worker process）後，陣列仍維持唯讀。
+
+        Args:
+            state (dict): 物件屬性
+
+        """
+        self.__dict__.update(state)
+        for array in (self.__offsets, self.__neighbors, self.__coordinates,
+                      self.__families, self.__labels):
+            if array is not None:
+                array.flags.writeable = False
+
+    @classmethod
+    def from_graph(cls, graph):
+        """由 Graph 建立 CompactGraph，鄰居順序與 Graph 的 adjacency list 相同。
+
+        Args:
+            graph (source.util.structure.graph.Graph): 抽象圖
+
+        Returns:
+            CompactGraph: 精簡圖
+
+        """
+        ids = graph.get_vertex_ids()
+        index = {ID: idx for idx, ID in enumerate(ids)}
+        adj_dict = graph.get_adj_dict(gen_new=False)
+
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        neighbors = list()
+        missing = 0
+        for idx, ID in enumerate(ids):
+            for v_id in adj_dict[ID]:
+                if v_id in index:
+                    neighbors.append(index[v_id])
+                else:
+                    missing += 1
+            offsets[idx + 1] = len(neighbors)
+        if missing:
+            logging.warning(
+                "CompactGraph 略過 {} 個不存在於圖中的鄰居".format(missing))
+
+        neighbors = np.array(neighbors, dtype=np.int32)
+        # 單向邊不補上反向邊（最短路徑照原本的鄰接關係走），只記錄數量
+        sources = np.repeat(np.arange(len(ids), dtype=np.int64), np.diff(offsets))
+        targets = neighbors.astype(np.int64)
+        one_way = np.count_nonzero(~np.isin(
+            sources * len(ids) + targets, targets * len(ids) + sources))
+        if one_way:
+            logging.warning(
+                "CompactGraph 有 {} 條單向邊，連通分量中可能有走不到的點".format(one_way))
+
+        return cls(ids, offsets, neighbors, graph.get_coordinates())
+
+    def get_vertex_count(self):
+        """取得點的數量。
+
+        Returns:
+            int: 點的數量
+
+        """
+        return len(self.__ids)
+
+    def get_ids(self):
+        """取得所有點的 id（依索引排列）。
+
+        Returns:
+            [str]: 所有點的 id
+
+        """
+        return list(self.__ids)
+
+    def get_id(self, idx):
+        """利用索引取得點的 id。
+
+        Args:
+            idx (int): 點的索引
+
+        Returns:
+            str: 點的 id
+
+        """
+        return self.__ids[idx]
+
+    def get_ids_by_indices(self, indices):
+        """利用多個索引取得點的 id。
+
+        Args:
+            indices ([int]): 點的索引
+
+        Returns:
+            [str]: 點的 id
+
+        """
+        ids = self.__ids
+        return [ids[idx] for idx in indices]
+
+    def get_index(self, ID):
+        """利用 id 取得點的索引。
+
+        Args:
+            ID (str): 點的 id
+
+        Returns:
+            int: 點的索引
+
+        Raises:
+            IndexError: 圖中找不到該 id
+
+        """
+        if ID not in self.__index:
+            raise IndexError("CompactGraph 找不到該 id：{}".format(ID))
+        return self.__index[ID]
+
+    def has_vertex(self, ID):
+        """判斷圖中是否有該點。
+
+        Args:
+            ID (str): 點的 id
+
+        Returns:
+            bool: 圖中是否有該點
+
+        """
+        return ID in self.__index
+
+    def get_offsets(self):
+        """取得 CSR 偏移陣列（唯讀）。
+
+        Returns:
+            np.ndarray: CSR 偏移，(V + 1,)
+
+        """
+        return self.__offsets
+
+    def get_neighbors(self):
+        """取得 CSR 鄰居索引陣列（唯讀）。
+
+        Returns:
+            np.ndarray: CSR 鄰居索引，(E,)
+
+        """
+        return self.__neighbors
+
+    def get_families(self):
+        """取得每個點的傳送點家族編號。
+
+        Returns:
+            np.ndarray: 家族編號，非傳送點為 -1，(V,)
+
+        """
+        return self.__families
+
+    def get_adj_indices(self, idx):
+        """取得某點的鄰居索引。
+
+        Args:
+            idx (int): 點的索引
+
+        Returns:
+            np.ndarray: 鄰居索引
+
+        """
+        return self.__neighbors[self.__offsets[idx]:self.__offsets[idx + 1]]
+
+    def get_coordinate_by_vertex_id(self, ID):
+        """利用 id 取得點的座標。
+
+        Args:
+            ID (str): 點的 id
+
+        Returns:
+            (float, float, float): 點的座標
+
+        """
+        return tuple(self.__coordinates[self.get_index(ID)].tolist())
+
+    def get_coordinates(self):
+        """取得所有點的座標（依索引排列，唯讀）。
+
+        Returns:
+            np.ndarray: 所有點的座標，float32，(V, 3)
+
+        """
+        return self.__coordinates
+
+    def disabled_bitset(self, failed_ids):
+        """將失效點 id 轉成停用點 bitset（每點 1 bit）。
+
+        Args:
+            failed_ids ([str]): 失效點 id
+
+        Returns:
+            np.ndarray: 停用點 bitset，np.uint8，(ceil(V / 8),)
+
+        Raises:
+            ValueError: 失效點 id 不在圖中
+
+        """
+        disabled = np.zeros(len(self.__ids), dtype=bool)
+        for ID in failed_ids:
+            if ID not in self.__index:
+                raise ValueError("failed vertex id not in instance graph")
+            disabled[self.__index[ID]] = True
+        return np.packbits(disabled, bitorder="little")
+
+    def disabled_mask(self, disabled):
+        """將停用點 bitset 展開成每點一個 bool 的遮罩。
+
+        Args:
+            disabled (np.ndarray): 停用點 bitset，None 代表沒有失效點
+
+        Returns:
+            np.ndarray: mask[i] 為第 i 點是否停用，(V,)；沒有停用點時為 None
+
+        """
+        if disabled is None or not disabled.any():
+            return None
+        return np.unpackbits(
+            disabled, count=len(self.__ids), bitorder="little").view(bool)
+
+    def disabled_indices(self, disabled):
+        """取得停用點的索引。
+
+        Args:
+            disabled (np.ndarray): 停用點 bitset，None 代表沒有失效點
+
+        Returns:
+            np.ndarray: 停用點索引（已排序）
+
+        """
+        mask = self.disabled_mask(disabled)
+        if mask is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(mask)
+
+    def component_labels(self, disabled=None):
+        """取得每個點所屬連通分量的編號（分量內最小的點索引）。
+
+        整張圖的編號只計算一次；有失效點時只重新計算包含失效點的分量，
+        其餘分量的編號不變。失效的點沒有任何邊，各自成為一個分量。
+        邊視為無向，所以有單向邊時分量可能包含從起點走不到的點，
+        實際可到達的點以最短路徑搜尋的結果為準。
+
+        Args:
+            disabled (np.ndarray): 停用點 bitset（CompactGraph.disabled_bitset），None 代表沒有失效點
+
+        Returns:
+            np.ndarray: labels[i] 為第 i 點所屬分量的編號，(V,)
+
+        """
+        if self.__labels is None:
+            sources, targets = self.__get_edges()
+            self.__labels = _link_components(
+                np.arange(len(self.__ids), dtype=np.int64), sources, targets)
+            self.__labels.flags.writeable = False
+        disabled = self.disabled_mask(disabled)
+        if disabled is None:
+            return self.__labels
+
+        labels = self.__labels.copy()
+        touched = np.isin(labels, np.unique(labels[disabled]))
+        labels[touched] = np.flatnonzero(touched)
+        sources, targets = self.__get_edges()
+        keep = touched[sources] & ~disabled[sources] & ~disabled[targets]
+        return _link_components(labels, sources[keep], targets[keep])
+
+    def component_members(self, labels, sources):
+        """取得與任一起點位於同一分量的所有點。
+
+        Args:
+            labels (np.ndarray): component_labels 的結果，(V,)
+            sources ([int]): 起點索引
+
+        Returns:
+            [int]: 點索引（依索引排序）
+
+        """
+        return np.flatnonzero(np.isin(labels, labels[list(sources)])).tolist()
+
+    def connected_component(self, source, disabled=None):
+        """計算某點所在的連通分量。
+
+        失效的點沒有任何邊；若起點本身失效，連通分量只有起點。
+
+        Args:
+            source (int): 起點索引
+            disabled (np.ndarray): 停用點 bitset（CompactGraph.disabled_bitset），None 代表沒有失效點
+
+        Returns:
+            [int]: 連通分量的點索引（依索引排序）
+
+        """
+        return self.component_members(self.component_labels(disabled), [source])
+
+    def __get_edges(self):
+        """取得所有邊的兩端點索引。
+
+        Returns:
+            (np.ndarray, np.ndarray): 起點、終點索引，(E,)
+
+        """
+        sources = np.repeat(
+            np.arange(len(self.__ids), dtype=np.int64), np.diff(self.__offsets))
+        return sources, self.__neighbors.astype(np.int64)
+
+
+def _link_components(labels, sources, targets):
+    """以 hooking + pointer jumping 合併分量，直到每條邊兩端的編號相同。
+
+    labels[i] 永遠不大於 i，所以編號形成指向較小索引的樹；
+    每輪把邊兩端的根接到較小的根上，再把所有點直接指向根。
+
+    Args:
+        labels (np.ndarray): 初始編號（每點指向自己或同分量中較小的點），(V,)
+        sources (np.ndarray): 邊的起點索引，(E,)
+        targets (np.ndarray): 邊的終點索引，(E,)
+
+    Returns:
+        np.ndarray: 每點所屬分量的編號（分量內最小的點索引），(V,)
+
+    """
+    labels = labels[labels]
+    while True:
+        source_labels, target_labels = labels[sources], labels[targets]
+        low = np.minimum(source_labels, target_labels)
+        high = np.maximum(source_labels, target_labels)
+        changed = low != high
+        if not changed.any():
+            return labels
+        np.minimum.at(labels, high[changed], low[changed])
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
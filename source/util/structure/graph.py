@@ -1,5 +1,8 @@
 import sys
 import copy
+import numpy as np
+
+from util.structure.vertex import Vertex
 
 sys.setrecursionlimit(900000)
 
@@ -32,8 +35,8 @@ class Graph:
     """圖。
 
     Attributes:
-        __adj_dict ({[str]}): 本圖的鄰接表
-            e.g. { "1_2_3": ["2_3_4", "5_6_7"], "2_3_4": ["1_2_3"], "5_6_7": ["1_2_3"] }
+        __adj_dict ({(str)}): 本圖的鄰接表（每點一個 tuple，修改時整個替換）
+            e.g. { "1_2_3": ("2_3_4", "5_6_7"), "2_3_4": ("1_2_3",), "5_6_7": ("1_2_3",) }
         __vertices ([Vertex]): 圖中有的點列表
         __vertex_id_dict ({Vertex}): 圖中有的點列表
         __vertex_coord_dict ({Vertex}): 圖中有的點列表
@@ -48,6 +51,18 @@ class Graph:
         self.__vertex_id_dict = dict()
         self.__vertex_coord_dict = dict()
 
+    def __setstate__(self, state):
+        """讀取快取時，舊版快取中的 adjacency list 轉成 tuple。
+
+        Args:
+            state (dict): 物件屬性
+
+        """
+        self.__dict__.update(state)
+        for ID, adj_list in self.__adj_dict.items():
+            if type(adj_list) is not tuple:
+                self.__adj_dict[ID] = tuple(adj_list)
+
     def add_vertex(self, vertex, adj_list):
         """增加點與其連結資訊。
 
@@ -68,7 +83,55 @@ class Graph:
         self.__vertex_id_dict[vertex.get_id()] = vertex
         self.__vertex_coord_dict[vertex.get_coordinate()] = vertex
         ID = vertex.get_id()
-        self.__adj_dict[ID] = adj_list
+        # 以 tuple 存放，get_adj_list_by_id 直接回傳不必複製
+        self.__adj_dict[ID] = tuple(adj_list)
+
+    def to_description(self):
+        """將圖轉成精簡、容易 pickle 的描述（用於跨 process 傳遞）。
+
+        Returns:
+            dict: 圖的描述
+                vertex_ids ([str]): 依加入順序的點 id（可能重複）
+                coordinates (np.ndarray): 對應的點座標，(V, 3)
+                adj_offsets (np.ndarray): 第 k 個相異 id 的鄰居為 adj_targets[adj_offsets[k]:adj_offsets[k + 1]]
+                adj_targets ([str]): 所有鄰居 id 串接
+
+        """
+        adj_lengths = [len(adj_list) for adj_list in self.__adj_dict.values()]
+        return {
+            "vertex_ids": [v.get_id() for v in self.__vertices],
+            "coordinates": np.array(
+                [v.get_coordinate() for v in self.__vertices],
+                dtype=np.float64).reshape(-1, 3),
+            "adj_offsets": np.concatenate(
+                ([0], np.cumsum(adj_lengths, dtype=np.int64))).astype(np.int64),
+            "adj_targets": [
+                v_id for adj_list in self.__adj_dict.values() for v_id in adj_list
+            ],
+        }
+
+    @classmethod
+    def from_description(cls, description):
+        """由 to_description 產生的描述重建圖。
+
+        Args:
+            description (dict): 圖的描述
+
+        Returns:
+            Graph: 重建的圖
+
+        """
+        adj_offsets = description["adj_offsets"]
+        adj_targets = description["adj_targets"]
+        adj_lists = {
+            ID: adj_targets[adj_offsets[k]:adj_offsets[k + 1]]
+            for k, ID in enumerate(dict.fromkeys(description["vertex_ids"]))
+        }
+
+        graph = cls()
+        for ID, (x, y, z) in zip(description["vertex_ids"], description["coordinates"].tolist()):
+            graph.add_vertex(Vertex(x, y, z, ID), adj_lists[ID])
+        return graph
 
     def get_xs(self):
         """取得所有點的 x 座標。
@@ -91,12 +154,15 @@ class Graph:
     def get_adj_dict(self, gen_new=True):
         """取得所有點的 adjacency list。
 
+        Args:
+            gen_new (bool): 是否回傳可修改的複本；False 時回傳圖內部的字典（唯讀，值為 tuple）
+
         Returns:
             {[str]}: 所有點的 adjacency list
 
         """
         if gen_new:
-            return copy.deepcopy(self.__adj_dict)
+            return {ID: list(adj_list) for ID, adj_list in self.__adj_dict.items()}
         return self.__adj_dict
 
     def get_coordinate_by_vertex_id(self, ID):
@@ -119,7 +185,7 @@ class Graph:
             return None
 
     def get_vertex_by_id(self, ID):
-        """利用 id 取得點的資訊。
+        """利用 id 取得點的資訊（Vertex 不可變，直接回傳圖中的物件，不複製）。
 
         Args:
             ID (str): 要取得的點的id
@@ -134,7 +200,7 @@ class Graph:
         if type(ID).__name__ != "str":
             raise TypeError("id型別錯誤")
         try:
-            return copy.deepcopy(self.__vertex_id_dict[ID])
+            return self.__vertex_id_dict[ID]
         except:
             print("找不到點{}".format(ID))
             return None
@@ -148,8 +214,19 @@ class Graph:
         """
         return list(self.__vertex_id_dict.keys())
 
+    def get_coordinates(self):
+        """取得所有點的座標（順序與 get_vertex_ids 相同）。
+
+        Returns:
+            np.ndarray: 所有點的座標，(V, 3)
+
+        """
+        return np.array(
+            [v.get_coordinate() for v in self.__vertex_id_dict.values()],
+            dtype=np.float64).reshape(-1, 3)
+
     def get_vetex_by_coordinate(self, coordinate):
-        """利用 coordinate 取得點的資訊。
+        """利用 coordinate 取得點的資訊（Vertex 不可變，直接回傳圖中的物件，不複製）。
 
         Args:
             coordinate (tuple(float, float, float)): 要取得的點的網格座標
@@ -164,18 +241,18 @@ class Graph:
         if type(coordinate).__name__ != "tuple":
             raise TypeError("coordinate 型別錯誤")
         try:
-            return copy.deepcopy(self.__vertex_coord_dict[coordinate])
+            return self.__vertex_coord_dict[coordinate]
         except:
             return None
 
     def get_adj_list_by_id(self, ID):
-        """利用 id 取得此點的 adjacency list。
+        """利用 id 取得此點的 adjacency list（唯讀）。
 
         Args:
             ID (str): 要取得的點的id
 
         Returns:
-            [str]: 點的 adjacency list
+            (str): 點的 adjacency list，需要修改請用 copy_adj_list_by_id
 
         Raises:
             TypeError: 如果 ID 型別錯誤
@@ -183,7 +260,24 @@ class Graph:
         """
         if type(ID).__name__ != "str":
             raise TypeError("id 型別錯誤")
-        return copy.deepcopy(self.__adj_dict[ID])
+        return self.__adj_dict[ID]
+
+    def copy_adj_list_by_id(self, ID):
+        """利用 id 取得此點 adjacency list 的複本。
+
+        Args:
+            ID (str): 要取得的點的id
+
+        Returns:
+            [str]: 點的 adjacency list 複本，修改不會影響圖
+
+        Raises:
+            TypeError: 如果 ID 型別錯誤
+
+        """
+        if type(ID).__name__ != "str":
+            raise TypeError("id 型別錯誤")
+        return list(self.__adj_dict[ID])
 
     def add_vertex_to_adj_list_by_id(self, ID, v_id):
         """增加 id 的 adjacency list 對應到的點。
@@ -201,7 +295,7 @@ class Graph:
         elif type(v_id).__name__ != "str":
             raise TypeError("v_id 型別錯誤")
 
-        self.__adj_dict[ID].append(v_id)
+        self.__adj_dict[ID] += (v_id,)
 
     def connect_vertex_by_id(self, v_id1, v_id2):
         """連接兩個 vertex 並加到 adj_list 及其他資料結構。
@@ -219,8 +313,8 @@ class Graph:
         elif type(v_id2).__name__ != "str":
             raise TypeError("v_id2 型別錯誤")
 
-        self.__adj_dict[v_id1].append(v_id2)
-        self.__adj_dict[v_id2].append(v_id1)
+        self.__adj_dict[v_id1] += (v_id2,)
+        self.__adj_dict[v_id2] += (v_id1,)
 
     def disconnect_vertex_by_id(self, v_id1, v_id2):
         """斷開兩個 vertex 並從 adj_list 刪除。
@@ -238,8 +332,10 @@ class Graph:
         elif type(v_id2).__name__ != "str":
             raise TypeError("v_id2 型別錯誤")
 
-        self.__adj_dict[v_id1].remove(v_id2)
-        self.__adj_dict[v_id2].remove(v_id1)
+        for ID, v_id in ((v_id1, v_id2), (v_id2, v_id1)):
+            adj_list = list(self.__adj_dict[ID])
+            adj_list.remove(v_id)
+            self.__adj_dict[ID] = tuple(adj_list)
 
     def DFS_util(self, id):
         """DFS function（遞迴在 Windows 上會 stack overflow，因此改成 Loop）。
@@ -305,43 +401,7 @@ class Graph:
             new_id (str): 新點的 id
 
         """
-        for idx, element in enumerate(self.__adj_dict[target_id]):
-            if element == old_id:
-                self.__adj_dict[target_id][idx] = new_id
-                break
-
-    def generate_instance(self, failed_vertex_id, failed_block) -> None:
-        """將某案例的傳送點和在防煙區劃中的點從 adj_list 中移除。
-
-        Args:
-            failed_vertex_id (str): 傳送點的 id
-            failed_block ([str]): 防煙區劃中點的 id
-
-        """
-        self.__clear_records = list()  # list([id: dst])
-
-        # remove failed vertex
-        if failed_vertex_id in self.__adj_dict:
-            to_delete = self.__adj_dict[failed_vertex_id]
-            self.__adj_dict[failed_vertex_id] = list()
-            for vertex_id in to_delete:
-                self.__clear_records.append([failed_vertex_id, vertex_id])
-                self.__adj_dict[vertex_id].remove(failed_vertex_id)
-        else:
-            if failed_vertex_id != "":
-                raise ValueError("failed vertex id not in instance graph")
-
-        # remove failed block
-        for failed_vertex_id in failed_block:
-            to_delete = self.__adj_dict[failed_vertex_id]
-            self.__adj_dict[failed_vertex_id] = list()
-            for vertex_id in to_delete:
-                self.__clear_records.append([failed_vertex_id, vertex_id])
-                self.__adj_dict[vertex_id].remove(failed_vertex_id)
-
-    def restore_instance(self):
-        """將案例復原。
-        """
-        for failed_vertex_id, vertex_id in self.__clear_records:
-            self.__adj_dict[failed_vertex_id].append(vertex_id)
-            self.__adj_dict[vertex_id].append(failed_vertex_id)
+        adj_list = self.__adj_dict[target_id]
+        if old_id in adj_list:
+            idx = adj_list.index(old_id)
+            self.__adj_dict[target_id] = adj_list[:idx] + (new_id,) + adj_list[idx + 1:]
@@ -59,6 +59,36 @@ class PreventZone:
         linear = Linear(line.get_start_point(), line.get_end_point())
         self.linear_boundaries.append(linear)
 
+    def get_polygon(self):
+        """將邊界串接成頭尾相接的多邊形頂點。
+
+        從第一條邊界開始，每次接上第一條起點等於目前終點的邊界，
+        以起點為鍵的 dict 查詢，不必每次掃過所有邊界。
+
+        Returns:
+            ([float], [float]): 多邊形頂點的 x 座標與 y 座標
+
+        """
+        if len(self.boundaries) == 0:
+            return list(), list()
+
+        next_boundary = dict()
+        for boundary in self.boundaries:
+            next_boundary.setdefault(tuple(boundary.get_start_point()), boundary)
+
+        xs = [self.boundaries[0].get_start_point()[0]]
+        ys = [self.boundaries[0].get_start_point()[1]]
+        end = tuple(self.boundaries[0].get_end_point())
+        for _ in range(len(self.boundaries)):
+            boundary = next_boundary.get(end)
+            if boundary is None:
+                break
+            start = boundary.get_start_point()
+            xs.append(start[0])
+            ys.append(start[1])
+            end = tuple(boundary.get_end_point())
+        return xs, ys
+
     def get_id(self):
         """取得防煙區劃編號。
 
@@ -1,6 +1,3 @@
-import copy
-
-
 class Transportation:
     """傳送點。
 
@@ -52,7 +49,7 @@ class Transportation:
         self.__name = name
         self.__id = id_
         self.__category = category
-        self.__coordinate = coordinate
+        self.__coordinate = tuple(coordinate)
         self.__end_point = False
         self.__define_end_point(end_point)
         # self.__to_upper = None
@@ -109,7 +106,7 @@ class Transportation:
             (float, float): 障礙物座標
 
         """
-        return copy.deepcopy(self.__coordinate)
+        return self.__coordinate
 
     def always_valid(self):
         """判斷障礙物屬性是否會失效。
@@ -0,0 +1,57 @@
+import math
+import numpy as np
+
+
+class BasePointTransform:
+    """BasePoint 座標轉換：以 BasePoint 為中心旋轉，一次轉換整批座標。
+
+    旋轉矩陣在建構時計算一次，之後每次轉換都是對 (N, 3) 陣列做向量化運算，
+    z 座標維持不變。
+
+    Attributes:
+        origin (np.ndarray): 旋轉中心 (prjNS, prjWE)
+        angle (float): BasePoint 角度（度）
+        matrix (np.ndarray): 2x2 旋轉矩陣
+
+    """
+
+    def __init__(self, prjNS, prjWE, angle):
+        """BasePointTransform 建構子。
+
+        Args:
+            prjNS (float): BasePoint 南北向位置
+            prjWE (float): BasePoint 東西向位置
+            angle (float): BasePoint 角度（度），以順時針旋轉
+
+        """
+        self.origin = np.array([prjNS, prjWE], dtype=np.float64)
+        self.angle = angle
+
+        radian = -angle * math.pi / 180.0
+        cos, sin = math.cos(radian), math.sin(radian)
+        self.matrix = np.array([
+            [cos, -sin],
+            [sin, cos]
+        ], dtype=np.float64)
+
+    def apply(self, points):
+        """轉換一批座標。
+
+        Args:
+            points (np.ndarray): 座標 [x, y, z]，(..., 3)
+
+        Returns:
+            np.ndarray: 轉換後的座標，形狀與 points 相同
+
+        """
+        points = np.asarray(points, dtype=np.float64)
+        ox, oy = self.origin
+        dx = points[..., 0] - ox
+        dy = points[..., 1] - oy
+
+        # 依原本逐點公式的運算順序展開，結果與逐點轉換完全一致
+        result = np.empty_like(points)
+        result[..., 0] = ox + self.matrix[0, 0] * dx + self.matrix[0, 1] * dy
+        result[..., 1] = oy + self.matrix[1, 0] * dx + self.matrix[1, 1] * dy
+        result[..., 2] = points[..., 2]
+        return result